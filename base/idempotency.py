@@ -0,0 +1,79 @@
+import hashlib
+from functools import wraps
+
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_TIMEOUT = 24 * 60 * 60
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+
+def idempotency_scope(request, key):
+    """Digest that ties a client key to the caller and the endpoint."""
+    scope = "|".join([str(request.user.pk), request.method, request.path, key])
+    return hashlib.sha256(scope.encode()).hexdigest()
+
+
+def idempotent(method):
+    """
+    Replay the stored response when a POST is retried with the same
+    Idempotency-Key header. Keys are scoped to the user and the URL, and
+    responses below 500 are kept for 24 hours. A retry that arrives while
+    the first request is still running gets 409, and reusing a key with a
+    different body gets 422. Requests without the header run as usual.
+
+    The view can read the key's digest from `request.idempotency_key`,
+    e.g. to pass it on to the payment provider.
+    """
+
+    @wraps(method)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        request.idempotency_key = None
+        if key is None:
+            return method(view, request, *args, **kwargs)
+        if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return Response(
+                {"error": f"{IDEMPOTENCY_HEADER} must be 1-255 characters"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        scope = idempotency_scope(request, key)
+        fingerprint = hashlib.sha256(request.body).hexdigest()
+        response_key = f"idempotency:response:{scope}"
+        lock_key = f"idempotency:lock:{scope}"
+
+        stored = cache.get(response_key)
+        if stored is None:
+            if not cache.add(lock_key, fingerprint, IDEMPOTENCY_LOCK_TIMEOUT):
+                return Response(
+                    {"error": "A request with this Idempotency-Key is in progress"},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            try:
+                request.idempotency_key = scope
+                response = method(view, request, *args, **kwargs)
+                if response.status_code < 500:
+                    stored = {
+                        "fingerprint": fingerprint,
+                        "status": response.status_code,
+                        "data": response.data,
+                    }
+                    cache.set(response_key, stored, IDEMPOTENCY_TIMEOUT)
+                return response
+            finally:
+                cache.delete(lock_key)
+
+        if stored["fingerprint"] != fingerprint:
+            return Response(
+                {"error": "Idempotency-Key was already used with a different body"},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        response = Response(stored["data"], status=stored["status"])
+        response["Idempotent-Replayed"] = "true"
+        return response
+
+    return wrapper
@@ -0,0 +1,214 @@
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks on the complete ordering key instead of
+    an offset. A unique tie-breaker is appended to the ordering, so every
+    page is a single index range scan no matter how deep the client goes,
+    and rows sharing a sort value are never skipped or repeated.
+
+    The cursor is an opaque base64 token holding the boundary row's
+    ordering values and the direction of travel.
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    ordering = ("-id",)
+    tie_breaker = "id"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.fields = [
+            queryset.model._meta.get_field(name.lstrip("-")) for name in self.ordering
+        ]
+
+        position, reverse = self.decode_cursor(request)
+        ordering = self.ordering
+        if reverse:
+            ordering = [self.invert(name) for name in ordering]
+
+        queryset = queryset.order_by(*self.order_by(ordering))
+        if position is not None:
+            queryset = queryset.filter(self.seek(ordering, position))
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size,
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Honour the view's ordering filter (query param or view default),
+        falling back to the paginator's own ordering, then make the key
+        unique with the tie-breaker.
+        """
+        ordering = None
+        ordering_filters = [
+            filter_cls
+            for filter_cls in getattr(view, "filter_backends", [])
+            if hasattr(filter_cls, "get_ordering")
+        ]
+        if ordering_filters:
+            ordering = ordering_filters[0]().get_ordering(request, queryset, view)
+
+        ordering = ordering or self.ordering
+        if isinstance(ordering, str):
+            ordering = [ordering]
+        ordering = [
+            name[: -len("pk")] + self.tie_breaker if name.lstrip("-") == "pk" else name
+            for name in ordering
+        ]
+
+        if self.tie_breaker not in {name.lstrip("-") for name in ordering}:
+            direction = "-" if ordering[0].startswith("-") else ""
+            ordering.append(direction + self.tie_breaker)
+        return ordering
+
+    @staticmethod
+    def invert(name):
+        return name[1:] if name.startswith("-") else "-" + name
+
+    def order_by(self, ordering):
+        return [
+            ("-" if name.startswith("-") else "") + field.attname
+            for name, field in zip(ordering, self.fields)
+        ]
+
+    def seek(self, ordering, position):
+        """
+        Rows strictly after `position` in `ordering`:
+        (a > x) OR (a = x AND b > y) OR ..., prefixed with a redundant
+        bound on the leading column so the planner can use a range scan.
+        """
+        condition = Q()
+        equal = Q()
+        for name, field, value in zip(ordering, self.fields, position):
+            lookup = "lt" if name.startswith("-") else "gt"
+            condition |= equal & Q(**{f"{field.attname}__{lookup}": value})
+            equal &= Q(**{field.attname: value})
+
+        lead = "lte" if ordering[0].startswith("-") else "gte"
+        return Q(**{f"{self.fields[0].attname}__{lead}": position[0]}) & condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode("ascii")))
+            values = payload["v"]
+            if len(values) != len(self.fields):
+                raise ValueError
+            position = [
+                field.to_python(value) for field, value in zip(self.fields, values)
+            ]
+            return position, bool(payload.get("r"))
+        except (
+            TypeError,
+            ValueError,
+            KeyError,
+            UnicodeEncodeError,
+            binascii.Error,
+            DjangoValidationError,
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance, reverse=False):
+        payload = {
+            "v": [field.value_to_string(instance) for field in self.fields],
+            "r": int(reverse),
+        }
+        encoded = urlsafe_b64encode(json.dumps(payload).encode()).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        parameters = [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            }
+        ]
+        if self.page_size_query_param:
+            parameters.append(
+                {
+                    "name": self.page_size_query_param,
+                    "required": False,
+                    "in": "query",
+                    "description": "Number of results to return per page.",
+                    "schema": {"type": "integer"},
+                }
+            )
+        return parameters
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Holds up to `capacity` tokens and refills `rate` of them per second.
+    block() empties it for a while, e.g. for a 429 `retry_after`. Safe to
+    share between threads; wait() blocks the calling thread, acquire() is
+    the asyncio equivalent.
+    """
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self):
+        """Take a token and return 0, or return the seconds until one is free."""
+        with self.lock:
+            now = self.clock()
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def is_full(self):
+        """Whether the bucket has refilled to capacity, i.e. sat idle."""
+        with self.lock:
+            now = self.clock()
+            self._refill(now)
+            return now >= self.blocked_until and self.tokens >= self.capacity
+
+    def wait(self):
+        while (delay := self.delay()) > 0:
+            time.sleep(delay)
+
+    async def acquire(self):
+        while (delay := self.delay()) > 0:
+            await asyncio.sleep(delay)
+
+    def block(self, seconds):
+        with self.lock:
+            now = self.clock()
+            self.blocked_until = max(self.blocked_until, now + seconds)
+            self.tokens = 0
+            self.updated = now
@@ -0,0 +1,56 @@
+from contextlib import contextmanager
+
+from django.db import connections
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgreSQLWrapper
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin for query budgets: unlike assertNumQueries, the block may
+    run fewer queries than allowed, and the failure lists every statement.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget, using="default"):
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+
+        executed = len(context.captured_queries)
+        if executed > budget:
+            statements = "\n".join(
+                f"{number}. {query['sql']}"
+                for number, query in enumerate(context.captured_queries, start=1)
+            )
+            self.fail(
+                f"{executed} queries executed, budget is {budget}:\n{statements}"
+            )
+
+
+class FakeClock:
+    """A monotonic clock for tests; move it by setting or advancing `now`."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def postgresql_sql(queryset):
+    """
+    The SQL `queryset` compiles to on PostgreSQL, without a server, for
+    checking constructs that SQLite accepts but PostgreSQL rejects.
+    """
+    connection = PostgreSQLWrapper(
+        {**connections["default"].settings_dict, "NAME": "compile_only"}
+    )
+    # select_for_update() insists on a transaction; pretend to be in one
+    # so nothing ever tries to connect.
+    connection.get_autocommit = lambda: False
+    compiler = queryset.query.get_compiler(connection=connection)
+    sql, params = compiler.as_sql()
+    return sql % tuple(repr(param) for param in params)
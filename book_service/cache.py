@@ -0,0 +1,110 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+CATALOG_CACHE_TIMEOUT = 60 * 60
+
+EPOCH_KEY = "catalog:gen:epoch"
+LIST_KEY = "catalog:gen:list"
+RESPONSE_KEY = "catalog:response:{}"
+
+
+def book_key(pk):
+    return f"catalog:gen:book:{pk}"
+
+
+def get_generations(keys):
+    """
+    Current value of each generation counter. A missing counter (first use
+    or evicted) starts from the current time in ms rather than 1, so it can
+    never land on a value whose cached responses are still around.
+    """
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, int(time.time() * 1000), timeout=None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+
+
+def _bump_now_and_on_commit(keys):
+    """
+    Bump right away so readers move off the old entries, and again after
+    commit so anything cached from pre-commit rows in between is dropped.
+    """
+
+    def bump():
+        for key in keys:
+            _incr(key)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def invalidate_books(*pks):
+    """A single book changed: its detail and every list page are stale."""
+    _bump_now_and_on_commit([*(book_key(pk) for pk in pks), LIST_KEY])
+
+
+def invalidate_catalog():
+    """Bulk write with unknown rows affected: every cached response is stale."""
+    _bump_now_and_on_commit([EPOCH_KEY])
+
+
+def make_etag(request, generations):
+    fingerprint = "|".join(
+        [
+            *(str(generation) for generation in generations),
+            request.build_absolute_uri(),
+            request.accepted_media_type or "",
+        ]
+    )
+    return '"%s"' % hashlib.sha1(fingerprint.encode()).hexdigest()
+
+
+def catalog_cache(method):
+    """
+    Cache a read-only catalog view under its generation counters: the list
+    and search pages under (epoch, list), a detail page under (epoch, book).
+    The same generations form a strong ETag, so a matching If-None-Match is
+    answered with 304 before the view or the response cache is touched.
+    """
+
+    @wraps(method)
+    def wrapper(view, request, *args, **kwargs):
+        lookup = view.lookup_url_kwarg or view.lookup_field
+        scope = book_key(kwargs[lookup]) if lookup in kwargs else LIST_KEY
+        etag = make_etag(request, get_generations([EPOCH_KEY, scope]))
+
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            key = RESPONSE_KEY.format(etag.strip('"'))
+            data = cache.get(key)
+            if data is not None:
+                response = Response(data)
+            else:
+                response = method(view, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(key, response.data, CATALOG_CACHE_TIMEOUT)
+
+        response["ETag"] = etag
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    return wrapper
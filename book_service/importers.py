@@ -0,0 +1,152 @@
+import csv
+import json
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.db import DatabaseError, transaction
+
+from book_service.models import Book
+from book_service.serializers import BookImportSerializer
+
+NATURAL_KEY = ("title", "author", "cover")
+UPDATE_FIELDS = ("inventory", "daily_fee")
+IMPORT_FORMATS = ("csv", "jsonl")
+
+
+@dataclass
+class ImportReport:
+    processed: int = 0
+    imported: int = 0
+    invalid: int = 0
+    last_committed_row: int = 0
+    elapsed: float = 0.0
+    error: str = ""
+    errors: list = field(default_factory=list)
+
+    @property
+    def completed(self):
+        return not self.error
+
+    @property
+    def rows_per_second(self):
+        return round(self.processed / self.elapsed, 1) if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            "completed": self.completed,
+            "processed": self.processed,
+            "imported": self.imported,
+            "invalid": self.invalid,
+            "last_committed_row": self.last_committed_row,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "rows_per_second": self.rows_per_second,
+            "error": self.error,
+            "errors": self.errors,
+        }
+
+
+class MalformedRowError(ValueError):
+    """A line of the import file could not be parsed at all."""
+
+
+def read_rows(stream, file_format):
+    """
+    Yield one dict per data row without reading the whole stream. A JSONL
+    line that is not valid JSON or a CSV line the csv module rejects raises
+    MalformedRowError naming the line; so do bytes the stream cannot
+    decode, naming the last line read before them.
+    """
+    if file_format == "csv":
+        reader = csv.DictReader(stream)
+        try:
+            yield from reader
+        except csv.Error as error:
+            raise MalformedRowError(
+                f"Line {reader.line_num + 1} could not be parsed: {error}"
+            ) from error
+        except UnicodeDecodeError as error:
+            raise undecodable(reader.line_num, error) from error
+    elif file_format == "jsonl":
+        line_number = 0
+        try:
+            for line_number, line in enumerate(stream, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as error:
+                    raise MalformedRowError(
+                        f"Line {line_number} is not valid JSON: {error}"
+                    ) from error
+        except UnicodeDecodeError as error:
+            raise undecodable(line_number, error) from error
+    else:
+        raise ValueError(f"Unsupported import format: {file_format}")
+
+
+def undecodable(line_number, error):
+    return MalformedRowError(
+        f"Could not decode the file after line {line_number}: {error}"
+    )
+
+
+def detect_format(filename):
+    extension = filename.rsplit(".", 1)[-1].lower()
+    return "jsonl" if extension in ("jsonl", "ndjson") else "csv"
+
+
+def import_books(rows, batch_size=1000, resume_from=0, max_errors=100):
+    """
+    Validate `rows` through BookImportSerializer and upsert them on the
+    natural key (title, author, cover), one transaction per batch.
+
+    Only one batch is held in memory at a time. Rows are numbered from 1;
+    `resume_from` skips rows up to and including that number, so a run
+    that stopped on a failed batch is resumed with the report's
+    `last_committed_row`. A malformed or undecodable line stops the run
+    the same way, with the rows of its batch left uncommitted.
+    """
+    report = ImportReport(last_committed_row=resume_from)
+    started = time.perf_counter()
+    numbered = islice(enumerate(rows, start=1), resume_from, None)
+
+    while True:
+        try:
+            batch = list(islice(numbered, batch_size))
+        except (MalformedRowError, csv.Error, UnicodeDecodeError) as error:
+            report.error = str(error)
+            break
+        if not batch:
+            break
+
+        books = {}
+        errors = []
+        for row_number, row in batch:
+            serializer = BookImportSerializer(data=row)
+            if not serializer.is_valid():
+                errors.append({"row": row_number, "errors": serializer.errors})
+                continue
+            book = Book(**serializer.validated_data)
+            books[tuple(getattr(book, name) for name in NATURAL_KEY)] = book
+
+        try:
+            with transaction.atomic():
+                Book.objects.bulk_create(
+                    books.values(),
+                    update_conflicts=True,
+                    unique_fields=NATURAL_KEY,
+                    update_fields=UPDATE_FIELDS,
+                )
+        except DatabaseError as error:
+            report.error = f"Batch starting at row {batch[0][0]} failed: {error}"
+            break
+
+        report.processed += len(batch)
+        report.imported += len(books)
+        report.invalid += len(errors)
+        report.errors.extend(errors[: max_errors - len(report.errors)])
+        report.last_committed_row = batch[-1][0]
+
+    report.elapsed = time.perf_counter() - started
+    return report
@@ -0,0 +1,90 @@
+import random
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from book_service.models import Book, InventoryShard
+
+
+def reserve_copy(book):
+    """
+    Take one available copy of `book`. Returns False when none is left.
+
+    Plain titles use a conditional decrement of Book.inventory. Sharded
+    titles decrement a random shard instead, falling through the others,
+    so parallel borrowers rarely wait on the same row.
+    """
+    if not book.shard_count:
+        return Book.objects.adjust_inventory(book.pk, -1)
+
+    for index in random.sample(range(book.shard_count), book.shard_count):
+        taken = InventoryShard.objects.filter(
+            book_id=book.pk, index=index, available__gt=0
+        ).update(available=F("available") - 1)
+        if taken:
+            return True
+    return False
+
+
+def release_copy(book):
+    """Put one copy of `book` back."""
+    if not book.shard_count:
+        return Book.objects.adjust_inventory(book.pk, 1)
+
+    InventoryShard.objects.filter(
+        book_id=book.pk, index=random.randrange(book.shard_count)
+    ).update(available=F("available") + 1)
+    return True
+
+
+def flush_sharded_inventory():
+    """
+    Write-behind for sharded titles: copy each shard total into
+    Book.inventory where it drifted. Returns the number of books updated.
+    """
+    totals = InventoryShard.objects.filter(book=OuterRef("pk")).values("book")
+    books = (
+        Book.objects.filter(shard_count__gt=0)
+        .annotate(
+            total=Coalesce(
+                Subquery(totals.annotate(total=Sum("available")).values("total")), 0
+            )
+        )
+        .exclude(inventory=F("total"))
+        .values_list("pk", "total")
+    )
+
+    return sum(
+        Book.objects.filter(shard_count__gt=0).update_book(pk, inventory=total)
+        for pk, total in books
+    )
+
+
+def shard_inventory(book, shard_count):
+    """
+    Spread `book`'s available copies evenly over `shard_count` shards, or
+    fold them back into Book.inventory when `shard_count` is 0.
+    """
+    with transaction.atomic():
+        book = Book.objects.select_for_update().get(pk=book.pk)
+        available = book.inventory
+        if book.shard_count:
+            available = book.shards.aggregate(total=Sum("available"))["total"] or 0
+            book.shards.all().delete()
+
+        if shard_count:
+            per_shard, remainder = divmod(available, shard_count)
+            InventoryShard.objects.bulk_create(
+                InventoryShard(
+                    book=book,
+                    index=index,
+                    available=per_shard + (index < remainder),
+                )
+                for index in range(shard_count)
+            )
+
+        book.shard_count = shard_count
+        book.inventory = available
+        book.save(update_fields=["shard_count", "inventory"])
+    return book
@@ -0,0 +1,89 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+
+from book_service.inventory import (
+    flush_sharded_inventory,
+    reserve_copy,
+    shard_inventory,
+)
+from book_service.models import Book
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire parallel reservations at one title and fail if more copies are "
+        "handed out than it had, or if any reservation errors "
+        "(run against PostgreSQL)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--inventory", type=int, default=100)
+        parser.add_argument("--shards", type=int, default=0)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=50,
+            help="Concurrent database connections; keep below max_connections",
+        )
+
+    def handle(self, *args, **options):
+        book = Book.objects.create(
+            title=f"Reservation benchmark {time.time_ns()}",
+            author="Benchmark",
+            cover="SOFT",
+            inventory=options["inventory"],
+            daily_fee=1,
+        )
+        if options["shards"]:
+            book = shard_inventory(book, options["shards"])
+
+        start = threading.Event()
+        errors = []
+
+        def borrow(_):
+            start.wait()
+            try:
+                with transaction.atomic():
+                    return "taken" if reserve_copy(book) else "sold_out"
+            except DatabaseError as error:
+                errors.append(error)
+                return "error"
+            finally:
+                connection.close()
+
+        try:
+            with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+                results = pool.map(borrow, range(options["requests"]))
+                started = time.perf_counter()
+                start.set()
+                outcomes = list(results)
+            elapsed = time.perf_counter() - started
+
+            flush_sharded_inventory()
+            book.refresh_from_db()
+        finally:
+            book.delete()
+
+        taken = outcomes.count("taken")
+        self.stdout.write(
+            f"{options['requests']} requests in {elapsed:.2f} s: "
+            f"{taken} taken, {outcomes.count('sold_out')} sold out, "
+            f"{len(errors)} errors, {book.inventory} copies left"
+        )
+
+        if (
+            taken > options["inventory"]
+            or taken + book.inventory != options["inventory"]
+        ):
+            raise CommandError("Oversell detected: inventory accounting is off")
+        if errors:
+            raise CommandError(
+                f"{len(errors)} reservations failed, the run proves nothing; "
+                f"first error: {errors[0]}"
+            )
+        self.stdout.write(self.style.SUCCESS("No oversell"))
@@ -0,0 +1,105 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from book_service.models import Book
+from book_service.search import BookSearchResults
+
+WORDS = (
+    "river night garden winter empire shadow silent golden city letters "
+    "ocean war peace stone machine forest memory light road house mountain "
+    "storm glass iron kingdom secret island song fire lost wild dream"
+).split()
+
+SURNAMES = (
+    "Smith Johnson Brown Taylor Miller Wilson Moore Anderson Thomas Jackson "
+    "White Harris Martin Thompson Garcia Martinez Robinson Clark Lewis Walker"
+).split()
+
+DEFAULT_QUERIES = ("garden", "silent river", "shadow of the empire", "Tompson")
+
+
+class Command(BaseCommand):
+    help = "Measure ranked book search latency, optionally seeding a synthetic catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Number of synthetic books to insert before measuring",
+        )
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--runs", type=int, default=50)
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument(
+            "--budget-ms",
+            type=float,
+            default=10.0,
+            help="Fail if the p95 latency of any query exceeds this budget",
+        )
+        parser.add_argument("queries", nargs="*", default=DEFAULT_QUERIES)
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            self.seed(options["seed"], options["batch_size"])
+
+        total = Book.objects.count()
+        self.stdout.write(f"Catalog size: {total} books")
+
+        over_budget = []
+        for query in options["queries"]:
+            timings = []
+            for _ in range(options["runs"]):
+                started = time.perf_counter()
+                results = BookSearchResults(query)
+                hits = results.count()
+                results[: options["page_size"]]
+                timings.append((time.perf_counter() - started) * 1000)
+
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            self.stdout.write(
+                f"{query!r}: {hits} hits, "
+                f"median {statistics.median(timings):.2f} ms, p95 {p95:.2f} ms"
+            )
+            if p95 > options["budget_ms"]:
+                over_budget.append(query)
+
+        if over_budget:
+            raise CommandError(
+                f"p95 over {options['budget_ms']} ms for: {', '.join(over_budget)}"
+            )
+        self.stdout.write(self.style.SUCCESS("All queries within budget"))
+
+    def seed(self, count, batch_size):
+        """
+        Insert `count` synthetic books. Titles end in a serial number
+        continuing from the current catalog size, so every run adds new
+        editions instead of clashing with unique_book_edition.
+        """
+        rng = random.Random(count)
+        before = Book.objects.count()
+        started = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            Book.objects.bulk_create(
+                (
+                    Book(
+                        title=" ".join(rng.sample(WORDS, rng.randint(2, 5))).title()
+                        + f" {before + serial + 1}",
+                        author=f"{rng.choice(SURNAMES)} {rng.choice(SURNAMES)}",
+                        cover=rng.choice(("HARD", "SOFT")),
+                        inventory=rng.randint(0, 20),
+                        daily_fee=Decimal(rng.randint(50, 500)) / 100,
+                    )
+                    for serial in range(offset, min(offset + batch_size, count))
+                ),
+                ignore_conflicts=True,
+            )
+        seeded = Book.objects.count() - before
+        self.stdout.write(
+            f"Seeded {seeded} books in {time.perf_counter() - started:.1f} s"
+        )
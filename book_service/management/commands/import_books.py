@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from book_service.importers import (
+    IMPORT_FORMATS,
+    detect_format,
+    import_books,
+    read_rows,
+)
+
+
+class Command(BaseCommand):
+    help = "Stream books from a CSV or JSONL file and upsert them in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--format",
+            dest="file_format",
+            choices=IMPORT_FORMATS,
+            help="Input format (detected from the file extension by default)",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--resume-from",
+            type=int,
+            default=0,
+            help="Skip data rows up to and including this row number",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["file_format"] or detect_format(path)
+
+        try:
+            with open(path, newline="", encoding="utf-8") as stream:
+                report = import_books(
+                    read_rows(stream, file_format),
+                    batch_size=options["batch_size"],
+                    resume_from=options["resume_from"],
+                )
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+
+        for error in report.errors:
+            self.stdout.write(
+                self.style.WARNING(f"Row {error['row']}: {error['errors']}")
+            )
+
+        self.stdout.write(
+            f"Processed {report.processed} rows, imported {report.imported}, "
+            f"skipped {report.invalid} invalid in {report.elapsed:.1f} s "
+            f"({report.rows_per_second} rows/s)"
+        )
+
+        if not report.completed:
+            raise CommandError(
+                f"{report.error}\n"
+                f"Resume with --resume-from {report.last_committed_row}"
+            )
+        self.stdout.write(self.style.SUCCESS("Import finished"))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from book_service.inventory import shard_inventory
+from book_service.models import Book
+
+
+class Command(BaseCommand):
+    help = "Split a hot title's inventory into shards (or merge it back with 0)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("book_id", type=int)
+        parser.add_argument("shards", type=int)
+
+    def handle(self, *args, **options):
+        if options["shards"] < 0:
+            raise CommandError("Number of shards cannot be negative")
+
+        try:
+            book = Book.objects.get(pk=options["book_id"])
+        except Book.DoesNotExist:
+            raise CommandError(f"Book {options['book_id']} does not exist")
+
+        book = shard_inventory(book, options["shards"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{book} now has {book.inventory} copies "
+                f"in {book.shard_count or 'no'} shards"
+            )
+        )
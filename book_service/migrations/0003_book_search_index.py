@@ -0,0 +1,96 @@
+from django.db import migrations
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    ALTER TABLE book_service_book ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(author, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX book_search_vector_idx ON book_service_book "
+    "USING gin (search_vector)",
+    "CREATE INDEX book_title_trgm_idx ON book_service_book "
+    "USING gin (title gin_trgm_ops)",
+    "CREATE INDEX book_author_trgm_idx ON book_service_book "
+    "USING gin (author gin_trgm_ops)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS book_author_trgm_idx",
+    "DROP INDEX IF EXISTS book_title_trgm_idx",
+    "DROP INDEX IF EXISTS book_search_vector_idx",
+    "ALTER TABLE book_service_book DROP COLUMN IF EXISTS search_vector",
+]
+
+# SQLite drops these triggers whenever Django rebuilds book_service_book
+# (e.g. AlterField or AddConstraint), so later migrations re-apply them.
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS book_service_book_fts_ai
+    AFTER INSERT ON book_service_book
+    BEGIN
+        INSERT INTO book_service_book_fts(rowid, title, author)
+        VALUES (new.id, new.title, new.author);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS book_service_book_fts_ad
+    AFTER DELETE ON book_service_book
+    BEGIN
+        INSERT INTO book_service_book_fts(book_service_book_fts, rowid, title, author)
+        VALUES ('delete', old.id, old.title, old.author);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS book_service_book_fts_au
+    AFTER UPDATE OF title, author ON book_service_book
+    BEGIN
+        INSERT INTO book_service_book_fts(book_service_book_fts, rowid, title, author)
+        VALUES ('delete', old.id, old.title, old.author);
+        INSERT INTO book_service_book_fts(rowid, title, author)
+        VALUES (new.id, new.title, new.author);
+    END
+    """,
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE book_service_book_fts USING fts5(
+        title, author,
+        content='book_service_book', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    *SQLITE_TRIGGERS,
+    "INSERT INTO book_service_book_fts(book_service_book_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS book_service_book_fts_au",
+    "DROP TRIGGER IF EXISTS book_service_book_fts_ad",
+    "DROP TRIGGER IF EXISTS book_service_book_fts_ai",
+    "DROP TABLE IF EXISTS book_service_book_fts",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("book_service", "0002_rename_daily_free_book_daily_fee"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({"postgresql": POSTGRES_FORWARD, "sqlite": SQLITE_FORWARD}),
+            _run({"postgresql": POSTGRES_BACKWARD, "sqlite": SQLITE_BACKWARD}),
+        ),
+    ]
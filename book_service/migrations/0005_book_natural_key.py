@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:31
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+search_index = import_module("book_service.migrations.0003_book_search_index")
+
+
+def restore_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        for statement in search_index.SQLITE_TRIGGERS:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("book_service", "0004_keyset_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers),
+        migrations.AddConstraint(
+            model_name="book",
+            constraint=models.UniqueConstraint(
+                fields=("title", "author", "cover"), name="unique_book_edition"
+            ),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:40
+
+from importlib import import_module
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+search_index = import_module("book_service.migrations.0003_book_search_index")
+
+
+def restore_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        for statement in search_index.SQLITE_TRIGGERS:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("book_service", "0005_book_natural_key"),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers),
+        migrations.AddField(
+            model_name="book",
+            name="shard_count",
+            field=models.PositiveSmallIntegerField(
+                default=0,
+                help_text="When above zero, available copies live in inventory shards and inventory is their periodically flushed total.",
+            ),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name="InventoryShard",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("index", models.PositiveSmallIntegerField()),
+                ("available", models.PositiveIntegerField(default=0)),
+                (
+                    "book",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="shards",
+                        to="book_service.book",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("book", "index"), name="unique_inventory_shard"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -1,4 +1,7 @@
 from django.db import models
+from django.db.models import F
+
+from book_service.cache import invalidate_books, invalidate_catalog
 
 COVER_CHOICES = (
     ("HARD", "Hard"),
@@ -6,6 +9,44 @@ COVER_CHOICES = (
 )
 
 
+class BookQuerySet(models.QuerySet):
+    """Bulk writes skip Book.save(), so they invalidate the whole catalog cache."""
+
+    def update(self, **kwargs):
+        invalidate_catalog()
+        return super().update(**kwargs)
+
+    def delete(self):
+        invalidate_catalog()
+        return super().delete()
+
+    def bulk_create(self, objs, *args, **kwargs):
+        invalidate_catalog()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        invalidate_catalog()
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def update_book(self, book_id, **fields):
+        """
+        Update one book and invalidate only its own cache entries. Filters
+        already on the queryset still apply, so the update can be conditional.
+        """
+        changed = models.QuerySet.update(self.filter(pk=book_id), **fields)
+        if changed:
+            invalidate_books(book_id)
+        return changed
+
+    def adjust_inventory(self, book_id, delta):
+        """
+        Atomically add `delta` copies to one book in a single conditional
+        UPDATE that never takes inventory below zero.
+        """
+        rows = self.filter(inventory__gte=-delta) if delta < 0 else self
+        return bool(rows.update_book(book_id, inventory=F("inventory") + delta))
+
+
 class Book(models.Model):
     title = models.CharField(max_length=255)
     author = models.CharField(max_length=255)
@@ -14,9 +55,51 @@ class Book(models.Model):
         models.PositiveIntegerField()
     )  # Inventory – the number of this specific book available now in the library
     daily_fee = models.DecimalField(max_digits=10, decimal_places=2)
+    shard_count = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="When above zero, available copies live in inventory shards "
+        "and inventory is their periodically flushed total.",
+    )
+
+    objects = BookQuerySet.as_manager()
 
     class Meta:
         ordering = ["title"]
+        indexes = [models.Index(fields=["title", "id"], name="book_title_id_idx")]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["title", "author", "cover"], name="unique_book_edition"
+            )
+        ]
 
     def __str__(self):
         return self.title
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        invalidate_books(self.pk)
+
+    def delete(self, *args, **kwargs):
+        invalidate_books(self.pk)
+        return super().delete(*args, **kwargs)
+
+
+class InventoryShard(models.Model):
+    """
+    One slice of a hot title's available copies. Borrowers decrement a
+    random shard, so concurrent reservations rarely contend on one row.
+    """
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="shards")
+    index = models.PositiveSmallIntegerField()
+    available = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["book", "index"], name="unique_inventory_shard"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.book} shard {self.index}: {self.available}"
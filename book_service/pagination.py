@@ -0,0 +1,13 @@
+from rest_framework.pagination import PageNumberPagination
+
+from base.pagination import KeysetPagination
+
+
+class BookPagination(KeysetPagination):
+    ordering = ("title", "id")
+
+
+class BookSearchPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
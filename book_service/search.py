@@ -0,0 +1,145 @@
+import re
+
+from django.db import connections
+from django.db.models import Q
+
+from book_service.models import Book
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class PostgresBookSearch:
+    """
+    Ranked search over the generated `search_vector` column (GIN) combined
+    with trigram similarity on title/author for typos and partial words.
+    """
+
+    match = (
+        "search_vector @@ websearch_to_tsquery('english', %(q)s) "
+        "OR title %% %(q)s OR author %% %(q)s"
+    )
+    rank = (
+        "ts_rank_cd(search_vector, websearch_to_tsquery('english', %(q)s)) "
+        "+ GREATEST(similarity(title, %(q)s), similarity(author, %(q)s))"
+    )
+
+    def __init__(self, query):
+        self.params = {"q": query}
+
+    def count(self, cursor):
+        cursor.execute(
+            f"SELECT count(*) FROM book_service_book WHERE {self.match}", self.params
+        )
+        return cursor.fetchone()[0]
+
+    def ranked_ids(self, cursor, limit, offset):
+        cursor.execute(
+            f"SELECT id FROM book_service_book WHERE {self.match} "
+            f"ORDER BY {self.rank} DESC, id LIMIT %(limit)s OFFSET %(offset)s",
+            {**self.params, "limit": limit, "offset": offset},
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+class SQLiteBookSearch:
+    """
+    Ranked search over the `book_service_book_fts` FTS5 shadow table,
+    ordered by bm25. Every query token is matched as a quoted prefix so
+    user input can never be parsed as FTS5 syntax.
+    """
+
+    def __init__(self, query):
+        tokens = TOKEN_RE.findall(query)
+        self.match = " ".join(f'"{token}"*' for token in tokens)
+
+    def count(self, cursor):
+        if not self.match:
+            return 0
+        cursor.execute(
+            "SELECT count(*) FROM book_service_book_fts "
+            "WHERE book_service_book_fts MATCH %s",
+            [self.match],
+        )
+        return cursor.fetchone()[0]
+
+    def ranked_ids(self, cursor, limit, offset):
+        if not self.match:
+            return []
+        cursor.execute(
+            "SELECT rowid FROM book_service_book_fts "
+            "WHERE book_service_book_fts MATCH %s "
+            "ORDER BY rank, rowid LIMIT %s OFFSET %s",
+            [self.match, limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+class ContainsBookSearch:
+    """
+    Fallback for databases without a search backend: every query token
+    must appear in the title or author (icontains), ordered by id. Slow
+    on a large catalog, but correct everywhere the ORM runs.
+    """
+
+    def __init__(self, query, using="default"):
+        condition = Q()
+        for token in TOKEN_RE.findall(query):
+            condition &= Q(title__icontains=token) | Q(author__icontains=token)
+        self.matches = (
+            Book.objects.using(using).filter(condition).order_by("id")
+            if condition
+            else Book.objects.none()
+        )
+
+    def count(self, cursor):
+        return self.matches.count()
+
+    def ranked_ids(self, cursor, limit, offset):
+        return list(self.matches.values_list("id", flat=True)[offset : offset + limit])
+
+
+SEARCH_BACKENDS = {
+    "postgresql": PostgresBookSearch,
+    "sqlite": SQLiteBookSearch,
+}
+
+
+class BookSearchResults:
+    """
+    Lazy ranked result set. It exposes `count()` and slicing so Django's
+    Paginator can page it: only the ids of the requested page are ranked
+    and fetched, then the books are loaded with a single `in_bulk` query.
+    """
+
+    def __init__(self, query, using="default"):
+        self.connection = connections[using]
+        backend_class = SEARCH_BACKENDS.get(self.connection.vendor)
+        if backend_class is None:
+            self.backend = ContainsBookSearch(query, using)
+        else:
+            self.backend = backend_class(query)
+        self.using = using
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            with self.connection.cursor() as cursor:
+                self._count = self.backend.count(cursor)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item : item + 1][0]
+
+        start = item.start or 0
+        stop = item.stop if item.stop is not None else self.count()
+        if stop <= start:
+            return []
+
+        with self.connection.cursor() as cursor:
+            ids = self.backend.ranked_ids(cursor, stop - start, start)
+        books = Book.objects.using(self.using).in_bulk(ids)
+        return [books[pk] for pk in ids if pk in books]
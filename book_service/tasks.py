@@ -0,0 +1,8 @@
+from celery import shared_task
+
+from book_service.inventory import flush_sharded_inventory
+
+
+@shared_task
+def flush_inventory_shards():
+    return f"Flushed inventory of {flush_sharded_inventory()} sharded books"
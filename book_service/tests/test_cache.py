@@ -0,0 +1,95 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from book_service.models import Book
+
+BOOK_URL = reverse("book_service:books-list")
+
+
+def detail_url(book):
+    return reverse("book_service:books-detail", kwargs={"pk": book.pk})
+
+
+class CatalogCacheTests(APITestCase):
+    def setUp(self):
+        self.book = Book.objects.create(
+            title="Cached Book",
+            author="Author",
+            cover="HARD",
+            inventory=3,
+            daily_fee="1.00",
+        )
+        self.other_book = Book.objects.create(
+            title="Other Book",
+            author="Author",
+            cover="SOFT",
+            inventory=3,
+            daily_fee="1.00",
+        )
+        self.user = get_user_model().objects.create_user("user@test.com", "userpass")
+
+    def test_matching_etag_returns_not_modified(self):
+        response = self.client.get(detail_url(self.book))
+        etag = response["ETag"]
+
+        response = self.client.get(detail_url(self.book), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_cached_response_is_reused_without_queries(self):
+        self.client.get(BOOK_URL)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(BOOK_URL)
+
+        self.assertEqual(len(response.data["results"]), 2)
+
+    @patch("django.db.models.signals.ModelSignal.send")
+    def test_borrowing_refreshes_inventory(self, mock_signal):
+        list_etag = self.client.get(BOOK_URL)["ETag"]
+        other_etag = self.client.get(detail_url(self.other_book))["ETag"]
+        self.client.force_authenticate(user=self.user)
+
+        self.client.post(
+            reverse("borrowings:borrowings-list"),
+            {
+                "expected_return_date": timezone.now().date()
+                + timezone.timedelta(days=7),
+                "book": self.book.id,
+            },
+        )
+
+        response = self.client.get(detail_url(self.book))
+        self.assertEqual(response.data["inventory"], 2)
+        response = self.client.get(BOOK_URL, HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(
+            detail_url(self.other_book), HTTP_IF_NONE_MATCH=other_etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_bulk_update_invalidates_every_page(self):
+        self.client.get(detail_url(self.book))
+
+        Book.objects.all().update(inventory=0)
+
+        response = self.client.get(detail_url(self.book))
+        self.assertEqual(response.data["inventory"], 0)
+
+    def test_commit_invalidates_again(self):
+        etag = self.client.get(detail_url(self.book))["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.inventory = 1
+            self.book.save()
+            after_save = self.client.get(detail_url(self.book))["ETag"]
+
+        after_commit = self.client.get(detail_url(self.book))["ETag"]
+        self.assertNotEqual(etag, after_save)
+        self.assertNotEqual(after_save, after_commit)
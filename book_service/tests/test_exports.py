@@ -0,0 +1,66 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from book_service.models import Book
+
+EXPORT_URL = reverse("book_service:books-export")
+
+
+class BookExportTests(APITestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            "admin@test.com", "adminpass"
+        )
+        self.user = get_user_model().objects.create_user("user@test.com", "userpass")
+        self.books = [
+            Book.objects.create(
+                title=f"Book {number}",
+                author="Author",
+                cover="HARD",
+                inventory=number,
+                daily_fee="1.25",
+            )
+            for number in range(3)
+        ]
+
+    def test_export_ndjson(self):
+        self.client.force_authenticate(user=self.admin)
+
+        response = self.client.get(EXPORT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual([row["id"] for row in rows], [book.id for book in self.books])
+        self.assertEqual(rows[0]["daily_fee"], "1.25")
+
+    def test_export_csv(self):
+        self.client.force_authenticate(user=self.admin)
+
+        response = self.client.get(EXPORT_URL, {"file_format": "csv"})
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "id,title,author,cover,inventory,daily_fee")
+        self.assertEqual(len(lines), 4)
+
+    def test_export_unknown_format(self):
+        self.client.force_authenticate(user=self.admin)
+
+        response = self.client.get(EXPORT_URL, {"file_format": "xml"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_as_user(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(EXPORT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
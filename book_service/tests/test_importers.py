@@ -0,0 +1,206 @@
+import csv
+import io
+import json
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from book_service.importers import import_books, read_rows
+from book_service.models import Book
+
+IMPORT_URL = reverse("book_service:books-import-catalog")
+
+CSV_DATA = (
+    "title,author,cover,inventory,daily_fee\n"
+    "Dune,Frank Herbert,HARD,3,1.50\n"
+    "Emma,Jane Austen,SOFT,2,0.99\n"
+    "Broken,Nobody,PAPER,1,1.00\n"
+    "Dune,Frank Herbert,HARD,7,2.00\n"
+)
+
+
+class ImportBooksTests(TestCase):
+    def test_import_upserts_on_natural_key(self):
+        Book.objects.create(
+            title="Emma",
+            author="Jane Austen",
+            cover="SOFT",
+            inventory=10,
+            daily_fee="5.00",
+        )
+
+        report = import_books(read_rows(io.StringIO(CSV_DATA), "csv"), batch_size=2)
+
+        self.assertTrue(report.completed)
+        self.assertEqual(report.processed, 4)
+        self.assertEqual(report.invalid, 1)
+        self.assertEqual(report.errors[0]["row"], 3)
+        self.assertEqual(Book.objects.count(), 2)
+        dune = Book.objects.get(title="Dune")
+        self.assertEqual(dune.inventory, 7)
+        self.assertEqual(Book.objects.get(title="Emma").inventory, 2)
+
+    def test_import_jsonl(self):
+        lines = [
+            {
+                "title": "Ulysses",
+                "author": "James Joyce",
+                "cover": "HARD",
+                "inventory": 1,
+                "daily_fee": "3.00",
+            },
+            {
+                "title": "Dubliners",
+                "author": "James Joyce",
+                "cover": "SOFT",
+                "inventory": 4,
+                "daily_fee": "1.00",
+            },
+        ]
+        stream = io.StringIO("\n".join(json.dumps(line) for line in lines) + "\n")
+
+        report = import_books(read_rows(stream, "jsonl"))
+
+        self.assertEqual(report.imported, 2)
+        self.assertEqual(Book.objects.filter(author="James Joyce").count(), 2)
+
+    def test_failed_batch_can_be_resumed(self):
+        original_bulk_create = Book.objects.bulk_create
+        calls = []
+
+        def flaky_bulk_create(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 2:
+                raise DatabaseError("connection lost")
+            return original_bulk_create(*args, **kwargs)
+
+        with patch.object(Book.objects, "bulk_create", side_effect=flaky_bulk_create):
+            report = import_books(read_rows(io.StringIO(CSV_DATA), "csv"), batch_size=2)
+
+        self.assertFalse(report.completed)
+        self.assertEqual(report.last_committed_row, 2)
+        self.assertEqual(Book.objects.count(), 2)
+
+        report = import_books(
+            read_rows(io.StringIO(CSV_DATA), "csv"),
+            batch_size=2,
+            resume_from=report.last_committed_row,
+        )
+
+        self.assertTrue(report.completed)
+        self.assertEqual(report.processed, 2)
+        self.assertEqual(Book.objects.get(title="Dune").inventory, 7)
+
+    def test_malformed_jsonl_line_stops_at_last_committed_row(self):
+        lines = [
+            json.dumps(
+                {
+                    "title": f"Book {number}",
+                    "author": "Author",
+                    "cover": "SOFT",
+                    "inventory": 1,
+                    "daily_fee": "1.00",
+                }
+            )
+            for number in range(1, 5)
+        ]
+        lines.insert(3, '{"title": "Broken"')
+        stream = io.StringIO("\n".join(lines) + "\n")
+
+        report = import_books(read_rows(stream, "jsonl"), batch_size=2)
+
+        self.assertFalse(report.completed)
+        self.assertIn("Line 4", report.error)
+        self.assertEqual(report.last_committed_row, 2)
+        self.assertEqual(Book.objects.count(), 2)
+
+    def test_unparsable_csv_line_stops_at_last_committed_row(self):
+        rows = [f"Book {number},Author,SOFT,1,1.00\n" for number in range(1, 5)]
+        rows.insert(
+            2, '"' + "x" * (csv.field_size_limit() + 1) + '",Author,SOFT,1,1.00\n'
+        )
+        stream = io.StringIO("title,author,cover,inventory,daily_fee\n" + "".join(rows))
+
+        report = import_books(read_rows(stream, "csv"), batch_size=2)
+
+        self.assertFalse(report.completed)
+        self.assertIn("Line 4", report.error)
+        self.assertEqual(report.last_committed_row, 2)
+        self.assertEqual(Book.objects.count(), 2)
+
+
+class ImportBooksViewTests(APITestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            "admin@test.com", "adminpass"
+        )
+        self.user = get_user_model().objects.create_user("user@test.com", "userpass")
+
+    def upload(self):
+        return SimpleUploadedFile("catalog.csv", CSV_DATA.encode(), "text/csv")
+
+    def test_import_as_admin(self):
+        self.client.force_authenticate(user=self.admin)
+
+        response = self.client.post(
+            IMPORT_URL, {"file": self.upload()}, format="multipart"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["completed"])
+        self.assertEqual(response.data["imported"], 2)
+        self.assertEqual(response.data["invalid"], 1)
+
+    def test_import_as_user(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.post(
+            IMPORT_URL, {"file": self.upload()}, format="multipart"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_import_without_file(self):
+        self.client.force_authenticate(user=self.admin)
+
+        response = self.client.post(IMPORT_URL, {}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_malformed_jsonl_reports_resume_position(self):
+        self.client.force_authenticate(user=self.admin)
+        upload = SimpleUploadedFile(
+            "catalog.jsonl", b"not json\n", "application/x-ndjson"
+        )
+
+        response = self.client.post(IMPORT_URL, {"file": upload}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data["completed"])
+        self.assertIn("Line 1", response.data["error"])
+        self.assertEqual(response.data["last_committed_row"], 0)
+
+    def test_import_undecodable_file_reports_resume_position(self):
+        self.client.force_authenticate(user=self.admin)
+        rows = "".join(f"Book {number},Author,SOFT,1,1.00\n" for number in range(600))
+        upload = SimpleUploadedFile(
+            "catalog.csv",
+            b"title,author,cover,inventory,daily_fee\n" + rows.encode() + b"\xff\n",
+            "text/csv",
+        )
+
+        response = self.client.post(
+            IMPORT_URL, {"file": upload, "batch_size": 100}, format="multipart"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data["completed"])
+        self.assertIn("Could not decode", response.data["error"])
+        self.assertGreaterEqual(response.data["last_committed_row"], 100)
+        self.assertEqual(Book.objects.count(), response.data["last_committed_row"])
@@ -0,0 +1,68 @@
+from django.test import TestCase
+
+from book_service.inventory import (
+    flush_sharded_inventory,
+    release_copy,
+    reserve_copy,
+    shard_inventory,
+)
+from book_service.models import Book
+
+
+class InventoryEngineTests(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(
+            title="Hot Title",
+            author="Author",
+            cover="HARD",
+            inventory=3,
+            daily_fee="1.00",
+        )
+
+    def test_reserve_never_oversells(self):
+        outcomes = [reserve_copy(self.book) for _ in range(5)]
+
+        self.assertEqual(outcomes, [True, True, True, False, False])
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 0)
+
+    def test_reserve_uses_single_conditional_update(self):
+        with self.assertNumQueries(1):
+            reserve_copy(self.book)
+
+    def test_release_returns_copy(self):
+        reserve_copy(self.book)
+        release_copy(self.book)
+
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 3)
+
+    def test_sharded_reservations_and_flush(self):
+        book = shard_inventory(self.book, 2)
+        self.assertEqual(
+            sorted(book.shards.values_list("available", flat=True)), [1, 2]
+        )
+
+        outcomes = [reserve_copy(book) for _ in range(4)]
+        self.assertEqual(outcomes.count(True), 3)
+
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 3)
+        self.assertEqual(flush_sharded_inventory(), 1)
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 0)
+
+        release_copy(book)
+        flush_sharded_inventory()
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 1)
+
+    def test_unshard_folds_shards_back(self):
+        book = shard_inventory(self.book, 3)
+        reserve_copy(book)
+
+        book = shard_inventory(book, 0)
+
+        self.assertEqual(book.inventory, 2)
+        self.assertEqual(book.shard_count, 0)
+        self.assertFalse(book.shards.exists())
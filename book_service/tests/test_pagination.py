@@ -0,0 +1,50 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from book_service.models import Book
+
+BOOK_URL = reverse("book_service:books-list")
+
+
+class BookKeysetPaginationTests(APITestCase):
+    def setUp(self):
+        for number, title in enumerate(("Alpha", "Beta", "Beta", "Beta", "Gamma")):
+            Book.objects.create(
+                title=title,
+                author=f"Author {number}",
+                cover="SOFT",
+                inventory=1,
+                daily_fee="1.00",
+            )
+
+    def collect_pages(self, url):
+        ids = []
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(book["id"] for book in response.data["results"])
+            url = response.data["next"]
+            pages += 1
+        return ids, pages
+
+    def test_pages_follow_title_then_id(self):
+        ids, pages = self.collect_pages(f"{BOOK_URL}?page_size=2")
+
+        expected = list(Book.objects.order_by("title", "id").values_list("id", flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 3)
+
+    def test_previous_link_returns_previous_page(self):
+        first = self.client.get(BOOK_URL, {"page_size": 2})
+        second = self.client.get(first.data["next"])
+        back = self.client.get(second.data["previous"])
+
+        self.assertIsNone(first.data["previous"])
+        self.assertEqual(back.data["results"], first.data["results"])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(BOOK_URL, {"cursor": "not-a-cursor"})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
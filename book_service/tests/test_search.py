@@ -0,0 +1,83 @@
+from unittest.mock import patch
+
+from django.db import connections
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from book_service.models import Book
+from book_service.search import BookSearchResults
+
+SEARCH_URL = reverse("book_service:books-search")
+
+
+def sample_book(**params):
+    defaults = {
+        "title": "Sample Book",
+        "author": "Sample Author",
+        "cover": "HARD",
+        "inventory": 5,
+        "daily_fee": "1.50",
+    }
+    defaults.update(params)
+    return Book.objects.create(**defaults)
+
+
+class BookSearchTests(APITestCase):
+    def setUp(self):
+        self.dune = sample_book(title="Dune", author="Frank Herbert")
+        self.messiah = sample_book(title="Dune Messiah", author="Frank Herbert")
+        self.hobbit = sample_book(title="The Hobbit", author="J. R. R. Tolkien")
+
+    def test_search_by_title(self):
+        response = self.client.get(SEARCH_URL, {"q": "dune"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        titles = [book["title"] for book in response.data["results"]]
+        self.assertEqual(titles, ["Dune", "Dune Messiah"])
+
+    def test_search_by_author_prefix(self):
+        response = self.client.get(SEARCH_URL, {"q": "tolk"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [book["id"] for book in response.data["results"]], [self.hobbit.id]
+        )
+
+    def test_search_index_follows_updates_and_deletes(self):
+        self.hobbit.title = "The Silmarillion"
+        self.hobbit.save()
+        self.messiah.delete()
+
+        self.assertEqual(BookSearchResults("hobbit").count(), 0)
+        self.assertEqual(BookSearchResults("silmarillion").count(), 1)
+        self.assertEqual(BookSearchResults("messiah").count(), 0)
+
+    def test_search_is_paginated(self):
+        response = self.client.get(SEARCH_URL, {"q": "frank", "page_size": 1})
+
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertIsNotNone(response.data["next"])
+
+    def test_search_ignores_query_syntax(self):
+        response = self.client.get(SEARCH_URL, {"q": 'dune" (*'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+
+    def test_search_without_query(self):
+        response = self.client.get(SEARCH_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unsupported_database_falls_back_to_icontains(self):
+        with patch.object(connections["default"], "vendor", "mysql"):
+            response = self.client.get(SEARCH_URL, {"q": "dune herb"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [book["id"] for book in response.data["results"]],
+            [self.dune.id, self.messiah.id],
+        )
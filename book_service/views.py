@@ -1,9 +1,25 @@
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
-from rest_framework import viewsets
+import io
 
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from base.exports import EXPORT_FORMATS, stream_export
+from book_service.cache import catalog_cache
+from book_service.importers import (
+    IMPORT_FORMATS,
+    detect_format,
+    import_books,
+    read_rows,
+)
 from book_service.models import Book
+from book_service.pagination import BookPagination, BookSearchPagination
 from book_service.permissions import IsAdminOrReadOnly
+from book_service.search import BookSearchResults
 from book_service.serializers import BookSerializer
 
 
@@ -11,7 +27,125 @@ class BookViewSet(viewsets.ModelViewSet):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = (IsAdminOrReadOnly,)
+    pagination_class = BookPagination
+
+    @extend_schema(
+        summary="Search Books",
+        description="Full-text search over book titles and authors, "
+        "ordered by relevance.",
+        parameters=[
+            OpenApiParameter(
+                name="q",
+                description="Search query",
+                required=True,
+                type=str,
+            ),
+        ],
+    )
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path="search",
+        pagination_class=BookSearchPagination,
+    )
+    @catalog_cache
+    def search(self, request):
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            raise ValidationError({"q": "Search query is required."})
+
+        page = self.paginate_queryset(BookSearchResults(query))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @extend_schema(
+        summary="Import Books",
+        description="Upload a CSV or JSONL catalog file. Rows are validated and "
+        "upserted by title, author and cover in batches; a failed batch stops the "
+        "import and `last_committed_row` can be passed back as `resume_from`.",
+        request={
+            "multipart/form-data": {
+                "type": "object",
+                "properties": {
+                    "file": {"type": "string", "format": "binary"},
+                    "file_format": {"type": "string", "enum": list(IMPORT_FORMATS)},
+                    "batch_size": {"type": "integer"},
+                    "resume_from": {"type": "integer"},
+                },
+                "required": ["file"],
+            }
+        },
+        responses={200: None},
+    )
+    @action(
+        detail=False,
+        methods=["POST"],
+        url_path="import",
+        parser_classes=[MultiPartParser],
+        permission_classes=[IsAdminUser],
+    )
+    def import_catalog(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            raise ValidationError({"file": "A CSV or JSONL file is required."})
+
+        file_format = request.data.get("file_format") or detect_format(upload.name)
+        if file_format not in IMPORT_FORMATS:
+            raise ValidationError({"file_format": f"Use one of {IMPORT_FORMATS}."})
+
+        try:
+            batch_size = int(request.data.get("batch_size", 1000))
+            resume_from = int(request.data.get("resume_from", 0))
+        except ValueError:
+            raise ValidationError("batch_size and resume_from must be integers.")
+
+        stream = io.TextIOWrapper(upload, encoding="utf-8", newline="")
+        try:
+            report = import_books(
+                read_rows(stream, file_format),
+                batch_size=max(batch_size, 1),
+                resume_from=max(resume_from, 0),
+            )
+        except (UnicodeDecodeError, ValueError) as error:
+            raise ValidationError({"file": f"Could not read file: {error}"})
+
+        return Response(report.as_dict(), status=status.HTTP_200_OK)
+
+    @extend_schema(
+        summary="Export Books",
+        description="Stream the whole catalog as NDJSON or CSV (staff only).",
+        parameters=[
+            OpenApiParameter(
+                name="file_format",
+                description="Export format",
+                required=False,
+                type=str,
+                enum=list(EXPORT_FORMATS),
+            ),
+        ],
+        responses={200: None},
+    )
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path="export",
+        permission_classes=[IsAdminUser],
+    )
+    def export(self, request):
+        return stream_export(
+            request,
+            self.filter_queryset(self.get_queryset()).order_by("id"),
+            columns=[
+                (name, name)
+                for name in ("id", "title", "author", "cover", "inventory", "daily_fee")
+            ],
+            filename="books",
+        )
+
+    @catalog_cache
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
-    @method_decorator(cache_page(60 * 5, key_prefix="book_view"))
-    def dispatch(self, request, *args, **kwargs):
-        return super().dispatch(request, *args, **kwargs)
+    @catalog_cache
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
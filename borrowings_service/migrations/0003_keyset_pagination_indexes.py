@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("book_service", "0004_keyset_pagination_indexes"),
+        ("borrowings_service", "0002_alter_borrowing_book_alter_borrowing_user"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="borrowing",
+            index=models.Index(
+                fields=["borrow_date", "id"], name="borrowing_borrow_date_id_idx"
+            ),
+        ),
+    ]
@@ -1,10 +1,31 @@
 from django.conf import settings
-from django.db import models
+from django.contrib.auth import get_user_model
+from django.db import models, transaction
 from django.utils import timezone
 
 from book_service.models import Book
 
 
+class BorrowingQuerySet(models.QuerySet):
+    """
+    Deleting borrowings cascades to their payments without going through
+    PaymentQuerySet, so the borrowers' pending flags are refreshed here.
+    """
+
+    def delete(self):
+        from payment.models import lock_users, refresh_pending_payment_flags
+
+        with transaction.atomic():
+            users = lock_users(
+                get_user_model().objects.filter(
+                    pk__in=set(self.values_list("user_id", flat=True))
+                )
+            )
+            deleted = super().delete()
+            refresh_pending_payment_flags(users)
+        return deleted
+
+
 class Borrowing(models.Model):
     borrow_date = models.DateField(default=timezone.now)
     expected_return_date = models.DateField()
@@ -14,6 +35,17 @@ class Borrowing(models.Model):
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="borrowings"
     )
 
+    objects = BorrowingQuerySet.as_manager()
+
+    def delete(self, *args, **kwargs):
+        from payment.models import lock_users, refresh_pending_payment_flags
+
+        with transaction.atomic():
+            borrower = lock_users(get_user_model().objects.filter(pk=self.user_id))
+            deleted = super().delete(*args, **kwargs)
+            refresh_pending_payment_flags(borrower)
+        return deleted
+
     @property
     def is_active(self):
         return self.actual_return_date is None
@@ -28,3 +60,19 @@ class Borrowing(models.Model):
                 name="expected_return_after_borrow",
             )
         ]
+        indexes = [
+            models.Index(
+                fields=["borrow_date", "id"], name="borrowing_borrow_date_id_idx"
+            ),
+            models.Index(fields=["expected_return_date"], name="borrowing_due_idx"),
+            models.Index(
+                fields=["user", "expected_return_date"],
+                condition=models.Q(actual_return_date__isnull=True),
+                name="borrowing_active_user_idx",
+            ),
+            models.Index(
+                fields=["expected_return_date"],
+                condition=models.Q(actual_return_date__isnull=True),
+                name="borrowing_active_due_idx",
+            ),
+        ]
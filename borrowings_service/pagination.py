@@ -0,0 +1,5 @@
+from base.pagination import KeysetPagination
+
+
+class BorrowingPagination(KeysetPagination):
+    ordering = ("-borrow_date", "-id")
@@ -38,6 +38,8 @@ class BorrowingCreateSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         book = data["book"]
-        if book.inventory <= 0:
+        # Book.inventory of a sharded title is only a periodic snapshot of
+        # its shards; the reservation in perform_create decides for those.
+        if not book.shard_count and book.inventory <= 0:
             raise ValidationError("Book inventory is not sufficient.")
         return data
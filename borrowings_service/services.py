@@ -1,12 +1,20 @@
+from django.contrib.auth import get_user_model
 from rest_framework.exceptions import ValidationError
 
 
 def validate_user_payments(request):
-    user = request.user
+    """
+    Refuse a new borrowing while the user has a pending payment.
 
-    borrowings = user.borrowings.all()
-
-    for borrowing in borrowings:
-        payments = borrowing.payments.filter(status="PENDING")
-        if payments.exists():
-            raise ValidationError("You have unpaid bills")
+    Reads the denormalized User.has_pending_payments flag, kept in sync by
+    Payment writes, with one primary-key lookup, instead of walking the
+    user's borrowing history. The row is read fresh rather than trusted
+    from request.user, which may have been loaded before the last payment.
+    """
+    has_pending = (
+        get_user_model()
+        .objects.filter(pk=request.user.pk, has_pending_payments=True)
+        .exists()
+    )
+    if has_pending:
+        raise ValidationError("You have unpaid bills")
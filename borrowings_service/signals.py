@@ -1,16 +1,13 @@
-from celery import shared_task
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
 from borrowings_service.models import Borrowing
+from library_bot.outbox import enqueue_message
 
 
-@shared_task
 @receiver(post_save, sender=Borrowing)
 def send_notification_on_borrowing_created(sender, instance, created, **kwargs):
     if created:
-        from library_bot.bot import bot, CHAT_ID
-
         text = (
             f"New borrowing was created:\n"
             f"Borrow date: {instance.borrow_date}\n"
@@ -19,4 +16,4 @@ def send_notification_on_borrowing_created(sender, instance, created, **kwargs):
             f"User email: {instance.user.email}"
         )
 
-        bot.send_message(CHAT_ID, text)
+        enqueue_message(text)
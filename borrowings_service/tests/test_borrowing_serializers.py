@@ -5,6 +5,7 @@ from django.test import TestCase
 from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
+from book_service.inventory import shard_inventory
 from book_service.models import Book
 from borrowings_service.models import Borrowing
 from borrowings_service.serializers import (
@@ -65,3 +66,17 @@ class BorrowingSerializerTests(TestCase):
 
         with self.assertRaises(ValidationError):
             serializer.is_valid(raise_exception=True)
+
+    def test_create_serializer_leaves_sharded_stock_to_reservation(self):
+        book = shard_inventory(self.book, 2)
+        Book.objects.filter(pk=book.pk).update(inventory=0)
+
+        serializer = BorrowingCreateSerializer(
+            data={
+                "expected_return_date": timezone.now().date()
+                + timezone.timedelta(days=7),
+                "book": book.id,
+            }
+        )
+
+        self.assertTrue(serializer.is_valid())
@@ -6,14 +6,16 @@ from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient, APITestCase
 
+from base.testing import QueryBudgetMixin
 from book_service.models import Book
 from borrowings_service.models import Borrowing
+from borrowings_service.services import validate_user_payments
 from payment.models import Payment
 
 User = get_user_model()
 
 
-class BorrowingViewsTests(APITestCase):
+class BorrowingViewsTests(QueryBudgetMixin, APITestCase):
     def setUp(self):
         self.client = APIClient()
         self.user = User.objects.create_user(
@@ -69,6 +71,57 @@ class BorrowingViewsTests(APITestCase):
         response = self.client.post("/api/borrowings/", data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    @patch("django.db.models.signals.ModelSignal.send")
+    def test_delete_borrowing_clears_pending_flag(self, mock_signal):
+        borrowing = Borrowing.objects.create(
+            expected_return_date=timezone.now().date() + timezone.timedelta(days=7),
+            book=self.book,
+            user=self.user,
+        )
+        Payment.objects.create(
+            status="PENDING",
+            type="PAYMENT",
+            borrowing=borrowing,
+            session_url="url",
+            session_id="id",
+            money_to_pay=Decimal("10"),
+        )
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.has_pending_payments)
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.delete(f"/api/borrowings/{borrowing.id}/")
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.has_pending_payments)
+
+    @patch("django.db.models.signals.ModelSignal.send")
+    def test_bulk_delete_borrowings_clears_pending_flag(self, mock_signal):
+        borrowing = Borrowing.objects.create(
+            expected_return_date=timezone.now().date() + timezone.timedelta(days=7),
+            book=self.book,
+            user=self.user,
+        )
+        Payment.objects.create(
+            status="PENDING",
+            type="PAYMENT",
+            borrowing=borrowing,
+            session_url="url",
+            session_id="id",
+            money_to_pay=Decimal("10"),
+        )
+
+        Borrowing.objects.filter(user=self.user).delete()
+
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.has_pending_payments)
+
+    def test_unpaid_bills_check_is_single_query(self):
+        request = type("Request", (), {"user": self.user})()
+        with self.assertNumQueries(1):
+            validate_user_payments(request)
+
     def test_permission_for_admin(self):
         self.client.force_authenticate(user=self.admin)
         response = self.client.get(f"/api/borrowings/?user_id={self.user.id}")
@@ -90,7 +143,7 @@ class BorrowingViewsTests(APITestCase):
         )
         response = self.client.get("/api/borrowings/?is_active=true")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
     @patch("django.db.models.signals.ModelSignal.send")
     def test_filter_is_not_active(self, mock_signal):
@@ -104,7 +157,7 @@ class BorrowingViewsTests(APITestCase):
         )
         response = self.client.get("/api/borrowings/?is_active=false")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
     @patch("django.db.models.signals.ModelSignal.send")
     def test_return_borrowing_success(self, mock_signal):
@@ -167,3 +220,78 @@ class BorrowingViewsTests(APITestCase):
         self.assertEqual(self.book.inventory, initial_inventory + 1)
         borrowing.refresh_from_db()
         self.assertIsNotNone(borrowing.actual_return_date)
+
+    @patch("django.db.models.signals.ModelSignal.send")
+    def test_list_borrowings_paginated_with_ordering(self, mock_signal):
+        self.client.force_authenticate(user=self.admin)
+        today = timezone.now().date()
+        for days in (3, 1, 2, 1):
+            Borrowing.objects.create(
+                borrow_date=today - timezone.timedelta(days=days),
+                expected_return_date=today + timezone.timedelta(days=7),
+                book=self.book,
+                user=self.user,
+            )
+
+        ids = []
+        url = "/api/borrowings/?ordering=borrow_date&page_size=3"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(borrowing["id"] for borrowing in response.data["results"])
+            url = response.data["next"]
+
+        expected = list(
+            Borrowing.objects.order_by("borrow_date", "id").values_list("id", flat=True)
+        )
+        self.assertEqual(ids, expected)
+
+    @patch("django.db.models.signals.ModelSignal.send")
+    def test_export_borrowings_csv(self, mock_signal):
+        Borrowing.objects.create(
+            expected_return_date=timezone.now().date() + timezone.timedelta(days=7),
+            book=self.book,
+            user=self.user,
+        )
+        self.client.force_authenticate(user=self.admin)
+
+        response = self.client.get("/api/borrowings/export/?file_format=csv")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn(self.user.email, lines[1])
+
+    def test_export_borrowings_as_user(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get("/api/borrowings/export/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @patch("django.db.models.signals.ModelSignal.send")
+    def test_list_borrowings_query_budget(self, mock_signal):
+        self.client.force_authenticate(user=self.admin)
+        for rows in (5, 25):
+            for _ in range(rows - Borrowing.objects.count()):
+                borrowing = Borrowing.objects.create(
+                    expected_return_date=timezone.now().date()
+                    + timezone.timedelta(days=7),
+                    book=self.book,
+                    user=self.user,
+                )
+                Payment.objects.create(
+                    status="PAID",
+                    type="PAYMENT",
+                    borrowing=borrowing,
+                    session_url="url",
+                    session_id=f"session-{borrowing.id}",
+                    money_to_pay=Decimal("10"),
+                )
+
+            with self.assertQueryBudget(2):
+                response = self.client.get("/api/borrowings/?page_size=100")
+
+            self.assertEqual(len(response.data["results"]), rows)
+            self.assertEqual(
+                response.data["results"][0]["payments"][0]["user_email"],
+                self.user.email,
+            )
@@ -2,18 +2,19 @@ from django.db import transaction
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.utils import timezone
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
 from rest_framework import filters, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.generics import get_object_or_404
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 
+from base.exports import EXPORT_FORMATS, stream_export
+from book_service.inventory import release_copy, reserve_copy
 from borrowings_service.models import Borrowing
+from borrowings_service.pagination import BorrowingPagination
 from borrowings_service.serializers import (
     BorrowingCreateSerializer,
     BorrowingSerializer,
@@ -57,11 +58,16 @@ class BorrowingViewSet(viewsets.ModelViewSet):
     serializer_class = BorrowingSerializer
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ["user", "actual_return_date"]
+    ordering_fields = ["borrow_date", "expected_return_date", "id"]
+    ordering = ["-borrow_date"]
+    pagination_class = BorrowingPagination
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         user = self.request.user
-        queryset = Borrowing.objects.all()
+        queryset = Borrowing.objects.select_related("book", "user").prefetch_related(
+            "payments"
+        )
         is_active = self.request.query_params.get("is_active")
         user_id = self.request.query_params.get("user_id")
 
@@ -89,9 +95,10 @@ class BorrowingViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         validate_user_payments(self.request)
         book = serializer.validated_data["book"]
-        book.inventory -= 1
-        book.save()
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            if not reserve_copy(book):
+                raise ValidationError("Book inventory is not sufficient.")
+            serializer.save(user=self.request.user)
 
     @extend_schema(
         summary="Return Borrowed Book",
@@ -118,15 +125,53 @@ class BorrowingViewSet(viewsets.ModelViewSet):
             )
 
         with transaction.atomic():
-            book = borrowing.book
-            book.inventory += 1
-            book.save()
+            returned = Borrowing.objects.filter(
+                pk=borrowing.pk, actual_return_date__isnull=True
+            ).update(actual_return_date=timezone.now().date())
+            if not returned:
+                raise ValidationError("This book has already been returned.")
+            release_copy(borrowing.book)
 
-            borrowing.actual_return_date = timezone.now().date()
-            borrowing.save()
+        borrowing = Borrowing.objects.select_related("book").get(pk=borrowing.pk)
 
         return Response(self.get_serializer(borrowing).data, status=status.HTTP_200_OK)
 
-    @method_decorator(cache_page(60 * 5, key_prefix="borrowing_view"))
-    def dispatch(self, request, *args, **kwargs):
-        return super().dispatch(request, *args, **kwargs)
+    @extend_schema(
+        summary="Export Borrowings",
+        description="Stream borrowings as NDJSON or CSV (staff only). "
+        "Accepts the same filters as the list endpoint.",
+        parameters=[
+            OpenApiParameter(
+                name="file_format",
+                description="Export format",
+                required=False,
+                type=str,
+                enum=list(EXPORT_FORMATS),
+            ),
+        ],
+        responses={200: None},
+    )
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="export",
+        permission_classes=[IsAdminUser],
+    )
+    def export(self, request):
+        return stream_export(
+            request,
+            self.filter_queryset(self.get_queryset())
+            .prefetch_related(None)
+            .order_by("id"),
+            columns=[
+                ("id", "id"),
+                ("borrow_date", "borrow_date"),
+                ("expected_return_date", "expected_return_date"),
+                ("actual_return_date", "actual_return_date"),
+                ("book_id", "book_id"),
+                ("book_title", "book__title"),
+                ("user_id", "user_id"),
+                ("user_email", "user__email"),
+            ],
+            filename="borrowings",
+        )
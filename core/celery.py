@@ -18,4 +18,40 @@ app.conf.beat_schedule = {
         "task": "payment.tasks.check_expired_sessions",
         "schedule": crontab(minute="*"),
     },
+    "flush-inventory-shards": {
+        "task": "book_service.tasks.flush_inventory_shards",
+        "schedule": 10.0,
+    },
+    "accrue-fines-nightly": {
+        "task": "payment.tasks.accrue_fines_nightly",
+        "schedule": crontab(hour=0, minute=5),
+    },
+    "reconcile-payments-nightly": {
+        "task": "payment.tasks.reconcile_payments_nightly",
+        "schedule": crontab(hour=1, minute=0),
+    },
+    "process-stripe-events": {
+        "task": "payment.tasks.process_stripe_events",
+        "schedule": 5.0,
+    },
+    "check-overdue-borrowings": {
+        "task": "library_bot.tasks.check_overdue",
+        "schedule": crontab(hour=9, minute=0),
+    },
+    "refresh-bot-stats": {
+        "task": "library_bot.tasks.refresh_bot_stats",
+        "schedule": 60.0,
+    },
+    "drain-telegram-outbox": {
+        "task": "library_bot.tasks.drain_telegram_outbox",
+        "schedule": 5.0,
+    },
+    "purge-telegram-outbox": {
+        "task": "library_bot.tasks.purge_telegram_outbox",
+        "schedule": crontab(hour=3, minute=30),
+    },
+    "flush-telegram-digests": {
+        "task": "library_bot.tasks.flush_telegram_digests",
+        "schedule": 5.0,
+    },
 }
@@ -22,6 +22,27 @@ load_dotenv()
 
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
 STRIPE_PUBLISHABLE_KEY = os.getenv("STRIPE_PUBLISHABLE_KEY")
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "")
+
+PAYMENT_GATEWAY = {
+    "BACKEND": "payment.resilience.ResilientGateway",
+    "OPTIONS": {
+        "gateway": {
+            "BACKEND": os.getenv(
+                "PAYMENT_GATEWAY_BACKEND", "payment.gateways.StripeGateway"
+            ),
+        },
+        "failure_threshold": 5,
+        "recovery_timeout": 30.0,
+        "max_concurrent": 10,
+        "acquire_timeout": 0.5,
+    },
+}
+
+TELEGRAM_WEBHOOK = {
+    "SECRET": os.getenv("TELEGRAM_WEBHOOK_SECRET", ""),
+    "WORKERS": 8,
+}
 
 
 # Quick-start development settings - unsuitable for production
@@ -134,11 +155,16 @@ AUTH_USER_MODEL = "user.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "user.authentication.ClaimsJWTAuthentication",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
 
+SIMPLE_JWT = {
+    "TOKEN_OBTAIN_SERIALIZER": "user.serializers.ClaimsTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "user.serializers.ClaimsTokenRefreshSerializer",
+}
+
 
 SPECTACULAR_SETTINGS = {
     "TITLE": "Library Service API",
@@ -21,6 +21,10 @@ CACHES = {
     }
 }
 
+TELEGRAM_DISPATCHER = {
+    "REDIS_URL": "redis://localhost:6379/2",
+}
+
 CELERY_BROKER_URL = "redis://localhost:6379/0"
 CELERY_RESULT_BACKEND = "redis://localhost:6379/0"
 CELERY_ACCEPT_CONTENT = ["json"]
@@ -29,3 +33,6 @@ CELERY_TIMEZONE = "UTC"
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
 CELERY_WORKER_CONCURRENCY = 6
+CELERY_TASK_ROUTES = {
+    "payment.tasks.create_checkout_session": {"queue": "payments"},
+}
@@ -25,6 +25,10 @@ CACHES = {
     }
 }
 
+TELEGRAM_DISPATCHER = {
+    "REDIS_URL": "redis://redis:6379/2",
+}
+
 CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL")
 CELERY_RESULT_BACKEND = os.environ.get("CELERY_BACKEND_URL")
 CELERY_ACCEPT_CONTENT = ["json"]
@@ -33,3 +37,6 @@ CELERY_TIMEZONE = "UTC"
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
 CELERY_WORKER_CONCURRENCY = 6
+CELERY_TASK_ROUTES = {
+    "payment.tasks.create_checkout_session": {"queue": "payments"},
+}
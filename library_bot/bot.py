@@ -1,6 +1,4 @@
-import asyncio
 import os
-import time
 
 import telebot
 
@@ -16,51 +14,68 @@ bot = telebot.TeleBot(TOKEN)
 CHAT_ID = -1002341988404
 
 
-@bot.message_handler(commands=["get_id"])
-def get_id(message):
-    bot.send_message(message.chat.id, message.chat.id)
+OVERDUE_HEADER = "Overdue borrowings:\n"
+OVERDUE_CHUNK_SIZE = 2000
 
 
-def get_text_about_overdue_borrowings():
+def iter_overdue_entries(today=None):
+    """
+    One text entry per active overdue borrowing, most overdue first, with
+    a heading whenever the number of days overdue changes. Rows are read
+    as plain tuples through a server-side cursor on PostgreSQL.
+    """
     from borrowings_service.models import Borrowing
 
-    max_length = 4096
-    messages = []
+    today = today or timezone.now().date()
+    rows = (
+        Borrowing.objects.filter(
+            actual_return_date__isnull=True, expected_return_date__lt=today
+        )
+        .order_by("expected_return_date", "pk")
+        .values_list("expected_return_date", "book__title", "user__email")
+        .iterator(chunk_size=OVERDUE_CHUNK_SIZE)
+    )
 
-    text = "Such borrows was overdue:\n"
-    for borrow in Borrowing.objects.select_related("book", "user").filter(
-        expected_return_date=timezone.now().date() - timezone.timedelta(days=1)
-    ):
-        if borrow:
-            borrow_message = (
-                f"Book: {borrow.book.title}\n"
-                f"User email: {borrow.user.email}\n"
-                f"Expected return date: {borrow.expected_return_date}\n"
-                f"---------------------------------------\n"
-            )
+    current = None
+    for expected_return_date, title, email in rows:
+        if expected_return_date != current:
+            current = expected_return_date
+            days = (today - expected_return_date).days
+            yield f"\nOverdue by {days} day{'s' if days != 1 else ''}:\n"
+        yield (
+            f"Book: {title}\n"
+            f"User email: {email}\n"
+            f"Expected return date: {expected_return_date}\n"
+            f"---------------------------------------\n"
+        )
 
-            if len(text + borrow_message) > max_length:
-                messages.append(text)
-                text = ""
-            text += borrow_message
 
-    messages.append(text)
-    return messages
+def get_text_about_overdue_borrowings(today=None):
+    """Overdue report messages, packed to Telegram's limit and yielded lazily."""
+    from library_bot.digest import pack_messages
 
+    return pack_messages(iter_overdue_entries(today), header=OVERDUE_HEADER)
 
-def send_notification_on_borrowing_overdue():
-    messages = get_text_about_overdue_borrowings()
 
-    if len(messages[0]) < 40:
-        bot.send_message(CHAT_ID, "No borrowings overdue today!")
-        time.sleep(0.25)
-    else:
-        for message in messages:
-            bot.send_message(CHAT_ID, message)
-            time.sleep(0.25)
+def send_notification_on_borrowing_overdue():
+    """
+    Stream the overdue report to the dispatcher queue, a batch at a time,
+    so memory stays flat however many borrowings are overdue. Returns the
+    number of messages queued.
+    """
+    from library_bot.dispatcher import push_messages
+
+    queued = push_messages(
+        (CHAT_ID, message) for message in get_text_about_overdue_borrowings()
+    )
+    if not queued:
+        queued = push_messages([(CHAT_ID, "No borrowings overdue today!")])
+    return queued
 
 
 def send_notification_on_success_payment(payment):
+    from library_bot.outbox import enqueue_message
+
     text = (
         f"Payment was successfully completed:\n"
         f"Payment status:{payment.status}\n"
@@ -68,18 +83,4 @@ def send_notification_on_success_payment(payment):
         f"Money payed: {payment.money_to_pay}\n"
         f"Session id: {payment.session_id}\n"
     )
-    bot.send_message(CHAT_ID, text)
-    time.sleep(0.25)
-
-
-async def poll():
-    while True:
-        try:
-            await bot.polling(non_stop=True)
-        except Exception as e:
-            print(f"Error occurred: {e}")
-            await asyncio.sleep(5)
-
-
-if __name__ == "__main__":
-    asyncio.run(poll())
+    enqueue_message(text)
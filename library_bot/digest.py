@@ -0,0 +1,153 @@
+import time
+from collections import defaultdict
+
+from library_bot.dispatcher import dispatcher_settings, get_queue, push_messages
+
+TELEGRAM_MAX_LENGTH = 4096
+DIGEST_SEPARATOR = "---------------------------------------\n"
+
+
+def chats_key(prefix):
+    return f"{prefix}:chats"
+
+
+def events_key(prefix, chat_id):
+    return f"{prefix}:{chat_id}"
+
+
+def since_key(prefix, chat_id):
+    return f"{prefix}:{chat_id}:since"
+
+
+def staged_key(prefix, chat_id):
+    return f"{prefix}:{chat_id}:staged"
+
+
+# Moves a chat's buffer aside, unless an earlier flush that failed left
+# events staged, and returns what is staged.
+STAGE_EVENTS = """
+if redis.call('EXISTS', KEYS[3]) == 0 and redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('RENAME', KEYS[1], KEYS[3])
+    redis.call('DEL', KEYS[2])
+end
+return redis.call('LRANGE', KEYS[3], 0, -1)
+"""
+
+# Drops the staged events and unlists the chat unless more came in.
+UNSTAGE_EVENTS = """
+redis.call('DEL', KEYS[2])
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('SREM', KEYS[3], ARGV[1])
+end
+"""
+
+
+def pack_messages(entries, header="", limit=TELEGRAM_MAX_LENGTH):
+    """
+    Pack `entries` in order into as few messages of at most `limit`
+    characters as possible, each starting with `header`, and yield them
+    one by one. An entry too long for a message of its own is cut into
+    pieces. Parts are joined once per message, so the work is linear and
+    only one message is held at a time.
+    """
+    room = limit - len(header)
+    parts, size = [], 0
+    for entry in entries:
+        for start in range(0, len(entry), room):
+            piece = entry[start : start + room]
+            if parts and size + len(piece) > room:
+                yield header + "".join(parts)
+                parts, size = [], 0
+            parts.append(piece)
+            size += len(piece)
+    if parts:
+        yield header + "".join(parts)
+
+
+def buffer_events(events):
+    """
+    Add (chat_id, text) notifications to the per-chat digest buffers in one
+    round trip. A chat whose buffer reaches DIGEST_MAX_EVENTS is flushed
+    straight away; the rest wait for flush_digests().
+    """
+    config = dispatcher_settings()
+    prefix = config["DIGEST_KEY"]
+    by_chat = defaultdict(list)
+    for chat_id, text in events:
+        by_chat[chat_id].append(text)
+    if not by_chat:
+        return 0
+
+    pipe = get_queue().pipeline()
+    for chat_id, texts in by_chat.items():
+        pipe.rpush(events_key(prefix, chat_id), *texts)
+        pipe.set(since_key(prefix, chat_id), time.time(), nx=True)
+        pipe.sadd(chats_key(prefix), chat_id)
+    lengths = pipe.execute()[::3]
+
+    for chat_id, length in zip(by_chat, lengths):
+        if length >= config["DIGEST_MAX_EVENTS"]:
+            flush_digest(chat_id)
+    return sum(len(texts) for texts in by_chat.values())
+
+
+def flush_digest(chat_id):
+    """
+    Hand everything buffered for `chat_id` to the dispatcher as packed
+    digest messages and return the number of messages.
+
+    The buffer is first moved atomically to a staging list, which is only
+    dropped once the messages are pushed. If the push fails, the events
+    stay staged and the chat stays listed, so the next flush sends them;
+    a push that fails halfway may send part of a digest twice.
+    """
+    prefix = dispatcher_settings()["DIGEST_KEY"]
+    queue = get_queue()
+    events = queue.register_script(STAGE_EVENTS)(
+        keys=[
+            events_key(prefix, chat_id),
+            since_key(prefix, chat_id),
+            staged_key(prefix, chat_id),
+        ]
+    )
+    events = [event.decode() for event in events]
+    pushed = 0
+    if events:
+        header = f"Library digest, {len(events)} events:\n{DIGEST_SEPARATOR}"
+        messages = pack_messages(
+            (event.rstrip("\n") + "\n" + DIGEST_SEPARATOR for event in events),
+            header,
+        )
+        pushed = push_messages((int(chat_id), message) for message in messages)
+
+    queue.register_script(UNSTAGE_EVENTS)(
+        keys=[
+            events_key(prefix, chat_id),
+            staged_key(prefix, chat_id),
+            chats_key(prefix),
+        ],
+        args=[chat_id],
+    )
+    return pushed
+
+
+def flush_digests(force=False):
+    """
+    Flush every chat whose oldest buffered event is at least
+    DIGEST_WINDOW seconds old, or every chat when `force` is set.
+    Returns the number of digest messages queued.
+    """
+    config = dispatcher_settings()
+    prefix = config["DIGEST_KEY"]
+    queue = get_queue()
+    chats = [chat_id.decode() for chat_id in queue.smembers(chats_key(prefix))]
+    if not chats:
+        return 0
+
+    since = queue.mget([since_key(prefix, chat_id) for chat_id in chats])
+    cutoff = time.time() - config["DIGEST_WINDOW"]
+    return sum(
+        flush_digest(chat_id)
+        for chat_id, started in zip(chats, since)
+        if force or started is None or float(started) <= cutoff
+    )
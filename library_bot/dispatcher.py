@@ -0,0 +1,314 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from functools import lru_cache
+from itertools import islice
+
+import aiohttp
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from base.ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DISPATCHER = {
+    "REDIS_URL": "redis://localhost:6379/2",
+    "QUEUE_KEY": "telegram:queue",
+    "API_URL": "https://api.telegram.org",
+    # Telegram allows about 30 messages per second overall, one per second
+    # in a private chat and 20 per minute in a group or channel.
+    "GLOBAL_RATE": 30,
+    "CHAT_RATE": 1,
+    "GROUP_RATE": 20 / 60,
+    # MAX_IN_FLIGHT caps concurrent Bot API requests. A chat holds at most
+    # LANE_PREFETCH of its messages in memory; the rest wait in a per-chat
+    # Redis list, so one busy chat never stops the others being pulled.
+    "MAX_IN_FLIGHT": 100,
+    "LANE_PREFETCH": 10,
+    "MAX_ATTEMPTS": 5,
+    "CONNECTIONS": 30,
+    "SHUTDOWN_TIMEOUT": 30,
+    # Event notifications are coalesced per chat and flushed as digests
+    # once the oldest is DIGEST_WINDOW seconds old or DIGEST_MAX_EVENTS
+    # have piled up.
+    "DIGEST_KEY": "telegram:digest",
+    "DIGEST_WINDOW": 30,
+    "DIGEST_MAX_EVENTS": 50,
+}
+
+PUSH_BATCH_SIZE = 500
+
+SENT, RETRY_AFTER, TRANSIENT, REJECTED = "sent", "retry_after", "transient", "rejected"
+
+
+def dispatcher_settings():
+    return {**DEFAULT_DISPATCHER, **getattr(settings, "TELEGRAM_DISPATCHER", {})}
+
+
+def processing_key(queue_key):
+    return f"{queue_key}:processing"
+
+
+def dead_key(queue_key):
+    return f"{queue_key}:dead"
+
+
+def held_key(queue_key, chat_id):
+    return f"{queue_key}:held:{chat_id}"
+
+
+@lru_cache(maxsize=None)
+def get_queue():
+    """Synchronous Redis client the producers push with, built once."""
+    return redis.Redis.from_url(dispatcher_settings()["REDIS_URL"])
+
+
+@receiver(setting_changed)
+def reset_queue(setting, **kwargs):
+    if setting == "TELEGRAM_DISPATCHER":
+        get_queue.cache_clear()
+
+
+def push_messages(messages):
+    """
+    Hand (chat_id, text) pairs to the dispatcher and return at once.
+    Delivery, throttling and retries happen in the dispatcher process.
+    `messages` may be any iterable; it is pushed PUSH_BATCH_SIZE at a time.
+    """
+    queue_key = dispatcher_settings()["QUEUE_KEY"]
+    messages = iter(messages)
+    pushed = 0
+    while batch := list(islice(messages, PUSH_BATCH_SIZE)):
+        get_queue().lpush(
+            queue_key,
+            *(json.dumps({"chat_id": chat_id, "text": text}) for chat_id, text in batch),
+        )
+        pushed += len(batch)
+    return pushed
+
+
+def push_message(text, chat_id=None):
+    if chat_id is None:
+        from library_bot.bot import CHAT_ID
+
+        chat_id = CHAT_ID
+    return push_messages([(chat_id, text)])
+
+
+class TelegramDispatcher:
+    """
+    Sends queued messages through the Bot API from a single asyncio loop.
+
+    Messages are moved atomically from the Redis queue to a processing
+    list and removed from it only once they are delivered or given up, so
+    a crash loses nothing: the next start puts them back on the queue.
+    Run one dispatcher per queue.
+
+    Each chat gets its own lane, which keeps its messages in order and
+    waits on the chat's token bucket, then on the global one. A lane holds
+    up to LANE_PREFETCH messages; further ones for the chat are parked in
+    its held list and pulled back in as the lane drains. A 429 pauses
+    only the chat that got it for the `retry_after` Telegram asks for.
+    Network and 5xx errors are retried with backoff; anything else (or
+    MAX_ATTEMPTS failures) goes to the dead-letter list. One aiohttp
+    session keeps the connections to the API alive between messages.
+    """
+
+    def __init__(self, token=None, clock=time.monotonic, **options):
+        config = {**dispatcher_settings(), **options}
+        if token is None:
+            from library_bot.bot import TOKEN
+
+            token = TOKEN
+        self.url = f"{config['API_URL']}/bot{token}/sendMessage"
+        self.queue_key = config["QUEUE_KEY"]
+        self.redis_url = config["REDIS_URL"]
+        self.chat_rate = config["CHAT_RATE"]
+        self.group_rate = config["GROUP_RATE"]
+        self.max_attempts = config["MAX_ATTEMPTS"]
+        self.max_in_flight = config["MAX_IN_FLIGHT"]
+        self.lane_prefetch = config["LANE_PREFETCH"]
+        self.connections = config["CONNECTIONS"]
+        self.shutdown_timeout = config["SHUTDOWN_TIMEOUT"]
+        self.clock = clock
+        self.global_bucket = TokenBucket(
+            config["GLOBAL_RATE"], capacity=config["GLOBAL_RATE"], clock=clock
+        )
+        self.buckets = {}
+        self.lanes = {}
+        self.held = {}
+        self.workers = set()
+        self.sent = self.failed = 0
+
+    def bucket(self, chat_id):
+        if chat_id not in self.buckets:
+            # Groups and channels have negative ids and a stricter limit.
+            rate = self.group_rate if int(chat_id) < 0 else self.chat_rate
+            self.buckets[chat_id] = TokenBucket(rate, clock=self.clock)
+        return self.buckets[chat_id]
+
+    def forget_bucket(self, chat_id):
+        """Drop an idle chat's bucket; a full one is the same as a new one."""
+        bucket = self.buckets.get(chat_id)
+        if chat_id not in self.lanes and bucket is not None and bucket.is_full():
+            del self.buckets[chat_id]
+
+    async def run(self, stop=None, stop_when_idle=False):
+        stop = stop or asyncio.Event()
+        self.slots = asyncio.Semaphore(self.max_in_flight)
+        self.redis = aioredis.Redis.from_url(self.redis_url)
+        connector = aiohttp.TCPConnector(limit=self.connections, keepalive_timeout=60)
+        timeout = aiohttp.ClientTimeout(total=30)
+        try:
+            async with aiohttp.ClientSession(
+                connector=connector, timeout=timeout
+            ) as self.http:
+                await self.recover()
+                while not stop.is_set():
+                    raw = await self.redis.blmove(
+                        self.queue_key,
+                        processing_key(self.queue_key),
+                        1,
+                        src="RIGHT",
+                        dest="LEFT",
+                    )
+                    if raw is None:
+                        if stop_when_idle and not self.lanes:
+                            break
+                        continue
+                    await self.route(raw)
+                await self.shutdown()
+        finally:
+            await self.redis.aclose()
+        return self.sent, self.failed
+
+    async def recover(self):
+        """Requeue whatever a previous run left held or half-sent, in order."""
+        async for key in self.redis.scan_iter(match=held_key(self.queue_key, "*")):
+            while await self.redis.lmove(key, self.queue_key, "RIGHT", "RIGHT"):
+                pass
+        while await self.redis.lmove(
+            processing_key(self.queue_key), self.queue_key, "LEFT", "RIGHT"
+        ):
+            pass
+
+    async def shutdown(self):
+        """Let the lanes finish, then cancel them; their messages get requeued."""
+        if self.workers:
+            _, pending = await asyncio.wait(
+                self.workers, timeout=self.shutdown_timeout
+            )
+            for worker in pending:
+                worker.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def route(self, raw):
+        message = json.loads(raw)
+        chat_id = message["chat_id"]
+        pending = self.lanes.get(chat_id)
+        if pending is None:
+            self.start_lane(chat_id, deque([(raw, message)]))
+        elif len(pending) < self.lane_prefetch and not self.held.get(chat_id):
+            pending.append((raw, message))
+        else:
+            await self.hold(chat_id, raw)
+
+    def start_lane(self, chat_id, pending):
+        self.lanes[chat_id] = pending
+        worker = asyncio.create_task(self.lane(chat_id))
+        self.workers.add(worker)
+        worker.add_done_callback(self.workers.discard)
+
+    async def hold(self, chat_id, raw):
+        """Park a message behind the chat's full lane until it has room."""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrem(processing_key(self.queue_key), 1, raw)
+            pipe.rpush(held_key(self.queue_key, chat_id), raw)
+            await pipe.execute()
+        self.held[chat_id] = self.held.get(chat_id, 0) + 1
+        # The lane may have drained while the message was being parked.
+        if chat_id not in self.lanes:
+            self.start_lane(chat_id, deque())
+
+    async def unhold(self, chat_id, pending):
+        """Pull parked messages back into the lane, oldest first."""
+        while len(pending) < self.lane_prefetch and self.held.get(chat_id):
+            raw = await self.redis.lmove(
+                held_key(self.queue_key, chat_id),
+                processing_key(self.queue_key),
+                "LEFT",
+                "LEFT",
+            )
+            self.held[chat_id] -= 1
+            if raw is None:
+                self.held[chat_id] = 0
+                break
+            pending.append((raw, json.loads(raw)))
+        if not self.held.get(chat_id):
+            self.held.pop(chat_id, None)
+
+    async def lane(self, chat_id):
+        bucket = self.bucket(chat_id)
+        pending = self.lanes[chat_id]
+        while pending or self.held.get(chat_id):
+            await self.unhold(chat_id, pending)
+            if not pending:
+                continue
+            raw, message = pending.popleft()
+            await self.deliver(bucket, message)
+            await self.redis.lrem(processing_key(self.queue_key), 1, raw)
+        del self.lanes[chat_id]
+        # The bucket was just drawn on; forget it once it has refilled.
+        asyncio.get_running_loop().call_later(
+            bucket.capacity / bucket.rate, self.forget_bucket, chat_id
+        )
+
+    async def deliver(self, bucket, message):
+        attempts = 0
+        while True:
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+            async with self.slots:
+                outcome, detail = await self.send(message)
+            if outcome == SENT:
+                self.sent += 1
+                return
+            if outcome == RETRY_AFTER:
+                bucket.block(detail)
+                continue
+            attempts += 1
+            if outcome == TRANSIENT and attempts < self.max_attempts:
+                await asyncio.sleep(min(2**attempts, 60))
+                continue
+            await self.give_up(message, detail)
+            return
+
+    async def send(self, message):
+        try:
+            async with self.http.post(
+                self.url, json={"chat_id": message["chat_id"], "text": message["text"]}
+            ) as response:
+                body = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as error:
+            return TRANSIENT, str(error) or type(error).__name__
+
+        if body.get("ok"):
+            return SENT, None
+        if response.status == 429:
+            return RETRY_AFTER, body.get("parameters", {}).get("retry_after", 1)
+        if response.status >= 500:
+            return TRANSIENT, body.get("description", "")
+        return REJECTED, body.get("description", "")
+
+    async def give_up(self, message, error):
+        self.failed += 1
+        logger.warning("Telegram message to %s dropped: %s", message["chat_id"], error)
+        await self.redis.lpush(
+            dead_key(self.queue_key), json.dumps({**message, "error": error})
+        )
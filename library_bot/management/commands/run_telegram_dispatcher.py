@@ -0,0 +1,26 @@
+import asyncio
+import signal
+
+from django.core.management.base import BaseCommand
+
+from library_bot.dispatcher import TelegramDispatcher
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver queued Telegram messages within the Bot API rate limits "
+        "until SIGINT or SIGTERM"
+    )
+
+    def handle(self, *args, **options):
+        sent, failed = asyncio.run(self.serve())
+        self.stdout.write(
+            self.style.SUCCESS(f"Stopped after {sent} messages sent, {failed} failed")
+        )
+
+    async def serve(self):
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        return await TelegramDispatcher().run(stop)
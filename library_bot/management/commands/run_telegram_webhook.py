@@ -0,0 +1,37 @@
+from aiohttp import web
+from django.core.management.base import BaseCommand
+
+from library_bot.webhook import create_app, webhook_settings
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the Telegram webhook and handle bot commands concurrently; "
+        "optionally register the public URL with Telegram first"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="0.0.0.0")
+        parser.add_argument("--port", type=int, default=8081)
+        parser.add_argument(
+            "--url",
+            help="Public base URL to register with setWebhook, e.g. https://bot.example.com",
+        )
+
+    def handle(self, *args, **options):
+        config = webhook_settings()
+        app = create_app()
+        if options["url"]:
+            from library_bot.bot import bot
+
+            bot.set_webhook(
+                url=options["url"].rstrip("/") + config["PATH"],
+                secret_token=config["SECRET"],
+            )
+        web.run_app(
+            app,
+            host=options["host"],
+            port=options["port"],
+            shutdown_timeout=config["SHUTDOWN_TIMEOUT"],
+            print=self.stdout.write,
+        )
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library_bot", "0001_outbox"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="outboxmessage",
+            index=models.Index(
+                condition=models.Q(("status", "SENT")),
+                fields=["sent_at"],
+                name="outbox_sent_idx",
+            ),
+        ),
+    ]
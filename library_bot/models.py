@@ -0,0 +1,43 @@
+from django.db import models
+from django.utils import timezone
+
+OUTBOX_STATUS_CHOICES = (
+    ("PENDING", "Pending"),
+    ("SENT", "Sent"),
+    ("FAILED", "Failed"),
+)
+
+
+class OutboxMessage(models.Model):
+    """
+    A Telegram message waiting to be delivered. Rows are written in the
+    same transaction as the change they announce and sent by a worker.
+    """
+
+    chat_id = models.BigIntegerField()
+    text = models.TextField()
+    status = models.CharField(
+        max_length=10, choices=OUTBOX_STATUS_CHOICES, default="PENDING"
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"OutboxMessage {self.pk} to {self.chat_id} ({self.status})"
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["available_at", "id"],
+                condition=models.Q(status="PENDING"),
+                name="outbox_pending_idx",
+            ),
+            models.Index(
+                fields=["sent_at"],
+                condition=models.Q(status="SENT"),
+                name="outbox_sent_idx",
+            ),
+        ]
@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from redis import RedisError
+
+from library_bot.digest import buffer_events
+from library_bot.models import OutboxMessage
+
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_MAX_BACKOFF = 15 * 60
+OUTBOX_RETENTION = timedelta(days=7)
+OUTBOX_PURGE_BATCH_SIZE = 5000
+
+
+def enqueue_message(text, chat_id=None):
+    """
+    Record a Telegram message for delivery. Call it inside the transaction
+    that makes the change, so the message exists if and only if it commits.
+    """
+    if chat_id is None:
+        from library_bot.bot import CHAT_ID
+
+        chat_id = CHAT_ID
+    return OutboxMessage.objects.create(chat_id=chat_id, text=text)
+
+
+def retry_delay(attempts):
+    """Exponential backoff: 2, 4, 8 ... seconds, capped at OUTBOX_MAX_BACKOFF."""
+    return timedelta(seconds=min(2**attempts, OUTBOX_MAX_BACKOFF))
+
+
+def drain_outbox(batch_size=OUTBOX_BATCH_SIZE, max_attempts=OUTBOX_MAX_ATTEMPTS):
+    """
+    Move one batch of due messages, oldest first, into the Telegram digest
+    buffers in a single round trip. Rows are claimed with
+    SELECT ... FOR UPDATE SKIP LOCKED, so several workers can drain in
+    parallel without buffering a message twice. If Redis cannot be
+    reached the batch is retried with backoff and given up after
+    `max_attempts`; throttling and delivery retries are the dispatcher's.
+
+    Returns (sent, failed) counts for the batch.
+    """
+    sent = failed = 0
+    with transaction.atomic():
+        batch = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(status="PENDING", available_at__lte=timezone.now())
+            .order_by("available_at", "id")[:batch_size]
+        )
+        if not batch:
+            return sent, failed
+
+        try:
+            buffer_events((message.chat_id, message.text) for message in batch)
+        except RedisError as error:
+            for message in batch:
+                message.attempts += 1
+                message.last_error = str(error)
+                if message.attempts >= max_attempts:
+                    message.status = "FAILED"
+                else:
+                    message.available_at = timezone.now() + retry_delay(
+                        message.attempts
+                    )
+            failed = len(batch)
+        else:
+            for message in batch:
+                message.status = "SENT"
+                message.sent_at = timezone.now()
+            sent = len(batch)
+
+        OutboxMessage.objects.bulk_update(
+            batch, ["status", "attempts", "available_at", "sent_at", "last_error"]
+        )
+    return sent, failed
+
+
+def purge_sent(retention=OUTBOX_RETENTION, batch_size=OUTBOX_PURGE_BATCH_SIZE):
+    """
+    Delete messages sent more than `retention` ago, `batch_size` rows per
+    DELETE so no statement holds its locks for long. FAILED rows are kept
+    for inspection. Returns the number of rows deleted.
+    """
+    old = OutboxMessage.objects.filter(
+        status="SENT", sent_at__lt=timezone.now() - retention
+    )
+    purged = 0
+    while batch := list(old.values_list("pk", flat=True)[:batch_size]):
+        purged += OutboxMessage.objects.filter(pk__in=batch).delete()[0]
+    return purged
@@ -0,0 +1,104 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+STATS_KEY = "telegram:stats"
+OVERDUE_BUCKETS = ((1, 3), (4, 7), (8, 30), (31, None))
+TOP_BOOKS_LIMIT = 10
+TOP_BOOKS_WINDOW = timedelta(days=30)
+
+
+def bucket_label(low, high):
+    return f"{low}+ days" if high is None else f"{low}-{high} days"
+
+
+def build_snapshot(today=None):
+    """
+    Aggregate the numbers staff ask the bot for: three queries, each a
+    single pass over an indexed subset of borrowings or payments.
+    """
+    from borrowings_service.models import Borrowing
+    from payment.models import Payment
+
+    today = today or timezone.now().date()
+
+    overdue_buckets = {}
+    for index, (low, high) in enumerate(OVERDUE_BUCKETS):
+        condition = Q(expected_return_date__lte=today - timedelta(days=low))
+        if high is not None:
+            condition &= Q(expected_return_date__gte=today - timedelta(days=high))
+        overdue_buckets[f"overdue_{index}"] = Count("pk", filter=condition)
+
+    borrowings = Borrowing.objects.filter(actual_return_date__isnull=True).aggregate(
+        active=Count("pk"),
+        overdue=Count("pk", filter=Q(expected_return_date__lt=today)),
+        **overdue_buckets,
+    )
+    payments = Payment.objects.pending().aggregate(
+        count=Count("pk"), total=Sum("money_to_pay")
+    )
+    top_books = (
+        Borrowing.objects.filter(borrow_date__gte=today - TOP_BOOKS_WINDOW)
+        .values_list("book__title")
+        .annotate(borrowed=Count("pk"))
+        .order_by("-borrowed", "book__title")[:TOP_BOOKS_LIMIT]
+    )
+
+    return {
+        "generated_at": timezone.now().isoformat(timespec="seconds"),
+        "active_borrowings": borrowings["active"],
+        "overdue_borrowings": borrowings["overdue"],
+        "overdue_by_days": {
+            bucket_label(low, high): borrowings[f"overdue_{index}"]
+            for index, (low, high) in enumerate(OVERDUE_BUCKETS)
+        },
+        "pending_payments": payments["count"],
+        "pending_amount": f"{payments['total'] or 0:.2f}",
+        "top_books": [list(row) for row in top_books],
+    }
+
+
+def refresh_stats_snapshot():
+    """Rebuild the snapshot and publish it for the bot, with no expiry."""
+    snapshot = build_snapshot()
+    cache.set(STATS_KEY, snapshot, timeout=None)
+    return snapshot
+
+
+def get_stats_snapshot():
+    return cache.get(STATS_KEY)
+
+
+def format_stats(snapshot):
+    return (
+        f"Library stats ({snapshot['generated_at']}):\n"
+        f"Active borrowings: {snapshot['active_borrowings']}\n"
+        f"Overdue borrowings: {snapshot['overdue_borrowings']}\n"
+        f"Pending payments: {snapshot['pending_payments']} "
+        f"(${snapshot['pending_amount']})"
+    )
+
+
+def format_overdue(snapshot):
+    lines = [
+        f"Overdue borrowings ({snapshot['generated_at']}): "
+        f"{snapshot['overdue_borrowings']}"
+    ]
+    lines += [
+        f"{label}: {count}" for label, count in snapshot["overdue_by_days"].items()
+    ]
+    return "\n".join(lines)
+
+
+def format_top_books(snapshot):
+    days = TOP_BOOKS_WINDOW.days
+    if not snapshot["top_books"]:
+        return f"No books borrowed in the last {days} days."
+    lines = [f"Top books, last {days} days ({snapshot['generated_at']}):"]
+    lines += [
+        f"{place}. {title}: {borrowed}"
+        for place, (title, borrowed) in enumerate(snapshot["top_books"], 1)
+    ]
+    return "\n".join(lines)
@@ -1,8 +1,32 @@
 from celery import shared_task
 
 from library_bot.bot import send_notification_on_borrowing_overdue
+from library_bot.digest import flush_digests
+from library_bot.outbox import drain_outbox, purge_sent
+from library_bot.stats import refresh_stats_snapshot
 
 
 @shared_task
 def check_overdue():
-    return send_notification_on_borrowing_overdue()
+    return f"Queued {send_notification_on_borrowing_overdue()} overdue messages"
+
+
+@shared_task
+def drain_telegram_outbox():
+    sent, failed = drain_outbox()
+    return f"Sent {sent} outbox messages, {failed} failed"
+
+
+@shared_task
+def purge_telegram_outbox():
+    return f"Purged {purge_sent()} sent outbox messages"
+
+
+@shared_task
+def flush_telegram_digests():
+    return f"Queued {flush_digests()} digest messages"
+
+
+@shared_task
+def refresh_bot_stats():
+    return refresh_stats_snapshot()
@@ -1,16 +1,28 @@
-from unittest.mock import MagicMock, patch
+import json
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.utils import timezone
 
 from book_service.models import Book
 from borrowings_service.models import Borrowing
-from library_bot.bot import send_notification_on_borrowing_overdue, CHAT_ID, get_id
+from library_bot.bot import (
+    CHAT_ID,
+    get_text_about_overdue_borrowings,
+    send_notification_on_borrowing_overdue,
+)
+from library_bot.digest import TELEGRAM_MAX_LENGTH
+from library_bot.dispatcher import get_queue
 
+QUEUE_KEY = "test:telegram:bot"
 
+
+@override_settings(TELEGRAM_DISPATCHER={"QUEUE_KEY": QUEUE_KEY})
 class TestBot(TestCase):
     def setUp(self):
+        get_queue().delete(QUEUE_KEY)
+        self.addCleanup(get_queue().delete, QUEUE_KEY)
         self.book = Book.objects.create(
             title="Test",
             author="Test",
@@ -23,15 +35,6 @@ class TestBot(TestCase):
             email="test@test.com", password="test"
         )
 
-    @patch("library_bot.bot.bot.send_message")
-    def test_get_id(self, mock_send_message):
-        mock_message = MagicMock()
-        mock_message.chat.id = 1542351
-
-        get_id(mock_message)
-
-        mock_send_message.assert_called_with(1542351, 1542351)
-
     @patch("library_bot.bot.bot.send_message")
     def test_get_notification_on_borrowing_creation(self, mock_get_users):
         mock_get_users.return_value = [1]
@@ -43,29 +46,69 @@ class TestBot(TestCase):
             user=self.user,
         )
 
-    @patch("library_bot.bot.bot.send_message")
-    def test_borrowing_overdue_check(self, mock_send_message):
-        send_notification_on_borrowing_overdue()
-
-        mock_send_message.assert_called_with(CHAT_ID, "No borrowings overdue today!")
+    def queued(self):
+        return [
+            (message["chat_id"], message["text"])
+            for message in map(json.loads, get_queue().lrange(QUEUE_KEY, 0, -1))
+        ][::-1]
 
-    @patch("borrowings_service.signals.send_notification_on_borrowing_created")
-    @patch("library_bot.bot.bot.send_message")
-    def test_borrowing_overdue_check(self, mock_send_message, mock_notification):
-        borrowing = Borrowing.objects.create(
-            borrow_date=timezone.now().date() - timezone.timedelta(days=1),
-            expected_return_date=timezone.now().date() - timezone.timedelta(days=1),
+    def borrow(self, days_overdue, returned=False):
+        today = timezone.now().date()
+        return Borrowing.objects.create(
+            borrow_date=today - timezone.timedelta(days=days_overdue + 7),
+            expected_return_date=today - timezone.timedelta(days=days_overdue),
+            actual_return_date=today if returned else None,
             book=self.book,
             user=self.user,
         )
 
+    def test_no_borrowings_overdue(self):
+        self.borrow(days_overdue=0)
+
+        self.assertEqual(send_notification_on_borrowing_overdue(), 1)
+
+        self.assertEqual(self.queued(), [(CHAT_ID, "No borrowings overdue today!")])
+
+    @patch("borrowings_service.signals.send_notification_on_borrowing_created")
+    def test_borrowing_overdue_check(self, mock_notification):
+        borrowing = self.borrow(days_overdue=1)
+
         send_notification_on_borrowing_overdue()
 
-        mock_send_message.assert_called_with(
-            CHAT_ID,
-            f"Such borrows was overdue:\n"
-            f"Book: {borrowing.book.title}\n"
-            f"User email: {borrowing.user.email}\n"
-            f"Expected return date: {borrowing.expected_return_date}\n"
-            f"---------------------------------------\n",
+        self.assertEqual(
+            self.queued(),
+            [
+                (
+                    CHAT_ID,
+                    f"Overdue borrowings:\n"
+                    f"\nOverdue by 1 day:\n"
+                    f"Book: {borrowing.book.title}\n"
+                    f"User email: {borrowing.user.email}\n"
+                    f"Expected return date: {borrowing.expected_return_date}\n"
+                    f"---------------------------------------\n",
+                )
+            ],
         )
+
+    def test_every_active_overdue_borrowing_is_reported_by_days_overdue(self):
+        self.borrow(days_overdue=1)
+        self.borrow(days_overdue=10)
+        self.borrow(days_overdue=10)
+        self.borrow(days_overdue=3, returned=True)
+
+        send_notification_on_borrowing_overdue()
+
+        [(_, text)] = self.queued()
+        self.assertLess(text.index("by 10 days"), text.index("by 1 day:"))
+        self.assertEqual(text.count("Book: Test"), 3)
+        self.assertNotIn("by 3 days", text)
+
+    def test_long_report_is_split_at_telegram_limit(self):
+        for _ in range(60):
+            self.borrow(days_overdue=2)
+
+        messages = list(get_text_about_overdue_borrowings())
+
+        self.assertGreater(len(messages), 1)
+        self.assertTrue(all(len(text) <= TELEGRAM_MAX_LENGTH for text in messages))
+        self.assertEqual(sum(text.count("Book: Test") for text in messages), 60)
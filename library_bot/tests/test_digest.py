@@ -0,0 +1,126 @@
+import json
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+
+from library_bot.digest import (
+    TELEGRAM_MAX_LENGTH,
+    buffer_events,
+    flush_digests,
+    pack_messages,
+)
+from library_bot.dispatcher import get_queue, push_messages
+
+PREFIX = "test:telegram:digest"
+QUEUE_KEY = "test:telegram:digest-queue"
+
+
+def clear_keys():
+    for key in get_queue().scan_iter("test:telegram:digest*"):
+        get_queue().delete(key)
+
+
+class PackMessagesTests(SimpleTestCase):
+    def test_packs_entries_up_to_the_limit(self):
+        entries = ["a" * 40 + "\n"] * 5
+
+        messages = list(pack_messages(entries, header="H\n", limit=100))
+
+        self.assertEqual(len(messages), 3)
+        self.assertTrue(all(len(message) <= 100 for message in messages))
+        self.assertTrue(all(message.startswith("H\n") for message in messages))
+        self.assertEqual(
+            "".join(message[2:] for message in messages), "".join(entries)
+        )
+
+    def test_splits_an_entry_longer_than_a_message(self):
+        messages = list(pack_messages(["x" * (TELEGRAM_MAX_LENGTH * 2)]))
+
+        self.assertEqual([len(message) for message in messages], [4096, 4096])
+
+    def test_no_entries_no_messages(self):
+        self.assertEqual(list(pack_messages([], header="H")), [])
+
+
+@override_settings(
+    TELEGRAM_DISPATCHER={
+        "QUEUE_KEY": QUEUE_KEY,
+        "DIGEST_KEY": PREFIX,
+        "DIGEST_WINDOW": 30,
+        "DIGEST_MAX_EVENTS": 3,
+    }
+)
+class DigestTests(SimpleTestCase):
+    def setUp(self):
+        clear_keys()
+        self.addCleanup(clear_keys)
+
+    def queued(self):
+        return [json.loads(raw) for raw in get_queue().lrange(QUEUE_KEY, 0, -1)]
+
+    def test_events_wait_for_the_window(self):
+        buffer_events([(1, "borrowed"), (1, "paid")])
+
+        self.assertEqual(flush_digests(), 0)
+        self.assertEqual(self.queued(), [])
+
+        with patch("library_bot.digest.time.time", return_value=2**40):
+            self.assertEqual(flush_digests(), 1)
+
+        [message] = self.queued()
+        self.assertEqual(message["chat_id"], 1)
+        self.assertIn("2 events", message["text"])
+        self.assertLess(
+            message["text"].index("borrowed"), message["text"].index("paid")
+        )
+        self.assertEqual(flush_digests(force=True), 0)
+
+    def test_full_buffer_is_flushed_at_once(self):
+        buffer_events([(1, "one"), (1, "two"), (2, "other chat")])
+        self.assertEqual(self.queued(), [])
+
+        buffer_events([(1, "three")])
+
+        [message] = self.queued()
+        self.assertEqual(message["chat_id"], 1)
+        self.assertIn("3 events", message["text"])
+        self.assertEqual(flush_digests(force=True), 1)
+        self.assertEqual(self.queued()[0]["chat_id"], 2)
+
+    def test_large_digest_is_split_into_telegram_sized_messages(self):
+        buffer_events([(1, "e" * 3000)] * 2)
+
+        flush_digests(force=True)
+
+        texts = [message["text"] for message in self.queued()]
+        self.assertEqual(len(texts), 2)
+        self.assertTrue(all(len(text) <= TELEGRAM_MAX_LENGTH for text in texts))
+
+    def test_failed_push_keeps_the_events_for_the_next_flush(self):
+        buffer_events([(1, "borrowed"), (1, "paid")])
+
+        with patch(
+            "library_bot.digest.push_messages", side_effect=ConnectionError
+        ), self.assertRaises(ConnectionError):
+            flush_digests(force=True)
+        self.assertEqual(self.queued(), [])
+
+        self.assertEqual(flush_digests(), 1)
+        [message] = self.queued()
+        self.assertIn("2 events", message["text"])
+        self.assertEqual(flush_digests(force=True), 0)
+
+    def test_events_buffered_during_a_flush_wait_for_the_next_one(self):
+        buffer_events([(1, "borrowed")])
+
+        def push_and_buffer(messages):
+            pushed = push_messages(messages)
+            buffer_events([(1, "returned")])
+            return pushed
+
+        with patch("library_bot.digest.push_messages", side_effect=push_and_buffer):
+            self.assertEqual(flush_digests(force=True), 1)
+
+        self.assertEqual(flush_digests(), 0)
+        self.assertEqual(flush_digests(force=True), 1)
+        self.assertIn("returned", self.queued()[0]["text"])
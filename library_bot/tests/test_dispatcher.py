@@ -0,0 +1,236 @@
+import asyncio
+import json
+import time
+from collections import deque
+from unittest.mock import patch
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from django.test import SimpleTestCase, override_settings
+
+from base.ratelimit import TokenBucket
+from base.testing import FakeClock
+from library_bot.dispatcher import (
+    TelegramDispatcher,
+    dead_key,
+    get_queue,
+    held_key,
+    processing_key,
+    push_messages,
+)
+
+QUEUE_KEY = "test:telegram:dispatcher"
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_burst_then_refill(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+
+        self.assertEqual(bucket.delay(), 0)
+        self.assertEqual(bucket.delay(), 0)
+        self.assertAlmostEqual(bucket.delay(), 0.5)
+
+        clock.advance(0.5)
+        self.assertEqual(bucket.delay(), 0)
+
+    def test_block_waits_for_retry_after(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1, clock=clock)
+
+        bucket.block(7)
+
+        self.assertAlmostEqual(bucket.delay(), 7)
+        clock.advance(7)
+        self.assertEqual(bucket.delay(), 0)
+        self.assertAlmostEqual(bucket.delay(), 1)
+
+    def test_is_full_once_refilled_and_unblocked(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+
+        self.assertTrue(bucket.is_full())
+        bucket.delay()
+        self.assertFalse(bucket.is_full())
+        clock.advance(0.5)
+        self.assertTrue(bucket.is_full())
+
+        bucket.block(3)
+        clock.advance(2)
+        self.assertFalse(bucket.is_full())
+        clock.advance(1)
+        self.assertTrue(bucket.is_full())
+
+    def test_wait_sleeps_until_a_token_is_free(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=4, clock=clock)
+        bucket.wait()
+
+        with patch("base.ratelimit.time.sleep", side_effect=clock.advance) as sleep:
+            bucket.wait()
+
+        sleep.assert_called_once_with(0.25)
+
+
+class FakeTelegram:
+    """Bot API stand-in: answers each chat from a script, then with ok."""
+
+    def __init__(self, script=None):
+        self.script = script or {}
+        self.received = []
+
+    async def send_message(self, request):
+        payload = await request.json()
+        self.received.append((payload["chat_id"], payload["text"]))
+        replies = self.script.get(payload["chat_id"], [])
+        status, body = replies.pop(0) if replies else (200, {"ok": True})
+        return web.json_response(body, status=status)
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post("/bottoken/sendMessage", self.send_message)
+        return app
+
+
+@override_settings(TELEGRAM_DISPATCHER={"QUEUE_KEY": QUEUE_KEY})
+class TelegramDispatcherTests(SimpleTestCase):
+    def setUp(self):
+        self.keys = [
+            QUEUE_KEY,
+            processing_key(QUEUE_KEY),
+            dead_key(QUEUE_KEY),
+            *(held_key(QUEUE_KEY, chat_id) for chat_id in (1, 2, 7)),
+        ]
+        get_queue().delete(*self.keys)
+        self.addCleanup(get_queue().delete, *self.keys)
+
+    def dispatch(self, telegram, **options):
+        async def run():
+            async with TestServer(telegram.app()) as server:
+                dispatcher = TelegramDispatcher(
+                    token="token",
+                    API_URL=str(server.make_url("")).rstrip("/"),
+                    **options,
+                )
+                return await dispatcher.run(stop_when_idle=True)
+
+        return asyncio.run(run())
+
+    def test_push_returns_before_delivery(self):
+        self.assertEqual(push_messages([(1, "a"), (2, "b")]), 2)
+
+        self.assertEqual(get_queue().llen(QUEUE_KEY), 2)
+
+    def test_delivers_in_order_per_chat(self):
+        telegram = FakeTelegram()
+        push_messages([(1, "one"), (2, "two"), (1, "three")])
+
+        self.assertEqual(self.dispatch(telegram, CHAT_RATE=100), (3, 0))
+
+        self.assertEqual(
+            [text for chat, text in telegram.received if chat == 1], ["one", "three"]
+        )
+        self.assertEqual(get_queue().llen(processing_key(QUEUE_KEY)), 0)
+
+    def test_429_is_retried_after_the_requested_delay(self):
+        telegram = FakeTelegram(
+            {
+                1: [
+                    (
+                        429,
+                        {
+                            "ok": False,
+                            "error_code": 429,
+                            "parameters": {"retry_after": 0.2},
+                        },
+                    )
+                ]
+            }
+        )
+        push_messages([(1, "slow down")])
+
+        started = time.monotonic()
+        self.assertEqual(self.dispatch(telegram, CHAT_RATE=100), (1, 0))
+
+        self.assertEqual(telegram.received, [(1, "slow down"), (1, "slow down")])
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+
+    def test_rejected_message_goes_to_dead_letters(self):
+        telegram = FakeTelegram(
+            {3: [(400, {"ok": False, "description": "chat not found"})]}
+        )
+        push_messages([(3, "nobody")])
+
+        with self.assertLogs("library_bot.dispatcher", "WARNING"):
+            self.assertEqual(self.dispatch(telegram), (0, 1))
+
+        dead = json.loads(get_queue().lindex(dead_key(QUEUE_KEY), 0))
+        self.assertEqual(dead["error"], "chat not found")
+
+    def test_recovers_messages_left_in_processing(self):
+        get_queue().lpush(
+            processing_key(QUEUE_KEY), json.dumps({"chat_id": 5, "text": "left over"})
+        )
+        telegram = FakeTelegram()
+
+        self.assertEqual(self.dispatch(telegram), (1, 0))
+
+        self.assertEqual(telegram.received, [(5, "left over")])
+
+    def test_busy_chat_does_not_starve_the_others(self):
+        telegram = FakeTelegram()
+        push_messages([(1, f"busy {number}") for number in range(6)] + [(2, "quiet")])
+
+        self.assertEqual(
+            self.dispatch(telegram, CHAT_RATE=10, MAX_IN_FLIGHT=1, LANE_PREFETCH=2),
+            (7, 0),
+        )
+
+        self.assertLess(telegram.received.index((2, "quiet")), 3)
+        self.assertEqual(
+            [text for chat, text in telegram.received if chat == 1],
+            [f"busy {number}" for number in range(6)],
+        )
+        self.assertFalse(get_queue().exists(held_key(QUEUE_KEY, 1)))
+        self.assertEqual(get_queue().llen(processing_key(QUEUE_KEY)), 0)
+
+    def test_recovers_held_messages_after_the_half_sent_ones(self):
+        get_queue().lpush(
+            processing_key(QUEUE_KEY), json.dumps({"chat_id": 7, "text": "first"})
+        )
+        get_queue().rpush(
+            held_key(QUEUE_KEY, 7),
+            json.dumps({"chat_id": 7, "text": "second"}),
+            json.dumps({"chat_id": 7, "text": "third"}),
+        )
+        push_messages([(7, "fourth")])
+        telegram = FakeTelegram()
+
+        self.assertEqual(self.dispatch(telegram, CHAT_RATE=100), (4, 0))
+
+        self.assertEqual(
+            [text for chat, text in telegram.received],
+            ["first", "second", "third", "fourth"],
+        )
+
+    def test_idle_bucket_is_forgotten_once_refilled(self):
+        clock = FakeClock()
+        dispatcher = TelegramDispatcher(token="token", clock=clock)
+        dispatcher.bucket(1).delay()
+
+        dispatcher.forget_bucket(1)
+        self.assertIn(1, dispatcher.buckets)
+
+        clock.advance(1)
+        dispatcher.forget_bucket(1)
+        self.assertNotIn(1, dispatcher.buckets)
+
+    def test_bucket_of_a_running_lane_is_kept(self):
+        clock = FakeClock()
+        dispatcher = TelegramDispatcher(token="token", clock=clock)
+        dispatcher.bucket(1)
+        dispatcher.lanes[1] = deque()
+
+        dispatcher.forget_bucket(1)
+
+        self.assertIn(1, dispatcher.buckets)
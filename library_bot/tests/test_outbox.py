@@ -0,0 +1,115 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from redis import ConnectionError as RedisConnectionError
+
+from book_service.models import Book
+from borrowings_service.models import Borrowing
+from library_bot.bot import CHAT_ID
+from library_bot.dispatcher import get_queue
+from library_bot.models import OutboxMessage
+from library_bot.outbox import drain_outbox, enqueue_message, purge_sent
+
+
+def clear_buffers():
+    for key in get_queue().scan_iter("test:telegram:outbox*"):
+        get_queue().delete(key)
+
+
+@override_settings(TELEGRAM_DISPATCHER={"DIGEST_KEY": "test:telegram:outbox"})
+class OutboxTests(TestCase):
+    def setUp(self):
+        clear_buffers()
+        self.addCleanup(clear_buffers)
+        self.book = Book.objects.create(
+            title="Outbox",
+            author="Author",
+            cover="HARD",
+            inventory=5,
+            daily_fee=1.50,
+        )
+        self.user = get_user_model().objects.create_user(
+            email="outbox@test.com", password="test"
+        )
+
+    @patch("library_bot.bot.bot.send_message")
+    def test_borrowing_created_is_queued_not_sent(self, mock_send_message):
+        Borrowing.objects.create(
+            expected_return_date=timezone.now().date() + timezone.timedelta(days=7),
+            book=self.book,
+            user=self.user,
+        )
+
+        mock_send_message.assert_not_called()
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.chat_id, CHAT_ID)
+        self.assertIn("New borrowing was created", message.text)
+        self.assertIn(self.user.email, message.text)
+
+    def buffered(self, chat_id):
+        return get_queue().lrange(f"test:telegram:outbox:{chat_id}", 0, -1)
+
+    def test_drain_moves_pending_messages_to_digest_buffers(self):
+        first = enqueue_message("first")
+        second = enqueue_message("second", chat_id=42)
+
+        self.assertEqual(drain_outbox(), (2, 0))
+
+        self.assertEqual(self.buffered(CHAT_ID), [b"first"])
+        self.assertEqual(self.buffered(42), [b"second"])
+        for message in (first, second):
+            message.refresh_from_db()
+            self.assertEqual(message.status, "SENT")
+            self.assertIsNotNone(message.sent_at)
+        self.assertEqual(drain_outbox(), (0, 0))
+
+    @patch(
+        "library_bot.outbox.buffer_events",
+        side_effect=RedisConnectionError("down"),
+    )
+    def test_failed_push_is_retried_later(self, mock_push):
+        message = enqueue_message("retry me")
+
+        self.assertEqual(drain_outbox(), (0, 1))
+
+        message.refresh_from_db()
+        self.assertEqual(message.status, "PENDING")
+        self.assertEqual(message.attempts, 1)
+        self.assertEqual(message.last_error, "down")
+        self.assertGreater(message.available_at, timezone.now())
+        self.assertEqual(drain_outbox(), (0, 0))
+
+    @patch(
+        "library_bot.outbox.buffer_events",
+        side_effect=RedisConnectionError("down"),
+    )
+    def test_message_fails_after_max_attempts(self, mock_push):
+        message = enqueue_message("give up")
+
+        drain_outbox(max_attempts=1)
+
+        message.refresh_from_db()
+        self.assertEqual(message.status, "FAILED")
+
+    def test_purge_deletes_only_old_sent_messages(self):
+        now = timezone.now()
+        old = [enqueue_message(f"old {number}") for number in range(3)]
+        recent = enqueue_message("recent")
+        failed = enqueue_message("failed")
+        pending = enqueue_message("pending")
+        OutboxMessage.objects.filter(pk__in=[message.pk for message in old]).update(
+            status="SENT", sent_at=now - timezone.timedelta(days=8)
+        )
+        OutboxMessage.objects.filter(pk=recent.pk).update(status="SENT", sent_at=now)
+        OutboxMessage.objects.filter(pk=failed.pk).update(
+            status="FAILED", sent_at=now - timezone.timedelta(days=8)
+        )
+
+        self.assertEqual(purge_sent(batch_size=2), 3)
+
+        self.assertEqual(
+            set(OutboxMessage.objects.values_list("pk", flat=True)),
+            {recent.pk, failed.pk, pending.pk},
+        )
@@ -0,0 +1,111 @@
+import asyncio
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from book_service.models import Book
+from borrowings_service.models import Borrowing
+from library_bot.stats import (
+    build_snapshot,
+    format_overdue,
+    format_top_books,
+    refresh_stats_snapshot,
+)
+from library_bot.webhook import registry
+from payment.models import Payment
+
+STATS_KEY = "test:telegram:stats"
+STAFF_CHAT = -100
+
+
+def command(text, chat_id=STAFF_CHAT):
+    replies = []
+
+    async def reply(chat_id, text):
+        replies.append(text)
+
+    update = {"message": {"chat": {"id": chat_id}, "text": text}}
+    asyncio.run(registry.handle(update, reply))
+    return replies
+
+
+@patch("library_bot.stats.STATS_KEY", STATS_KEY)
+@override_settings(TELEGRAM_WEBHOOK={"STAFF_CHATS": [STAFF_CHAT]})
+class StatsSnapshotTests(TestCase):
+    @patch("django.db.models.signals.ModelSignal.send")
+    def setUp(self, mock_signal):
+        cache.delete(STATS_KEY)
+        self.addCleanup(cache.delete, STATS_KEY)
+        self.today = timezone.now().date()
+        self.user = get_user_model().objects.create_user("stats@test.com", "pass")
+        self.dune = Book.objects.create(
+            title="Dune", author="Herbert", cover="HARD", inventory=9, daily_fee=1
+        )
+        self.emma = Book.objects.create(
+            title="Emma", author="Austen", cover="SOFT", inventory=9, daily_fee=1
+        )
+        for book, borrowed_days_ago, due_days_ago, returned in (
+            (self.dune, 1, -3, False),
+            (self.dune, 12, 2, False),
+            (self.dune, 60, 40, False),
+            (self.emma, 15, 5, True),
+        ):
+            borrowing = Borrowing.objects.create(
+                borrow_date=self.today - timedelta(days=borrowed_days_ago),
+                expected_return_date=self.today - timedelta(days=due_days_ago),
+                actual_return_date=self.today if returned else None,
+                book=book,
+                user=self.user,
+            )
+        Payment.objects.create(
+            status="PENDING",
+            type="FINE",
+            borrowing=borrowing,
+            session_url="https://example.com/pay",
+            session_id="cs_stats",
+            money_to_pay=Decimal("12.50"),
+        )
+
+    def test_snapshot_aggregates(self):
+        snapshot = build_snapshot(self.today)
+
+        self.assertEqual(snapshot["active_borrowings"], 3)
+        self.assertEqual(snapshot["overdue_borrowings"], 2)
+        self.assertEqual(
+            snapshot["overdue_by_days"],
+            {"1-3 days": 1, "4-7 days": 0, "8-30 days": 0, "31+ days": 1},
+        )
+        self.assertEqual(snapshot["pending_payments"], 1)
+        self.assertEqual(snapshot["pending_amount"], "12.50")
+        self.assertEqual(snapshot["top_books"], [["Dune", 2], ["Emma", 1]])
+        self.assertIn("31+ days: 1", format_overdue(snapshot))
+        self.assertIn("1. Dune: 2", format_top_books(snapshot))
+
+    def test_commands_are_served_from_the_snapshot_without_queries(self):
+        refresh_stats_snapshot()
+
+        with self.assertNumQueries(0):
+            [stats] = command("/stats")
+            [overdue] = command("/overdue@LibraryBot")
+            [top_books] = command("/top_books")
+
+        self.assertIn("Active borrowings: 3", stats)
+        self.assertIn("Pending payments: 1 ($12.50)", stats)
+        self.assertIn("Overdue borrowings", overdue)
+        self.assertIn("Dune", top_books)
+
+    def test_missing_snapshot(self):
+        self.assertEqual(
+            command("/stats"),
+            ["Statistics are being prepared, try again in a minute."],
+        )
+
+    def test_commands_are_ignored_outside_staff_chats(self):
+        refresh_stats_snapshot()
+
+        self.assertEqual(command("/stats", chat_id=12345), [])
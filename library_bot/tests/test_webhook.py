@@ -0,0 +1,111 @@
+import asyncio
+
+from aiohttp.test_utils import AioHTTPTestCase
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+
+from library_bot.webhook import (
+    SECRET_HEADER,
+    UPDATES_KEY,
+    CommandRegistry,
+    create_app,
+    registry,
+)
+
+
+def update(update_id, text, chat_id=1542351):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "chat": {"id": chat_id, "type": "private"},
+            "text": text,
+        },
+    }
+
+
+class WebhookTests(AioHTTPTestCase):
+    """Feeds fake Telegram updates to the receiver over HTTP."""
+
+    async def get_application(self):
+        self.replies = []
+        self.commands = CommandRegistry()
+        self.commands.handlers.update(registry.handlers)
+        self.release = asyncio.Event()
+        self.running = 0
+        self.peak = 0
+
+        @self.commands.command("slow")
+        async def slow(message, reply):
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            await self.release.wait()
+            self.running -= 1
+            await reply("done")
+
+        async def reply(chat_id, text):
+            self.replies.append((chat_id, text))
+
+        return create_app(
+            self.commands,
+            reply,
+            SECRET="s3cret",
+            WORKERS=3,
+            QUEUE_SIZE=5,
+            SHUTDOWN_TIMEOUT=1,
+        )
+
+    async def post(self, payload, secret="s3cret"):
+        return await self.client.post(
+            "/telegram/webhook", json=payload, headers={SECRET_HEADER: secret}
+        )
+
+    async def settle(self):
+        await asyncio.wait_for(self.app[UPDATES_KEY].join(), 1)
+
+    async def test_get_id_replies_with_chat_id(self):
+        response = await self.post(update(1, "/get_id@LibraryBot"))
+
+        self.assertEqual(response.status, 200)
+        await self.settle()
+        self.assertEqual(self.replies, [(1542351, "1542351")])
+
+    async def test_wrong_secret_is_rejected(self):
+        response = await self.post(update(1, "/get_id"), secret="nope")
+
+        self.assertEqual(response.status, 403)
+
+    async def test_unknown_commands_and_plain_text_are_ignored(self):
+        await self.post(update(1, "/unknown"))
+        await self.post(update(2, "hello"))
+
+        await self.settle()
+        self.assertEqual(self.replies, [])
+
+    async def test_handlers_run_concurrently_up_to_worker_count(self):
+        for update_id in range(5):
+            response = await self.post(update(update_id, "/slow"))
+            self.assertEqual(response.status, 200)
+
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.peak, 3)
+
+        self.release.set()
+        await self.settle()
+        self.assertEqual(len(self.replies), 5)
+
+    async def test_full_queue_asks_telegram_to_retry(self):
+        statuses = [
+            (await self.post(update(update_id, "/slow"))).status
+            for update_id in range(9)
+        ]
+
+        self.assertEqual(statuses.count(200), 8)
+        self.assertEqual(statuses[-1], 503)
+        self.release.set()
+
+
+class WebhookConfigTests(SimpleTestCase):
+    def test_refuses_to_start_without_secret(self):
+        with self.assertRaises(ImproperlyConfigured):
+            create_app(SECRET="")
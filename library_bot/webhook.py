@@ -0,0 +1,197 @@
+import asyncio
+import hmac
+import logging
+from functools import wraps
+
+from aiohttp import web
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from library_bot.dispatcher import push_messages
+from library_bot.stats import (
+    format_overdue,
+    format_stats,
+    format_top_books,
+    get_stats_snapshot,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WEBHOOK = {
+    "PATH": "/telegram/webhook",
+    "SECRET": "",
+    "WORKERS": 8,
+    "QUEUE_SIZE": 1000,
+    "HANDLER_TIMEOUT": 10,
+    "SHUTDOWN_TIMEOUT": 20,
+    # Chats allowed to use the staff commands; None means the bot's CHAT_ID.
+    "STAFF_CHATS": None,
+}
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+WORKERS_KEY = web.AppKey("workers", list)
+UPDATES_KEY = web.AppKey("updates", asyncio.Queue)
+
+
+def webhook_settings():
+    return {**DEFAULT_WEBHOOK, **getattr(settings, "TELEGRAM_WEBHOOK", {})}
+
+
+async def send_reply(chat_id, text):
+    """Replies go through the rate-limited dispatcher like everything else."""
+    await asyncio.to_thread(push_messages, [(chat_id, text)])
+
+
+class CommandRegistry:
+    """
+    Maps bot commands to async handlers, each called as
+    `await handler(message, reply)`, where `message` is the Telegram
+    message dict and `reply(text)` answers in the same chat.
+    """
+
+    def __init__(self):
+        self.handlers = {}
+
+    def command(self, name):
+        def register(handler):
+            self.handlers[name] = handler
+            return handler
+
+        return register
+
+    @staticmethod
+    def parse(update):
+        """The message and command of an update, or (None, None)."""
+        message = update.get("message") or update.get("channel_post")
+        text = (message or {}).get("text", "")
+        if not text.startswith("/"):
+            return None, None
+        return message, text.split()[0][1:].split("@")[0]
+
+    async def handle(self, update, reply=send_reply):
+        message, command = self.parse(update)
+        handler = self.handlers.get(command)
+        if handler is None:
+            return False
+        chat_id = message["chat"]["id"]
+        await handler(message, lambda text: reply(chat_id, text))
+        return True
+
+
+registry = CommandRegistry()
+
+
+def staff_chats():
+    chats = webhook_settings()["STAFF_CHATS"]
+    if chats is None:
+        from library_bot.bot import CHAT_ID
+
+        chats = [CHAT_ID]
+    return set(chats)
+
+
+def staff_only(handler):
+    """Ignore the command outside the staff chats."""
+
+    @wraps(handler)
+    async def wrapper(message, reply):
+        if message["chat"]["id"] in staff_chats():
+            await handler(message, reply)
+
+    return wrapper
+
+
+def from_snapshot(format_reply):
+    """
+    A staff command answered from the statistics snapshot in Redis, so it
+    never queries the database however often it is asked.
+    """
+
+    @staff_only
+    async def handler(message, reply):
+        snapshot = await asyncio.to_thread(get_stats_snapshot)
+        if snapshot is None:
+            await reply("Statistics are being prepared, try again in a minute.")
+        else:
+            await reply(format_reply(snapshot))
+
+    return handler
+
+
+@registry.command("get_id")
+async def get_id(message, reply):
+    await reply(str(message["chat"]["id"]))
+
+
+registry.command("stats")(from_snapshot(format_stats))
+registry.command("overdue")(from_snapshot(format_overdue))
+registry.command("top_books")(from_snapshot(format_top_books))
+
+
+async def worker(updates, commands, reply, timeout):
+    while True:
+        update = await updates.get()
+        try:
+            await asyncio.wait_for(commands.handle(update, reply), timeout)
+        except Exception:
+            logger.exception("Telegram update %s failed", update.get("update_id"))
+        finally:
+            updates.task_done()
+
+
+def create_app(commands=registry, reply=send_reply, **options):
+    """
+    The webhook receiver. Each update is acknowledged as soon as it is
+    queued; a pool of WORKERS tasks runs the handlers concurrently. A full
+    queue answers 503 so Telegram redelivers later. On shutdown the
+    workers get SHUTDOWN_TIMEOUT seconds to finish queued updates.
+
+    The endpoint is public, so it refuses to start without a SECRET and
+    answers 403 to any request that does not carry it.
+    """
+    config = {**webhook_settings(), **options}
+    if not config["SECRET"]:
+        raise ImproperlyConfigured(
+            "TELEGRAM_WEBHOOK['SECRET'] must be set to serve the webhook."
+        )
+    app = web.Application()
+
+    async def receive(request):
+        secret = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(secret, config["SECRET"]):
+            raise web.HTTPForbidden()
+        try:
+            update = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest()
+        try:
+            app[UPDATES_KEY].put_nowait(update)
+        except asyncio.QueueFull:
+            raise web.HTTPServiceUnavailable()
+        return web.json_response({"ok": True})
+
+    async def start_workers(app):
+        app[UPDATES_KEY] = asyncio.Queue(config["QUEUE_SIZE"])
+        app[WORKERS_KEY] = [
+            asyncio.create_task(
+                worker(app[UPDATES_KEY], commands, reply, config["HANDLER_TIMEOUT"])
+            )
+            for _ in range(config["WORKERS"])
+        ]
+
+    async def stop_workers(app):
+        try:
+            await asyncio.wait_for(app[UPDATES_KEY].join(), config["SHUTDOWN_TIMEOUT"])
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Dropping %s unhandled Telegram updates", app[UPDATES_KEY].qsize()
+            )
+        for task in app[WORKERS_KEY]:
+            task.cancel()
+        await asyncio.gather(*app[WORKERS_KEY], return_exceptions=True)
+
+    app.router.add_post(config["PATH"], receive)
+    app.on_startup.append(start_workers)
+    app.on_shutdown.append(stop_workers)
+    return app
@@ -0,0 +1,98 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import transaction
+
+from base.ratelimit import TokenBucket
+from payment.gateways import GatewayError, get_gateway
+from payment.models import Payment
+from payment.webhooks import complete_paid_sessions
+
+logger = logging.getLogger(__name__)
+
+NEAR_DEADLINE_WINDOW = timedelta(minutes=10)
+MAX_GATEWAY_CHECKS = 200
+GATEWAY_WORKERS = 4
+GATEWAY_REQUESTS_PER_SECOND = 20
+
+
+def fetch_session_state(gateway, session_id, limiter):
+    """"paid", "expired" or "open" for one Checkout session; None on error."""
+    limiter.wait()
+    try:
+        session = gateway.retrieve_session(session_id)
+    except GatewayError:
+        return None
+    if session.payment_status == "paid":
+        return "paid"
+    if session.status == "expired":
+        return "expired"
+    return "open"
+
+
+def sweep_expired_payments(
+    window=NEAR_DEADLINE_WINDOW,
+    max_checks=MAX_GATEWAY_CHECKS,
+    workers=GATEWAY_WORKERS,
+    rate=GATEWAY_REQUESTS_PER_SECOND,
+):
+    """
+    Expire pending payments past expires_at with one UPDATE, then ask the
+    payment gateway only about sessions that expire within `window`: those
+    paid at the last minute are completed like a paid webhook (PAID,
+    overdue borrowings closed, borrower notified), those already closed
+    become EXPIRED.
+
+    The gateway checks run in a pool of `workers` threads throttled to
+    `rate` requests per second, at most `max_checks` per run, nearest
+    deadline first. Returns the run's metrics, which are also logged.
+    """
+    started = time.monotonic()
+    expired = Payment.objects.expire_due()
+
+    near_deadline = list(
+        Payment.objects.near_deadline(window)
+        .order_by("expires_at")
+        .values_list("pk", "session_id")[:max_checks]
+    )
+    gateway = get_gateway()
+    limiter = TokenBucket(rate)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        states = list(
+            pool.map(
+                lambda session_id: fetch_session_state(gateway, session_id, limiter),
+                [session_id for _, session_id in near_deadline],
+            )
+        )
+
+    by_state = {"paid": [], "expired": []}
+    for (_, session_id), state in zip(near_deadline, states):
+        if state in by_state:
+            by_state[state].append(session_id)
+
+    with transaction.atomic():
+        paid, returned = complete_paid_sessions(by_state["paid"])
+        closed = (
+            Payment.objects.pending()
+            .filter(session_id__in=by_state["expired"])
+            .update(status="EXPIRED")
+        )
+
+    metrics = {
+        "scanned": expired + len(near_deadline),
+        "expired_due": expired,
+        "checked": len(near_deadline),
+        "changed": expired + closed + paid,
+        "expired": expired + closed,
+        "paid": paid,
+        "returned": returned,
+        "gateway_errors": states.count(None),
+        "duration_ms": round((time.monotonic() - started) * 1000, 1),
+    }
+    logger.info(
+        "Payment expiry sweep: %s",
+        " ".join(f"{key}={value}" for key, value in metrics.items()),
+    )
+    return metrics
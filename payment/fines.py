@@ -0,0 +1,109 @@
+from decimal import Decimal
+from itertools import islice
+
+from django.db.models import Exists, OuterRef, Sum
+from django.utils import timezone
+
+from borrowings_service.models import Borrowing
+from payment.models import Fine, Payment
+
+FINE_MULTIPLIER = 2
+FINE_BATCH_SIZE = 2000
+
+
+def to_cents(amount):
+    return int(amount * 100)
+
+
+def from_cents(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+def compute_fines(rows, today):
+    """
+    Fines for a chunk of (borrowing id, expected return, actual return,
+    daily fee) rows. The whole chunk is priced in integer cents, so the
+    result is exact and matches overdue_days * daily_fee * FINE_MULTIPLIER.
+    """
+    fines = []
+    for pk, expected, returned, daily_fee in rows:
+        overdue_days = ((returned or today) - expected).days
+        if overdue_days <= 0:
+            continue
+        fines.append(
+            Fine(
+                borrowing_id=pk,
+                overdue_days=overdue_days,
+                daily_fee=daily_fee,
+                amount=from_cents(overdue_days * to_cents(daily_fee) * FINE_MULTIPLIER),
+                accrued_on=today,
+            )
+        )
+    return fines
+
+
+def accrue_fines(borrowings, today=None, batch_size=FINE_BATCH_SIZE):
+    """
+    Price every overdue borrowing in `borrowings` and upsert the result
+    into the Fine ledger. Rows are streamed with iterator() and written
+    with one INSERT ... ON CONFLICT per batch. Returns the number of
+    fines written.
+    """
+    today = today or timezone.now().date()
+    rows = (
+        borrowings.filter(expected_return_date__lt=today)
+        .order_by("pk")
+        .values_list(
+            "pk", "expected_return_date", "actual_return_date", "book__daily_fee"
+        )
+        .iterator(chunk_size=batch_size)
+    )
+
+    written = 0
+    while chunk := list(islice(rows, batch_size)):
+        fines = compute_fines(chunk, today)
+        Fine.objects.bulk_create(
+            fines,
+            update_conflicts=True,
+            unique_fields=["borrowing"],
+            update_fields=["overdue_days", "daily_fee", "amount", "accrued_on"],
+        )
+        written += len(fines)
+    return written
+
+
+def accrue_overdue_fines(today=None, batch_size=FINE_BATCH_SIZE):
+    """Nightly run over every active borrowing."""
+    return accrue_fines(
+        Borrowing.objects.filter(actual_return_date__isnull=True), today, batch_size
+    )
+
+
+def current_fine(borrowing):
+    """
+    Today's fine for `borrowing` from the ledger, accruing it on the spot
+    when the nightly run has not priced it yet. None when not overdue.
+    """
+    today = timezone.now().date()
+    fine = Fine.objects.filter(borrowing=borrowing, accrued_on=today).first()
+    if fine is None and accrue_fines(Borrowing.objects.filter(pk=borrowing.pk)):
+        fine = Fine.objects.get(borrowing=borrowing)
+    return fine
+
+
+def unpaid_fines(borrowings=None):
+    """Ledger rows whose borrowing has no paid fine yet."""
+    fines = Fine.objects.exclude(
+        Exists(
+            Payment.objects.filter(
+                borrowing=OuterRef("borrowing"), type="FINE", status="PAID"
+            )
+        )
+    )
+    if borrowings is not None:
+        fines = fines.filter(borrowing__in=borrowings)
+    return fines
+
+
+def total_owed(fines):
+    return fines.aggregate(total=Sum("amount"))["total"] or Decimal("0.00")
@@ -0,0 +1,268 @@
+import itertools
+import random
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, replace
+from functools import lru_cache
+
+import stripe
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+DEFAULT_GATEWAY = {"BACKEND": "payment.gateways.StripeGateway", "OPTIONS": {}}
+
+
+class GatewayError(Exception):
+    """
+    The payment provider rejected the request or could not be reached.
+    `transient` marks failures worth retrying: timeouts, connection
+    errors, rate limiting and provider-side errors.
+    """
+
+    def __init__(self, message="", transient=True):
+        super().__init__(message)
+        self.transient = transient
+
+
+class GatewayUnavailable(GatewayError):
+    """The call was not attempted because the provider is unhealthy or saturated."""
+
+
+@dataclass(frozen=True)
+class CheckoutSession:
+    id: str
+    url: str
+    status: str = "open"
+    payment_status: str = "unpaid"
+    amount_total: int = 0
+    created: int = 0
+
+
+@dataclass(frozen=True)
+class LineItem:
+    name: str
+    unit_amount: int
+    quantity: int = 1
+
+
+class PaymentGateway(ABC):
+    """
+    What the payment views and tasks need from a checkout provider.
+    Amounts are integer cents; failures raise GatewayError.
+    """
+
+    @abstractmethod
+    def create_session(
+        self, line_items, success_url, cancel_url, idempotency_key=None
+    ):
+        """Open a checkout session for `line_items` and return it."""
+
+    @abstractmethod
+    def retrieve_session(self, session_id):
+        """The current state of one session."""
+
+    @abstractmethod
+    def list_sessions(self, created_gte=None, starting_after=None, limit=100):
+        """One page of sessions, newest first: (sessions, has_more)."""
+
+
+class StripeGateway(PaymentGateway):
+    """
+    Stripe Checkout through long-lived StripeClients, one per operation so
+    each has its own (connect, read) timeout. Their requests sessions keep
+    connections alive between calls (one pool per thread).
+    """
+
+    DEFAULT_TIMEOUTS = {
+        "create_session": (3.0, 10.0),
+        "retrieve_session": (2.0, 5.0),
+        "list_sessions": (3.0, 20.0),
+    }
+    TRANSIENT_ERRORS = (
+        stripe.error.APIConnectionError,
+        stripe.error.APIError,
+        stripe.error.RateLimitError,
+    )
+
+    def __init__(
+        self,
+        api_key=None,
+        currency="usd",
+        timeouts=None,
+        max_network_retries=2,
+    ):
+        self.currency = currency
+        timeouts = {**self.DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.clients = {
+            operation: stripe.StripeClient(
+                api_key or settings.STRIPE_SECRET_KEY or "",
+                http_client=stripe.RequestsClient(timeout=tuple(timeout)),
+                max_network_retries=max_network_retries,
+            )
+            for operation, timeout in timeouts.items()
+        }
+
+    def sessions(self, operation):
+        return self.clients[operation].checkout.sessions
+
+    @classmethod
+    def to_error(cls, error):
+        return GatewayError(str(error), transient=isinstance(error, cls.TRANSIENT_ERRORS))
+
+    @staticmethod
+    def to_session(session):
+        return CheckoutSession(
+            id=session.id,
+            url=session.url or "",
+            status=session.status or "",
+            payment_status=session.payment_status or "",
+            amount_total=session.amount_total or 0,
+            created=session.created or 0,
+        )
+
+    def create_session(
+        self, line_items, success_url, cancel_url, idempotency_key=None
+    ):
+        params = {
+            "payment_method_types": ["card"],
+            "line_items": [
+                {
+                    "price_data": {
+                        "currency": self.currency,
+                        "product_data": {"name": item.name},
+                        "unit_amount": item.unit_amount,
+                    },
+                    "quantity": item.quantity,
+                }
+                for item in line_items
+            ],
+            "mode": "payment",
+            "success_url": success_url,
+            "cancel_url": cancel_url,
+        }
+        options = {"idempotency_key": idempotency_key} if idempotency_key else {}
+        try:
+            session = self.sessions("create_session").create(
+                params=params, options=options
+            )
+        except stripe.error.StripeError as error:
+            raise self.to_error(error) from error
+        return self.to_session(session)
+
+    def retrieve_session(self, session_id):
+        try:
+            session = self.sessions("retrieve_session").retrieve(session_id)
+        except stripe.error.StripeError as error:
+            raise self.to_error(error) from error
+        return self.to_session(session)
+
+    def list_sessions(self, created_gte=None, starting_after=None, limit=100):
+        params = {"limit": limit}
+        if created_gte is not None:
+            params["created"] = {"gte": created_gte}
+        if starting_after:
+            params["starting_after"] = starting_after
+        try:
+            page = self.sessions("list_sessions").list(params=params)
+        except stripe.error.StripeError as error:
+            raise self.to_error(error) from error
+        return [self.to_session(session) for session in page.data], page.has_more
+
+
+class FakeGateway(PaymentGateway):
+    """
+    In-process checkout provider for tests and offline benchmarks. Each
+    call sleeps for `latency` seconds (plus up to `jitter`) and fails with
+    probability `error_rate`, so load tests see realistic timing without
+    touching the network. Sessions live in memory for the process.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.sessions = {}
+        self.idempotent = {}
+        self.counter = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def simulate_call(self):
+        with self.lock:
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            fails = self.random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if fails:
+            raise GatewayError("Simulated gateway failure")
+
+    def create_session(
+        self, line_items, success_url, cancel_url, idempotency_key=None
+    ):
+        self.simulate_call()
+        with self.lock:
+            if idempotency_key in self.idempotent:
+                return self.idempotent[idempotency_key]
+            session_id = f"cs_fake_{next(self.counter)}_{uuid.uuid4().hex[:12]}"
+            session = CheckoutSession(
+                id=session_id,
+                url=f"https://checkout.fake/{session_id}",
+                amount_total=sum(
+                    item.unit_amount * item.quantity for item in line_items
+                ),
+                created=int(time.time()),
+            )
+            self.sessions[session_id] = session
+            if idempotency_key:
+                self.idempotent[idempotency_key] = session
+        return session
+
+    def retrieve_session(self, session_id):
+        self.simulate_call()
+        try:
+            return self.sessions[session_id]
+        except KeyError:
+            raise GatewayError(
+                f"No such checkout.session: '{session_id}'", transient=False
+            )
+
+    def list_sessions(self, created_gte=None, starting_after=None, limit=100):
+        self.simulate_call()
+        with self.lock:
+            sessions = sorted(
+                self.sessions.values(),
+                key=lambda session: (session.created, session.id),
+                reverse=True,
+            )
+        if created_gte is not None:
+            sessions = [s for s in sessions if s.created >= created_gte]
+        if starting_after:
+            ids = [session.id for session in sessions]
+            sessions = sessions[ids.index(starting_after) + 1 :]
+        return sessions[:limit], len(sessions) > limit
+
+    def set_status(self, session_id, status="complete", payment_status="paid"):
+        """Move a fake session along as the customer would."""
+        with self.lock:
+            self.sessions[session_id] = replace(
+                self.sessions[session_id],
+                status=status,
+                payment_status=payment_status,
+            )
+
+
+@lru_cache(maxsize=None)
+def get_gateway():
+    """The gateway configured by settings.PAYMENT_GATEWAY, built once."""
+    config = getattr(settings, "PAYMENT_GATEWAY", DEFAULT_GATEWAY)
+    return import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+
+
+@receiver(setting_changed)
+def reset_gateway(setting, **kwargs):
+    if setting in ("PAYMENT_GATEWAY", "STRIPE_SECRET_KEY"):
+        get_gateway.cache_clear()
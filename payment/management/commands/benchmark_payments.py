@@ -0,0 +1,149 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from book_service.models import Book
+from borrowings_service.models import Borrowing
+from payment.expiry import sweep_expired_payments
+from payment.gateways import get_gateway
+from payment.models import Payment
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark checkout, renewal and expiry end to end against the "
+        "in-process fake gateway (run against PostgreSQL for real concurrency)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--latency-ms", type=float, default=150.0)
+        parser.add_argument("--jitter-ms", type=float, default=50.0)
+        parser.add_argument("--error-rate", type=float, default=0.01)
+
+    def handle(self, *args, **options):
+        gateway_config = {
+            "BACKEND": "payment.resilience.ResilientGateway",
+            "OPTIONS": {
+                **settings.PAYMENT_GATEWAY.get("OPTIONS", {}),
+                "gateway": {
+                    "BACKEND": "payment.gateways.FakeGateway",
+                    "OPTIONS": {
+                        "latency": options["latency_ms"] / 1000,
+                        "jitter": options["jitter_ms"] / 1000,
+                        "error_rate": options["error_rate"],
+                    },
+                },
+            },
+        }
+        with override_settings(
+            PAYMENT_GATEWAY=gateway_config, ALLOWED_HOSTS=["testserver"]
+        ):
+            user, book, borrowings = self.seed(options["requests"])
+            try:
+                self.run(user, borrowings, options["concurrency"])
+            finally:
+                Borrowing.objects.filter(pk__in=borrowings).delete()
+                book.delete()
+                user.delete()
+
+    def seed(self, size):
+        stamp = time.time_ns()
+        user = get_user_model().objects.create_user(
+            email=f"payment-benchmark-{stamp}@example.com", password=None
+        )
+        book = Book.objects.create(
+            title=f"Payment benchmark {stamp}",
+            author="Benchmark",
+            cover="SOFT",
+            inventory=0,
+            daily_fee=Decimal("1.50"),
+        )
+        today = timezone.now().date()
+        borrowings = Borrowing.objects.bulk_create(
+            Borrowing(
+                borrow_date=today,
+                expected_return_date=today + timedelta(days=7),
+                book=book,
+                user=user,
+            )
+            for _ in range(size)
+        )
+        return user, book, [borrowing.pk for borrowing in borrowings]
+
+    def run(self, user, borrowings, concurrency):
+        def post(url):
+            client = APIClient()
+            client.force_authenticate(user=user)
+            started = time.perf_counter()
+            try:
+                code = client.post(url).status_code
+            except DatabaseError:
+                code = None
+            finally:
+                connection.close()
+            return code, time.perf_counter() - started
+
+        def measure(name, urls):
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                results = list(pool.map(post, urls))
+            self.report(name, results, time.perf_counter() - started)
+
+        measure(
+            "checkout",
+            [
+                reverse("payments:payments-create-session", kwargs={"pk": pk})
+                for pk in borrowings
+            ],
+        )
+
+        payments = Payment.objects.filter(borrowing_id__in=borrowings)
+        payments.update(status="EXPIRED")
+        measure(
+            "renewal",
+            [
+                reverse("payments:payments-renew-session", kwargs={"pk": pk})
+                for pk in payments.values_list("pk", flat=True)
+            ],
+        )
+
+        gateway = get_gateway()
+        pending = payments.filter(status="PENDING")
+        for session_id in pending.values_list("session_id", flat=True)[::2]:
+            gateway.set_status(session_id)
+        pending.update(expires_at=timezone.now() + timedelta(minutes=5))
+
+        metrics = sweep_expired_payments(
+            max_checks=len(borrowings), workers=concurrency, rate=1000
+        )
+        self.stdout.write(
+            "expiry sweep: "
+            + " ".join(f"{key}={value}" for key, value in metrics.items())
+        )
+        self.stdout.write(
+            "gateway: "
+            + " ".join(f"{key}={value}" for key, value in gateway.metrics().items())
+        )
+
+    def report(self, name, results, elapsed):
+        timings = sorted(duration * 1000 for _, duration in results)
+        failed = sum(1 for code, _ in results if code is None or code >= 400)
+        p95 = timings[int(len(timings) * 0.95) - 1] if timings else 0.0
+        self.stdout.write(
+            f"{name}: {len(results)} requests in {elapsed:.2f} s "
+            f"({len(results) / elapsed:.0f} req/s), {failed} failed, "
+            f"p50 {statistics.median(timings or [0]):.1f} ms, p95 {p95:.1f} ms"
+        )
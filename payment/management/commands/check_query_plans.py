@@ -0,0 +1,167 @@
+import random
+import re
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from book_service.models import Book
+from borrowings_service.models import Borrowing
+from payment.models import Payment
+
+SEQUENTIAL_SCAN = {
+    "postgresql": re.compile(r"Seq Scan on (\w+)"),
+    "sqlite": re.compile(r"\bSCAN (\w+)(?! USING (?:COVERING )?INDEX)(?:\s|$)"),
+}
+
+
+class Rollback(Exception):
+    """Raised to discard the seeded rows once the plans are checked."""
+
+
+def hot_queries(sample):
+    """The filters the API, the bot and the Celery tasks run on every call."""
+    today = timezone.now().date()
+    return {
+        "active borrowings of a user": Borrowing.objects.filter(
+            user_id=sample["user_id"], actual_return_date__isnull=True
+        ),
+        "borrowings due yesterday": Borrowing.objects.filter(
+            expected_return_date=today - timedelta(days=1)
+        ),
+        "active overdue borrowings": Borrowing.objects.filter(
+            actual_return_date__isnull=True, expected_return_date__lt=today
+        ),
+        "pending payments": Payment.objects.filter(status="PENDING"),
+        "payment by session id": Payment.objects.filter(
+            session_id=sample["session_id"]
+        ),
+        "unpaid bills gate": get_user_model().objects.filter(
+            pk=sample["user_id"], has_pending_payments=True
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the hot borrowing and payment queries on a seeded dataset and "
+        "fail if any of them falls back to a sequential scan"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=50_000,
+            help="Number of synthetic borrowings (with payments) to plan against",
+        )
+        parser.add_argument("--users", type=int, default=2_000)
+        parser.add_argument("--batch-size", type=int, default=5_000)
+
+    def handle(self, *args, **options):
+        pattern = SEQUENTIAL_SCAN.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f"Unsupported database vendor: {connection.vendor}")
+
+        try:
+            with transaction.atomic():
+                sample = self.seed(
+                    options["seed"], options["users"], options["batch_size"]
+                )
+                failures = self.check_plans(pattern, sample)
+                raise Rollback
+        except Rollback:
+            pass
+
+        if failures:
+            raise CommandError(
+                "Sequential scans in: " + ", ".join(sorted(failures))
+            )
+        self.stdout.write(self.style.SUCCESS("All hot queries use an index"))
+
+    def check_plans(self, pattern, sample):
+        failures = []
+        for name, queryset in hot_queries(sample).items():
+            plan = queryset.explain()
+            scanned = pattern.findall(plan)
+            if scanned:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"{name}: scans {', '.join(scanned)}"))
+            else:
+                self.stdout.write(f"{name}: ok")
+            self.stdout.write(plan, style_func=lambda text: text)
+        return failures
+
+    def seed(self, size, user_count, batch_size):
+        started = time.perf_counter()
+        User = get_user_model()
+        run = uuid.uuid4().hex[:8]
+        users = User.objects.bulk_create(
+            (
+                User(email=f"plan-{run}-{number}@example.com", password="!")
+                for number in range(user_count)
+            ),
+            batch_size=batch_size,
+        )
+        books = Book.objects.bulk_create(
+            (
+                Book(
+                    title=f"Plan {run} {number}",
+                    author="Planner",
+                    cover="SOFT",
+                    inventory=10,
+                    daily_fee=Decimal("1.00"),
+                )
+                for number in range(200)
+            ),
+            batch_size=batch_size,
+        )
+
+        today = timezone.now().date()
+        borrowings = []
+        for _ in range(size):
+            borrow_date = today - timedelta(days=random.randrange(730))
+            expected = borrow_date + timedelta(days=random.randrange(1, 30))
+            returned = None if random.random() < 0.05 else expected
+            borrowings.append(
+                Borrowing(
+                    borrow_date=borrow_date,
+                    expected_return_date=expected,
+                    actual_return_date=returned,
+                    book=random.choice(books),
+                    user=random.choice(users),
+                )
+            )
+        borrowings = Borrowing.objects.bulk_create(borrowings, batch_size=batch_size)
+
+        Payment.objects.bulk_create(
+            (
+                Payment(
+                    status="PENDING" if random.random() < 0.02 else "PAID",
+                    type="PAYMENT",
+                    borrowing=borrowing,
+                    session_url="https://example.com/checkout",
+                    session_id=f"cs_plan_{run}_{borrowing.pk}",
+                    expires_at=timezone.now() + timedelta(hours=24),
+                )
+                for borrowing in borrowings
+            ),
+            batch_size=batch_size,
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        self.stdout.write(
+            f"Seeded {size} borrowings and payments "
+            f"in {time.perf_counter() - started:.1f} s"
+        )
+        return {
+            "user_id": users[0].pk,
+            "session_id": f"cs_plan_{run}_{borrowings[0].pk}",
+        }
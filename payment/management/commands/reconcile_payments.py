@@ -0,0 +1,67 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from payment.gateways import GatewayError
+from payment.reconciliation import (
+    RECONCILE_CHUNK_SIZE,
+    RECONCILE_PAGE_SIZE,
+    reconcile_payments,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare recent checkout sessions at the payment gateway with our "
+        "Payment rows, fix drifted statuses and report every mismatch"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=30,
+            help="Reconcile sessions created in the last N days",
+        )
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=RECONCILE_PAGE_SIZE,
+            help="Sessions requested per gateway list call",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=RECONCILE_CHUNK_SIZE,
+            help="Sessions joined against the database per query",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report mismatches without correcting them",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            report = reconcile_payments(
+                since=timezone.now() - timedelta(days=options["days"]),
+                dry_run=options["dry_run"],
+                page_size=options["page_size"],
+                chunk_size=options["chunk_size"],
+            )
+        except GatewayError as error:
+            raise CommandError(f"Gateway error: {error}")
+
+        for mismatch in report.mismatches:
+            self.stdout.write(json.dumps(mismatch))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{report.sessions} sessions in {report.duration_s}s: "
+                f"{report.matched} matched, {report.marked_paid} marked paid, "
+                f"{report.marked_expired} marked expired, "
+                f"{report.unknown_sessions} unknown, "
+                f"{report.missing_at_gateway} missing at the gateway"
+            )
+        )
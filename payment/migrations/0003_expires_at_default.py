@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:52
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+
+import payment.models
+
+
+def backfill_expires_at(apps, schema_editor):
+    """
+    The old default stamped expires_at with the creation time, so every
+    row "expired" the moment it was created. Give those rows the intended
+    24 hour session lifetime.
+    """
+    Payment = apps.get_model("payment", "Payment")
+    Payment.objects.filter(expires_at__lt=F("created_at") + timedelta(minutes=1)).update(
+        expires_at=F("created_at") + timedelta(hours=24)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payment", "0002_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="payment",
+            name="expires_at",
+            field=models.DateTimeField(default=payment.models.default_expires_at),
+        ),
+        migrations.RunPython(backfill_expires_at, migrations.RunPython.noop),
+    ]
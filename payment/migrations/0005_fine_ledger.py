@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("borrowings_service", "0004_hot_path_indexes"),
+        ("payment", "0004_stripe_event"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Fine",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("overdue_days", models.PositiveIntegerField()),
+                ("daily_fee", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("accrued_on", models.DateField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "borrowing",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="fine",
+                        to="borrowings_service.borrowing",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("borrowings_service", "0004_hot_path_indexes"),
+        ("payment", "0005_fine_ledger"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="payment",
+            name="unique_payment_session_id",
+        ),
+        migrations.AddConstraint(
+            model_name="payment",
+            constraint=models.UniqueConstraint(
+                fields=("session_id", "borrowing", "type"),
+                name="unique_payment_session_item",
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("borrowings_service", "0004_hot_path_indexes"),
+        ("payment", "0006_session_items"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="payment",
+            name="unique_payment_session_item",
+        ),
+        migrations.AddField(
+            model_name="payment",
+            name="session_error",
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(fields=["session_id"], name="payment_session_id_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="payment",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("session_id", ""), _negated=True),
+                fields=("session_id", "borrowing", "type"),
+                name="unique_payment_session_item",
+            ),
+        ),
+    ]
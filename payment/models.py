@@ -1,4 +1,6 @@
-from django.db import models
+from django.contrib.auth import get_user_model
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
 
 from borrowings_service.models import Borrowing
@@ -15,11 +17,129 @@ TYPE_CHOICES = (
 )
 
 
+PAYMENT_SESSION_TTL = timezone.timedelta(hours=24)
+REUSABLE_SESSION_MIN_REMAINING = timezone.timedelta(minutes=30)
+
+
+def default_expires_at():
+    return timezone.now() + PAYMENT_SESSION_TTL
+
+
+def refresh_pending_payment_flags(users):
+    """
+    Recompute User.has_pending_payments for the `users` queryset in one
+    UPDATE with an EXISTS subquery over their pending payments.
+    """
+    return users.update(
+        has_pending_payments=Exists(
+            Payment.objects.filter(borrowing__user=OuterRef("pk"), status="PENDING")
+        )
+    )
+
+
+def lock_users(users):
+    """
+    Lock the `users` rows, in pk order, until the transaction ends.
+
+    Taken before a payment write, it makes concurrent writes for the same
+    user run one after the other. Under READ COMMITTED each flag refresh
+    then sees the payments the previous writer committed, where two
+    overlapping EXISTS could each miss the other's row and leave the flag
+    false with a payment still pending.
+    """
+    list(
+        users.select_for_update(of=("self",))
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    return users
+
+
+class PaymentQuerySet(models.QuerySet):
+    """
+    Bulk writes and deletes keep the users' pending flags in sync, with
+    the users locked from before the write until the flags are refreshed.
+    """
+
+    def _affected_users(self):
+        user_ids = set(self.values_list("borrowing__user_id", flat=True))
+        return get_user_model().objects.filter(pk__in=user_ids)
+
+    def update(self, **kwargs):
+        if "status" not in kwargs:
+            return super().update(**kwargs)
+        with transaction.atomic():
+            users = lock_users(self._affected_users())
+            updated = super().update(**kwargs)
+            refresh_pending_payment_flags(users)
+        return updated
+
+    def delete(self):
+        with transaction.atomic():
+            users = lock_users(self._affected_users())
+            deleted = super().delete()
+            refresh_pending_payment_flags(users)
+        return deleted
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        user_ids = Borrowing.objects.filter(
+            pk__in={payment.borrowing_id for payment in objs}
+        ).values_list("user_id", flat=True)
+        with transaction.atomic():
+            users = lock_users(get_user_model().objects.filter(pk__in=set(user_ids)))
+            created = super().bulk_create(objs, *args, **kwargs)
+            refresh_pending_payment_flags(users)
+        return created
+
+    def unpaid(self):
+        return self.filter(status__in=["PENDING", "EXPIRED"])
+
+    def pending(self):
+        return self.filter(status="PENDING")
+
+    def expire_due(self, now=None):
+        """
+        Expire every pending payment past its deadline in one UPDATE over
+        payment_pending_expires_idx. Returns the number of rows changed.
+        """
+        return (
+            self.pending()
+            .filter(expires_at__lte=now or timezone.now())
+            .update(status="EXPIRED")
+        )
+
+    def reusable(self, borrowing_id, payment_type, min_remaining=None):
+        """
+        Pending sessions for the borrowing and type that are still worth
+        handing out again, latest deadline first.
+        """
+        min_remaining = min_remaining or REUSABLE_SESSION_MIN_REMAINING
+        return (
+            self.pending()
+            .filter(
+                borrowing_id=borrowing_id,
+                type=payment_type,
+                expires_at__gt=timezone.now() + min_remaining,
+            )
+            .order_by("-expires_at")
+        )
+
+    def near_deadline(self, window, now=None):
+        """Pending payments whose session expires within `window`."""
+        now = now or timezone.now()
+        return (
+            self.pending()
+            .exclude(session_id="")
+            .filter(expires_at__gt=now, expires_at__lte=now + window)
+        )
+
+
 class Payment(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES)
     type = models.CharField(max_length=10, choices=TYPE_CHOICES)
     created_at = models.DateTimeField(auto_now_add=True)
-    expires_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(default=default_expires_at)
     borrowing = models.ForeignKey(
         Borrowing,
         on_delete=models.CASCADE,
@@ -28,11 +148,92 @@ class Payment(models.Model):
     session_url = models.URLField()
     session_id = models.CharField(max_length=255)
     money_to_pay = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    session_error = models.TextField(blank=True)
+
+    objects = PaymentQuerySet.as_manager()
 
     def save(self, *args, **kwargs):
         if not self.expires_at:
-            self.expires_at = timezone.now() + timezone.timedelta(hours=24)
-        super().save(*args, **kwargs)
+            self.expires_at = default_expires_at()
+        with transaction.atomic():
+            borrower = lock_users(self._borrower())
+            super().save(*args, **kwargs)
+            refresh_pending_payment_flags(borrower)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            borrower = lock_users(self._borrower())
+            deleted = super().delete(*args, **kwargs)
+            refresh_pending_payment_flags(borrower)
+        return deleted
+
+    def _borrower(self):
+        return get_user_model().objects.filter(borrowings=self.borrowing_id)
+
+    @property
+    def session_ready(self):
+        return bool(self.session_id)
 
     def __str__(self):
         return f"Payment {self.session_id} ({self.status})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["session_id", "borrowing", "type"],
+                condition=~models.Q(session_id=""),
+                name="unique_payment_session_item",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["expires_at"],
+                condition=models.Q(status="PENDING"),
+                name="payment_pending_expires_idx",
+            ),
+            models.Index(fields=["session_id"], name="payment_session_id_idx"),
+        ]
+
+
+class StripeEvent(models.Model):
+    """
+    Raw Stripe webhook events, append-only. The primary key is Stripe's
+    event id, so a redelivered event is dropped on insert.
+    """
+
+    event_id = models.CharField(max_length=255, primary_key=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"StripeEvent {self.event_id} ({self.type})"
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["received_at"],
+                condition=models.Q(processed_at__isnull=True),
+                name="stripe_event_unprocessed_idx",
+            ),
+        ]
+
+
+class Fine(models.Model):
+    """
+    Fines ledger: the fine accrued by an overdue borrowing as of
+    `accrued_on`, refreshed nightly by payment.fines.accrue_overdue_fines.
+    """
+
+    borrowing = models.OneToOneField(
+        Borrowing, on_delete=models.CASCADE, related_name="fine"
+    )
+    overdue_days = models.PositiveIntegerField()
+    daily_fee = models.DecimalField(max_digits=10, decimal_places=2)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    accrued_on = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Fine {self.amount} for borrowing {self.borrowing_id}"
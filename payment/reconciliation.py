@@ -0,0 +1,193 @@
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from payment.gateways import get_gateway
+from payment.models import Payment
+from payment.webhooks import close_overdue_borrowings
+
+RECONCILE_PAGE_SIZE = 100
+RECONCILE_CHUNK_SIZE = 2000
+RECONCILE_WINDOW = timedelta(days=30)
+# How far apart a session's creation at the gateway and its Payment row's
+# created_at may be (async checkouts create the row first).
+RECONCILE_CLOCK_SKEW = timedelta(hours=1)
+MAX_REPORTED_MISMATCHES = 100
+
+
+@dataclass
+class ReconciliationReport:
+    sessions: int = 0
+    matched: int = 0
+    marked_paid: int = 0
+    marked_expired: int = 0
+    unknown_sessions: int = 0
+    missing_at_gateway: int = 0
+    mismatches: list = field(default_factory=list)
+    duration_s: float = 0.0
+
+    def mismatch(self, kind, session_id, ours, theirs):
+        if len(self.mismatches) < MAX_REPORTED_MISMATCHES:
+            self.mismatches.append(
+                {"kind": kind, "session_id": session_id, "ours": ours, "theirs": theirs}
+            )
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def gateway_status(session):
+    if session.payment_status == "paid":
+        return "PAID"
+    if session.status == "expired":
+        return "EXPIRED"
+    return "PENDING"
+
+
+def iter_gateway_chunks(gateway, created_gte, page_size, chunk_size):
+    """Sessions from the list API, one page per call, regrouped into chunks."""
+    chunk, starting_after, has_more = [], None, True
+    while has_more:
+        page, has_more = gateway.list_sessions(
+            created_gte=created_gte, starting_after=starting_after, limit=page_size
+        )
+        if not page:
+            break
+        chunk.extend(page)
+        starting_after = page[-1].id
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def reconcile_chunk(sessions, report, dry_run):
+    """
+    Join one chunk of gateway sessions to our payments with a single
+    indexed session_id lookup, then apply corrections with one UPDATE per
+    target status. A settle-all session is shared by several payments, so
+    each of them is compared. A PAID payment is never downgraded, only
+    reported.
+    """
+    theirs = {session.id: gateway_status(session) for session in sessions}
+    ours = defaultdict(list)
+    for session_id, status in Payment.objects.filter(
+        session_id__in=theirs
+    ).values_list("session_id", "status"):
+        ours[session_id].append(status)
+
+    to_paid, to_expired = [], []
+    for session_id, their_status in theirs.items():
+        if session_id not in ours:
+            report.unknown_sessions += 1
+            report.mismatch("unknown_session", session_id, None, their_status)
+            continue
+        for our_status in ours[session_id]:
+            if our_status == their_status:
+                report.matched += 1
+                continue
+            report.mismatch("status", session_id, our_status, their_status)
+            if their_status == "PAID":
+                to_paid.append(session_id)
+            elif their_status == "EXPIRED" and our_status == "PENDING":
+                to_expired.append(session_id)
+
+    if dry_run:
+        return
+    with transaction.atomic():
+        report.marked_paid += (
+            Payment.objects.filter(session_id__in=to_paid)
+            .exclude(status="PAID")
+            .update(status="PAID")
+        )
+        report.marked_expired += (
+            Payment.objects.pending()
+            .filter(session_id__in=to_expired)
+            .update(status="EXPIRED")
+        )
+        close_overdue_borrowings(to_paid)
+
+
+def iter_our_sessions(since, chunk_size):
+    """
+    (session_id, created_at) of each session we opened since `since`,
+    newest first, once however many payments share it.
+    """
+    return (
+        Payment.objects.filter(created_at__gte=since)
+        .exclude(session_id="")
+        .values("session_id")
+        .annotate(created=Min("created_at"))
+        .order_by("-created", "session_id")
+        .values_list("session_id", "created")
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def check_missing(head, ours, listed, report, newer_than=None):
+    """
+    Report our sessions, from `head` on, that are not among the `listed`
+    gateway session ids, while they were created after the `newer_than`
+    timestamp (all of them when None). Returns the first unchecked one.
+    """
+    while head is not None:
+        session_id, created = head
+        if newer_than is not None and created.timestamp() <= newer_than:
+            return head
+        if session_id not in listed:
+            report.missing_at_gateway += 1
+            report.mismatch("missing_at_gateway", session_id, None, None)
+        head = next(ours, None)
+    return None
+
+
+def reconcile_payments(
+    since=None,
+    dry_run=False,
+    page_size=RECONCILE_PAGE_SIZE,
+    chunk_size=RECONCILE_CHUNK_SIZE,
+):
+    """
+    Compare every checkout session created since `since` (default: the
+    last 30 days) with our Payment rows and fix drifted statuses. Also
+    counts our sessions in the window that the gateway never returned.
+
+    The gateway lists sessions newest first, and our sessions are read
+    in the same order, so the two are merged by creation time. A listed
+    session id is kept only while one of ours created within
+    RECONCILE_CLOCK_SKEW of it is still unchecked: memory stays bounded
+    by the sessions opened in twice the skew, not by the window.
+    """
+    started = time.monotonic()
+    since = since or timezone.now() - RECONCILE_WINDOW
+    skew = RECONCILE_CLOCK_SKEW.total_seconds()
+    report = ReconciliationReport()
+
+    ours = iter_our_sessions(since, chunk_size)
+    head = next(ours, None)
+    listed = {}
+    chunks = iter_gateway_chunks(
+        get_gateway(), int(since.timestamp() - skew), page_size, chunk_size
+    )
+    for sessions in chunks:
+        report.sessions += len(sessions)
+        reconcile_chunk(sessions, report, dry_run)
+
+        listed.update((session.id, session.created) for session in sessions)
+        oldest = min(session.created for session in sessions)
+        head = check_missing(head, ours, listed, report, newer_than=oldest + skew)
+        listed = {
+            session_id: created
+            for session_id, created in listed.items()
+            if created <= oldest + 2 * skew
+        }
+    check_missing(head, ours, listed, report)
+
+    report.duration_s = round(time.monotonic() - started, 2)
+    return report
@@ -0,0 +1,195 @@
+import threading
+import time
+
+from django.utils.module_loading import import_string
+
+from payment.gateways import GatewayError, GatewayUnavailable, PaymentGateway
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(GatewayUnavailable):
+    """Rejected without calling the provider: the circuit is open."""
+
+
+class BulkheadFull(GatewayUnavailable):
+    """Rejected without calling the provider: too many calls in flight."""
+
+
+class CircuitBreaker:
+    """
+    Counts consecutive transient failures. At `failure_threshold` the
+    circuit opens and calls fail fast for `recovery_timeout` seconds, then
+    one trial call is let through (half-open): success closes the circuit,
+    failure opens it again.
+    """
+
+    def __init__(
+        self, failure_threshold=5, recovery_timeout=30.0, clock=time.monotonic
+    ):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.rejected = 0
+        self.times_opened = 0
+
+    def before_call(self):
+        with self.lock:
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.recovery_timeout:
+                    self.rejected += 1
+                    raise CircuitOpen("Payment provider circuit is open")
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN:
+                if self.trial_in_flight:
+                    self.rejected += 1
+                    raise CircuitOpen("Payment provider circuit is half-open")
+                self.trial_in_flight = True
+
+    def record_success(self):
+        with self.lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.times_opened += 1
+                self.state = OPEN
+                self.opened_at = self.clock()
+
+    def release_trial(self):
+        with self.lock:
+            self.trial_in_flight = False
+
+    def retry_after(self):
+        if self.state != OPEN:
+            return 0
+        return max(0.0, self.recovery_timeout - (self.clock() - self.opened_at))
+
+
+class Bulkhead:
+    """Caps concurrent calls per process; waits `acquire_timeout` for a slot."""
+
+    def __init__(self, max_concurrent=10, acquire_timeout=0.5):
+        self.max_concurrent = max_concurrent
+        self.acquire_timeout = acquire_timeout
+        self.semaphore = threading.BoundedSemaphore(max_concurrent)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+
+    def __enter__(self):
+        if not self.semaphore.acquire(timeout=self.acquire_timeout):
+            with self.lock:
+                self.rejected += 1
+            raise BulkheadFull("Too many payment provider calls in flight")
+        with self.lock:
+            self.in_flight += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self.lock:
+            self.in_flight -= 1
+        self.semaphore.release()
+        return False
+
+
+class ResilientGateway(PaymentGateway):
+    """
+    Wraps another gateway with a bulkhead and a circuit breaker. Rejected
+    calls raise GatewayUnavailable subclasses; transient GatewayErrors
+    (timeouts, connection and provider errors) count toward opening the
+    circuit, while rejections such as an unknown session do not.
+
+    Configure it as the PAYMENT_GATEWAY backend and name the wrapped one
+    in OPTIONS["gateway"], e.g.
+    {"BACKEND": "payment.resilience.ResilientGateway",
+     "OPTIONS": {"gateway": {"BACKEND": "payment.gateways.StripeGateway"}}}
+    """
+
+    def __init__(
+        self,
+        gateway,
+        failure_threshold=5,
+        recovery_timeout=30.0,
+        max_concurrent=10,
+        acquire_timeout=0.5,
+    ):
+        if isinstance(gateway, dict):
+            gateway = import_string(gateway["BACKEND"])(**gateway.get("OPTIONS", {}))
+        self.gateway = gateway
+        self.breaker = CircuitBreaker(failure_threshold, recovery_timeout)
+        self.bulkhead = Bulkhead(max_concurrent, acquire_timeout)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+
+    def call(self, operation, *args, **kwargs):
+        self.breaker.before_call()
+        try:
+            with self.bulkhead:
+                with self.lock:
+                    self.calls += 1
+                result = getattr(self.gateway, operation)(*args, **kwargs)
+        except BulkheadFull:
+            self.breaker.release_trial()
+            raise
+        except GatewayError as error:
+            if not error.transient:
+                self.breaker.record_success()
+                raise
+            with self.lock:
+                self.failures += 1
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.release_trial()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def create_session(
+        self, line_items, success_url, cancel_url, idempotency_key=None
+    ):
+        return self.call(
+            "create_session", line_items, success_url, cancel_url, idempotency_key
+        )
+
+    def retrieve_session(self, session_id):
+        return self.call("retrieve_session", session_id)
+
+    def list_sessions(self, created_gte=None, starting_after=None, limit=100):
+        return self.call("list_sessions", created_gte, starting_after, limit)
+
+    def __getattr__(self, name):
+        # Anything else (e.g. FakeGateway.set_status) goes to the wrapped gateway.
+        if name == "gateway":
+            raise AttributeError(name)
+        return getattr(self.gateway, name)
+
+    def metrics(self):
+        return {
+            "gateway": type(self.gateway).__name__,
+            "circuit_state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "times_opened": self.breaker.times_opened,
+            "retry_after": round(self.breaker.retry_after(), 1),
+            "rejected_open": self.breaker.rejected,
+            "rejected_full": self.bulkhead.rejected,
+            "in_flight": self.bulkhead.in_flight,
+            "max_concurrent": self.bulkhead.max_concurrent,
+            "calls": self.calls,
+            "failures": self.failures,
+        }
@@ -0,0 +1,111 @@
+from contextlib import contextmanager
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Exists, F, OuterRef, Q, Subquery
+
+from borrowings_service.models import Borrowing
+from payment.fines import accrue_fines
+from payment.models import Payment
+
+SETTLEMENT_LOCK_TIMEOUT = 60
+
+
+@dataclass(frozen=True)
+class OwedItem:
+    borrowing_id: int
+    type: str
+    name: str
+    amount: Decimal
+
+
+def owed_items(user):
+    """
+    Everything `user` still owes, gathered in one query over their
+    borrowings: the unpaid rental payment of each borrowing (PENDING or
+    EXPIRED) unless the rental was already paid, and its accrued fine,
+    unless that fine was already paid.
+    """
+    accrue_fines(Borrowing.objects.filter(user=user, actual_return_date__isnull=True))
+
+    unpaid_rental = (
+        Payment.objects.unpaid()
+        .filter(borrowing=OuterRef("pk"), type="PAYMENT")
+        .order_by("-created_at")
+        .values("money_to_pay")[:1]
+    )
+    rental_paid = Payment.objects.filter(
+        borrowing=OuterRef("pk"), type="PAYMENT", status="PAID"
+    )
+    fine_paid = Payment.objects.filter(
+        borrowing=OuterRef("pk"), type="FINE", status="PAID"
+    )
+    borrowings = (
+        Borrowing.objects.filter(user=user)
+        .annotate(
+            rental_due=Subquery(unpaid_rental),
+            rental_paid=Exists(rental_paid),
+            fine_due=F("fine__amount"),
+            fine_paid=Exists(fine_paid),
+            book_title=F("book__title"),
+        )
+        .filter(
+            Q(rental_due__isnull=False, rental_paid=False)
+            | Q(fine_due__isnull=False, fine_paid=False)
+        )
+        .order_by("pk")
+        .values(
+            "pk", "book_title", "rental_due", "rental_paid", "fine_due", "fine_paid"
+        )
+    )
+
+    items = []
+    for row in borrowings:
+        if row["rental_due"] and not row["rental_paid"]:
+            items.append(
+                OwedItem(
+                    row["pk"],
+                    "PAYMENT",
+                    f"Borrowing: {row['book_title']}",
+                    row["rental_due"],
+                )
+            )
+        if row["fine_due"] and not row["fine_paid"]:
+            items.append(
+                OwedItem(
+                    row["pk"], "FINE", f"Fine: {row['book_title']}", row["fine_due"]
+                )
+            )
+    return items
+
+
+def supersede_unpaid(items):
+    """
+    Expire the pending payments that a consolidated session replaces, so
+    only the new session can be paid for those items.
+    """
+    superseded = Q()
+    for item in items:
+        superseded |= Q(borrowing_id=item.borrowing_id, type=item.type)
+    return Payment.objects.pending().filter(superseded).update(status="EXPIRED")
+
+
+def settlement_key(user):
+    return f"payments:settle-all:{user.pk}"
+
+
+@contextmanager
+def settlement_reserved(user):
+    """
+    Reserve `user`'s debts for one settlement, for at most
+    SETTLEMENT_LOCK_TIMEOUT seconds. Yields False when another settlement
+    holds them. Unlike a row lock it can be held across the gateway call
+    without keeping a transaction open.
+    """
+    reserved = cache.add(settlement_key(user), 1, SETTLEMENT_LOCK_TIMEOUT)
+    try:
+        yield reserved
+    finally:
+        if reserved:
+            cache.delete(settlement_key(user))
@@ -1,27 +1,67 @@
-import stripe
 from celery import shared_task
-from django.utils import timezone
-from stripe.checkout import Session
 
-from core.settings import STRIPE_SECRET_KEY
+from payment.expiry import sweep_expired_payments
+from payment.fines import accrue_overdue_fines
+from payment.gateways import GatewayError, LineItem, get_gateway
+from payment.models import Payment
+from payment.reconciliation import reconcile_payments
+from payment.webhooks import process_events
 
-from .models import Payment
 
-stripe.api_key = STRIPE_SECRET_KEY
+@shared_task
+def check_expired_sessions():
+    return sweep_expired_payments()
 
 
 @shared_task
-def check_expired_sessions():
-    pending_payments = Payment.objects.filter(status="PENDING")
-
-    for payment in pending_payments:
-        try:
-            session: Session = stripe.checkout.Session.retrieve(payment.session_id)  # noqa 
-            if timezone.now() > payment.created_at + timezone.timedelta(hours=24):
-                payment.status = "EXPIRED"
-                payment.save()
-        except stripe.error.StripeError:
-            payment.status = "EXPIRED"
-            payment.save()
-
-    return f"Checked {pending_payments.count()} pending payments"
+def process_stripe_events():
+    return process_events()
+
+
+@shared_task
+def accrue_fines_nightly():
+    return f"Accrued {accrue_overdue_fines()} fines"
+
+
+@shared_task
+def reconcile_payments_nightly():
+    return reconcile_payments().as_dict()
+
+
+@shared_task(bind=True, max_retries=3)
+def create_checkout_session(self, payment_id, success_url, cancel_url):
+    """
+    Open the gateway session for a placeholder Payment written by the
+    asynchronous create-session endpoint. The idempotency key is tied to
+    the payment, so retries never open a second session.
+    """
+    payment = (
+        Payment.objects.pending()
+        .select_related("borrowing__book")
+        .filter(pk=payment_id, session_id="")
+        .first()
+    )
+    if payment is None:
+        return f"Payment {payment_id} needs no session"
+
+    placeholder = Payment.objects.filter(pk=payment_id, session_id="")
+    try:
+        session = get_gateway().create_session(
+            line_items=[
+                LineItem(
+                    name=f"Borrowing: {payment.borrowing.book.title}",
+                    unit_amount=int(payment.money_to_pay * 100),
+                )
+            ],
+            success_url=success_url,
+            cancel_url=cancel_url,
+            idempotency_key=f"payment-{payment_id}-session",
+        )
+    except GatewayError as error:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=error, countdown=2**self.request.retries)
+        placeholder.update(status="EXPIRED", session_error=str(error))
+        return f"Payment {payment_id} session failed: {error}"
+
+    placeholder.update(session_id=session.id, session_url=session.url)
+    return f"Payment {payment_id} session {session.id} ready"
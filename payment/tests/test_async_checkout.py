@@ -0,0 +1,108 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from book_service.models import Book
+from borrowings_service.models import Borrowing
+from payment.models import Payment
+from payment.tasks import create_checkout_session
+from payment.views import POLL_RETRY_AFTER
+
+FAKE_GATEWAY = {"BACKEND": "payment.gateways.FakeGateway", "OPTIONS": {}}
+
+
+@override_settings(PAYMENT_GATEWAY=FAKE_GATEWAY)
+class AsyncCheckoutTests(APITestCase):
+    @patch("django.db.models.signals.ModelSignal.send")
+    def setUp(self, mock_signal):
+        self.user = get_user_model().objects.create_user("async@test.com", "pass")
+        book = Book.objects.create(
+            title="Async",
+            author="Author",
+            cover="HARD",
+            inventory=10,
+            daily_fee=Decimal("1.00"),
+        )
+        self.borrowing = Borrowing.objects.create(
+            borrow_date=timezone.now().date(),
+            expected_return_date=timezone.now().date() + timezone.timedelta(days=3),
+            book=book,
+            user=self.user,
+        )
+        self.url = reverse(
+            "payments:payments-create-session", kwargs={"pk": self.borrowing.pk}
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def start_checkout(self):
+        with patch.object(create_checkout_session, "delay") as mock_delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(self.url + "?async=true")
+        return response, mock_delay
+
+    def test_async_create_session_returns_job(self):
+        response, mock_delay = self.start_checkout()
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        payment = Payment.objects.get(pk=response.data["payment_id"])
+        self.assertEqual(payment.session_id, "")
+        self.assertEqual(payment.status, "PENDING")
+        self.assertEqual(response["Location"], response.data["job_url"])
+        mock_delay.assert_called_once()
+        self.assertEqual(mock_delay.call_args.args[0], payment.pk)
+
+    def test_retry_returns_the_same_job(self):
+        first, _ = self.start_checkout()
+        second, mock_delay = self.start_checkout()
+
+        self.assertEqual(second.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(first.data["payment_id"], second.data["payment_id"])
+        mock_delay.assert_not_called()
+
+    def test_worker_fills_in_session_and_poll_reports_it(self):
+        response, mock_delay = self.start_checkout()
+        job_url = response.data["job_url"]
+
+        # Pending jobs answer at once; the old long-poll `wait` is ignored.
+        pending = self.client.get(job_url, {"wait": 20})
+        self.assertEqual(pending.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(pending["Retry-After"], "1")
+
+        create_checkout_session.apply(args=mock_delay.call_args.args)
+
+        ready = self.client.get(job_url)
+        self.assertEqual(ready.status_code, status.HTTP_200_OK)
+        self.assertEqual(ready.data["status"], "ready")
+        payment = Payment.objects.get(pk=response.data["payment_id"])
+        self.assertEqual(ready.data["session_id"], payment.session_id)
+        self.assertTrue(payment.session_url)
+
+    def test_pending_status_tells_the_client_when_to_poll_again(self):
+        response, _ = self.start_checkout()
+
+        pending = self.client.get(response.data["job_url"])
+
+        self.assertEqual(pending.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(pending.data["status"], "pending")
+        self.assertEqual(pending["Retry-After"], str(POLL_RETRY_AFTER))
+
+    def test_gateway_failure_is_reported(self):
+        response, mock_delay = self.start_checkout()
+
+        with override_settings(
+            PAYMENT_GATEWAY={**FAKE_GATEWAY, "OPTIONS": {"error_rate": 1.0}}
+        ):
+            create_checkout_session.apply(args=mock_delay.call_args.args)
+
+        failed = self.client.get(response.data["job_url"])
+        self.assertEqual(failed.data["status"], "failed")
+        payment = Payment.objects.get(pk=response.data["payment_id"])
+        self.assertEqual(payment.status, "EXPIRED")
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.has_pending_payments)
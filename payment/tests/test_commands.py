@@ -0,0 +1,26 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from borrowings_service.models import Borrowing
+from payment.models import Payment
+
+
+class CheckQueryPlansCommandTest(TestCase):
+    def test_hot_queries_use_indexes(self):
+        out = StringIO()
+        call_command("check_query_plans", seed=500, users=20, stdout=out)
+        self.assertIn("All hot queries use an index", out.getvalue())
+
+    def test_seeded_rows_are_rolled_back(self):
+        call_command("check_query_plans", seed=200, users=10, stdout=StringIO())
+        self.assertFalse(Borrowing.objects.exists())
+        self.assertFalse(Payment.objects.exists())
+
+    @patch("django.db.models.QuerySet.explain", return_value="SCAN payment_payment")
+    def test_sequential_scan_fails(self, mock_explain):
+        with self.assertRaises(CommandError):
+            call_command("check_query_plans", seed=10, users=2, stdout=StringIO())
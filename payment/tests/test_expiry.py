@@ -0,0 +1,135 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from book_service.models import Book
+from borrowings_service.models import Borrowing
+from payment.expiry import sweep_expired_payments
+from payment.gateways import FakeGateway, LineItem, get_gateway
+from payment.models import Payment
+
+
+@override_settings(
+    PAYMENT_GATEWAY={"BACKEND": "payment.gateways.FakeGateway", "OPTIONS": {}}
+)
+class PaymentExpirySweepTest(TestCase):
+    @patch("django.db.models.signals.ModelSignal.send")
+    def setUp(self, mock_signal):
+        self.user = get_user_model().objects.create_user("sweep@test.com", "pass")
+        book = Book.objects.create(
+            title="Sweep",
+            author="Author",
+            cover="HARD",
+            inventory=10,
+            daily_fee="1.00",
+        )
+        self.borrowing = Borrowing.objects.create(
+            borrow_date="2024-01-01",
+            expected_return_date="2024-01-02",
+            book=book,
+            user=self.user,
+        )
+
+    def create_payment(self, session_id, expires_in, status="PENDING"):
+        return Payment.objects.create(
+            status=status,
+            type="PAYMENT",
+            borrowing=self.borrowing,
+            session_url="https://example.com/pay",
+            session_id=session_id,
+            money_to_pay=Decimal("1.00"),
+            expires_at=timezone.now() + expires_in,
+        )
+
+    def test_new_payment_expires_in_24_hours(self):
+        payment = Payment.objects.create(
+            status="PENDING",
+            type="PAYMENT",
+            borrowing=self.borrowing,
+            session_url="https://example.com/pay",
+            session_id="cs_default",
+        )
+        self.assertAlmostEqual(
+            payment.expires_at - timezone.now(),
+            timezone.timedelta(hours=24),
+            delta=timezone.timedelta(minutes=1),
+        )
+
+    def open_session(self):
+        return get_gateway().create_session(
+            [LineItem("Sweep", 100)], "https://x/success", "https://x/cancel"
+        ).id
+
+    @patch.object(FakeGateway, "retrieve_session")
+    def test_overdue_payments_expire_without_gateway_calls(self, mock_retrieve):
+        overdue = self.create_payment("cs_overdue", -timezone.timedelta(minutes=1))
+        later = self.create_payment("cs_later", timezone.timedelta(hours=5))
+
+        metrics = sweep_expired_payments()
+
+        mock_retrieve.assert_not_called()
+        overdue.refresh_from_db()
+        later.refresh_from_db()
+        self.assertEqual(overdue.status, "EXPIRED")
+        self.assertEqual(later.status, "PENDING")
+        self.assertEqual(metrics["expired"], 1)
+        self.assertEqual(metrics["expired_due"], 1)
+        self.assertEqual(metrics["checked"], 0)
+        self.assertEqual(metrics["scanned"], 1)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.has_pending_payments)
+
+    def test_near_deadline_sessions_are_checked_with_gateway(self):
+        gateway = get_gateway()
+        paid, closed, still_open = (self.open_session() for _ in range(3))
+        gateway.set_status(paid, "complete", "paid")
+        gateway.set_status(closed, "expired", "unpaid")
+        for session_id in (paid, closed, still_open, "cs_unknown"):
+            self.create_payment(session_id, timezone.timedelta(minutes=5))
+
+        metrics = sweep_expired_payments()
+
+        statuses = dict(Payment.objects.values_list("session_id", "status"))
+        self.assertEqual(
+            statuses,
+            {
+                paid: "PAID",
+                closed: "EXPIRED",
+                still_open: "PENDING",
+                "cs_unknown": "PENDING",
+            },
+        )
+        self.assertEqual(metrics["checked"], 4)
+        self.assertEqual(metrics["scanned"], 4)
+        self.assertEqual(metrics["changed"], 2)
+        self.assertEqual(metrics["gateway_errors"], 1)
+
+    @patch("payment.webhooks.send_notification_on_success_payment")
+    def test_paid_session_is_completed_like_a_webhook(self, mock_notify):
+        session_id = self.open_session()
+        get_gateway().set_status(session_id, "complete", "paid")
+        payment = self.create_payment(session_id, timezone.timedelta(minutes=5))
+
+        metrics = sweep_expired_payments()
+
+        self.assertEqual(metrics["paid"], 1)
+        self.assertEqual(metrics["returned"], 1)
+        self.borrowing.refresh_from_db()
+        self.assertIsNotNone(self.borrowing.actual_return_date)
+        mock_notify.assert_called_once()
+        self.assertEqual(mock_notify.call_args.args[0].pk, payment.pk)
+
+    def test_gateway_checks_are_capped(self):
+        for _ in range(3):
+            self.create_payment(self.open_session(), timezone.timedelta(minutes=5))
+
+        with patch.object(
+            FakeGateway, "retrieve_session", wraps=get_gateway().retrieve_session
+        ) as mock_retrieve:
+            metrics = sweep_expired_payments(max_checks=2)
+
+        self.assertEqual(mock_retrieve.call_count, 2)
+        self.assertEqual(metrics["checked"], 2)
@@ -0,0 +1,116 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from book_service.models import Book
+from borrowings_service.models import Borrowing
+from payment.fines import FINE_MULTIPLIER, accrue_overdue_fines
+from payment.models import Fine, Payment
+
+OUTSTANDING_URL = reverse("payments:payments-outstanding-fines")
+
+
+@override_settings(
+    PAYMENT_GATEWAY={"BACKEND": "payment.gateways.FakeGateway", "OPTIONS": {}}
+)
+class FineLedgerTests(APITestCase):
+    @patch("django.db.models.signals.ModelSignal.send")
+    def setUp(self, mock_signal):
+        self.today = timezone.now().date()
+        self.user = get_user_model().objects.create_user("fines@test.com", "pass")
+        self.other_user = get_user_model().objects.create_user("other@test.com", "pass")
+        self.admin = get_user_model().objects.create_superuser("staff@test.com", "pass")
+        self.book = Book.objects.create(
+            title="Fines",
+            author="Author",
+            cover="HARD",
+            inventory=10,
+            daily_fee=Decimal("3.33"),
+        )
+        self.overdue = self.borrow(self.user, days_overdue=3)
+        self.other_overdue = self.borrow(self.other_user, days_overdue=1)
+        self.on_time = self.borrow(self.user, days_overdue=-2)
+
+    def borrow(self, user, days_overdue):
+        expected = self.today - timezone.timedelta(days=days_overdue)
+        return Borrowing.objects.create(
+            borrow_date=expected - timezone.timedelta(days=7),
+            expected_return_date=expected,
+            book=self.book,
+            user=user,
+        )
+
+    def test_accrual_prices_active_overdue_borrowings(self):
+        self.assertEqual(accrue_overdue_fines(batch_size=1), 2)
+
+        fine = Fine.objects.get(borrowing=self.overdue)
+        self.assertEqual(fine.overdue_days, 3)
+        self.assertEqual(fine.amount, Decimal("3.33") * 3 * FINE_MULTIPLIER)
+        self.assertEqual(fine.accrued_on, self.today)
+        self.assertFalse(Fine.objects.filter(borrowing=self.on_time).exists())
+
+    def test_accrual_upserts_existing_rows(self):
+        yesterday = self.today - timezone.timedelta(days=1)
+        accrue_overdue_fines(today=yesterday)
+        accrue_overdue_fines()
+
+        fine = Fine.objects.get(borrowing=self.overdue)
+        self.assertEqual(Fine.objects.count(), 2)
+        self.assertEqual(fine.overdue_days, 3)
+        self.assertEqual(fine.accrued_on, self.today)
+
+    def test_create_session_charges_the_ledger_amount(self):
+        accrue_overdue_fines()
+        Fine.objects.filter(borrowing=self.overdue).update(amount=Decimal("42.00"))
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.post(
+            reverse("payments:payments-create-session", kwargs={"pk": self.overdue.pk})
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        payment = Payment.objects.get(session_id=response.data["session_id"])
+        self.assertEqual(payment.type, "FINE")
+        self.assertEqual(payment.money_to_pay, Decimal("42.00"))
+
+    def test_create_session_accrues_missing_fine(self):
+        self.client.force_authenticate(user=self.user)
+
+        self.client.post(
+            reverse("payments:payments-create-session", kwargs={"pk": self.overdue.pk})
+        )
+
+        self.assertTrue(Fine.objects.filter(borrowing=self.overdue).exists())
+
+    def test_staff_see_all_outstanding_fines(self):
+        accrue_overdue_fines()
+        self.client.force_authenticate(user=self.admin)
+
+        response = self.client.get(OUTSTANDING_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(response.data["total"], Decimal("3.33") * 4 * FINE_MULTIPLIER)
+        self.assertEqual(response.data["results"][0]["borrowing_id"], self.overdue.pk)
+
+    def test_user_sees_own_unpaid_fines(self):
+        accrue_overdue_fines()
+        Payment.objects.create(
+            status="PAID",
+            type="FINE",
+            borrowing=self.other_overdue,
+            session_url="https://example.com/pay",
+            session_id="cs_paid_fine",
+        )
+        self.client.force_authenticate(user=self.other_user)
+
+        response = self.client.get(OUTSTANDING_URL)
+
+        self.assertEqual(response.data["count"], 0)
+        self.assertEqual(response.data["results"], [])
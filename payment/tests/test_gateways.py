@@ -0,0 +1,80 @@
+from unittest.mock import patch
+
+import stripe
+from django.test import SimpleTestCase, override_settings
+
+from payment.gateways import (
+    FakeGateway,
+    GatewayError,
+    LineItem,
+    StripeGateway,
+    get_gateway,
+)
+
+ITEMS = [LineItem("Borrowing: Dune", 1250), LineItem("Borrowing: Emma", 500, 2)]
+
+
+class FakeGatewayTest(SimpleTestCase):
+    def test_create_and_retrieve_session(self):
+        gateway = FakeGateway()
+        session = gateway.create_session(ITEMS, "https://x/ok", "https://x/cancel")
+
+        self.assertEqual(session.amount_total, 2250)
+        self.assertEqual(session.payment_status, "unpaid")
+        self.assertEqual(gateway.retrieve_session(session.id), session)
+
+        gateway.set_status(session.id)
+        self.assertEqual(gateway.retrieve_session(session.id).payment_status, "paid")
+
+    def test_idempotency_key_returns_the_same_session(self):
+        gateway = FakeGateway()
+        first = gateway.create_session(ITEMS, "ok", "cancel", idempotency_key="k")
+        second = gateway.create_session(ITEMS, "ok", "cancel", idempotency_key="k")
+        self.assertEqual(first.id, second.id)
+
+    def test_error_rate(self):
+        gateway = FakeGateway(error_rate=1.0)
+        with self.assertRaises(GatewayError):
+            gateway.create_session(ITEMS, "ok", "cancel")
+
+    def test_unknown_session(self):
+        with self.assertRaises(GatewayError):
+            FakeGateway().retrieve_session("cs_missing")
+
+    def test_list_sessions_pages(self):
+        gateway = FakeGateway()
+        for _ in range(3):
+            gateway.create_session(ITEMS, "ok", "cancel")
+
+        page, has_more = gateway.list_sessions(limit=2)
+        self.assertEqual(len(page), 2)
+        self.assertTrue(has_more)
+        rest, has_more = gateway.list_sessions(starting_after=page[-1].id, limit=2)
+        self.assertEqual(len(rest), 1)
+        self.assertFalse(has_more)
+
+
+class GetGatewayTest(SimpleTestCase):
+    @override_settings(
+        PAYMENT_GATEWAY={
+            "BACKEND": "payment.gateways.FakeGateway",
+            "OPTIONS": {"latency": 0.5},
+        }
+    )
+    def test_builds_configured_backend_once(self):
+        gateway = get_gateway()
+        self.assertIsInstance(gateway, FakeGateway)
+        self.assertEqual(gateway.latency, 0.5)
+        self.assertIs(get_gateway(), gateway)
+
+
+class StripeGatewayTest(SimpleTestCase):
+    def test_stripe_errors_become_gateway_errors(self):
+        gateway = StripeGateway(api_key="sk_test_123")
+        with patch.object(
+            gateway.sessions("retrieve_session"),
+            "retrieve",
+            side_effect=stripe.error.APIConnectionError("offline"),
+        ):
+            with self.assertRaises(GatewayError):
+                gateway.retrieve_session("cs_123")
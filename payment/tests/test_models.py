@@ -3,11 +3,13 @@ from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase
 
 from book_service.models import Book
 from borrowings_service.models import Borrowing
-from payment.models import Payment
+from payment import models as payment_models
+from payment.models import Payment, lock_users
 
 
 class PaymentModelTest(TestCase):
@@ -72,3 +74,59 @@ class PaymentModelTest(TestCase):
         with self.assertRaises(ValidationError):
             self.payment.status = "INVALID"
             self.payment.full_clean()
+
+    def test_pending_payment_sets_user_flag(self):
+        """Test that a pending payment flags its borrower."""
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.has_pending_payments)
+
+    def test_paid_payment_clears_user_flag(self):
+        """Test that paying the last pending payment clears the flag."""
+        self.payment.status = "PAID"
+        self.payment.save()
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.has_pending_payments)
+
+    def test_bulk_status_update_refreshes_user_flag(self):
+        """Test that queryset updates keep the flag in sync."""
+        Payment.objects.filter(pk=self.payment.pk).update(status="EXPIRED")
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.has_pending_payments)
+
+    def test_delete_payment_clears_user_flag(self):
+        """Test that deleting the pending payment clears the flag."""
+        self.payment.delete()
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.has_pending_payments)
+
+    def test_borrower_is_locked_before_write_until_flag_refresh(self):
+        """
+        Test that the borrower stays locked from before the status write
+        until the flag refresh, so a concurrent writer for the same user
+        waits instead of refreshing against a stale snapshot.
+        """
+        events = []
+        depth = len(connection.savepoint_ids)
+
+        def lock(users):
+            status = Payment.objects.get(pk=self.payment.pk).status
+            events.append(("lock", status, len(connection.savepoint_ids)))
+            return lock_users(users)
+
+        def refresh(users):
+            status = Payment.objects.get(pk=self.payment.pk).status
+            events.append(("refresh", status, len(connection.savepoint_ids)))
+            return refresh_flags(users)
+
+        refresh_flags = payment_models.refresh_pending_payment_flags
+        with patch("payment.models.lock_users", side_effect=lock), patch(
+            "payment.models.refresh_pending_payment_flags", side_effect=refresh
+        ):
+            Payment.objects.filter(pk=self.payment.pk).update(status="PAID")
+
+        self.assertEqual(
+            events,
+            [("lock", "PENDING", depth + 1), ("refresh", "PAID", depth + 1)],
+        )
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.has_pending_payments)
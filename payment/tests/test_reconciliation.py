@@ -0,0 +1,186 @@
+from dataclasses import replace
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from book_service.models import Book
+from borrowings_service.models import Borrowing
+from payment.gateways import FakeGateway, GatewayError, LineItem, get_gateway
+from payment.models import Payment
+from payment.reconciliation import reconcile_payments
+
+
+@override_settings(
+    PAYMENT_GATEWAY={"BACKEND": "payment.gateways.FakeGateway", "OPTIONS": {}}
+)
+class ReconcilePaymentsTest(TestCase):
+    @patch("django.db.models.signals.ModelSignal.send")
+    def setUp(self, mock_signal):
+        get_gateway.cache_clear()
+        self.gateway = get_gateway()
+        self.user = get_user_model().objects.create_user("recon@test.com", "pass")
+        self.book = Book.objects.create(
+            title="Recon",
+            author="Author",
+            cover="HARD",
+            inventory=5,
+            daily_fee="1.00",
+        )
+        self.borrowing = Borrowing.objects.create(
+            borrow_date=timezone.now().date() - timedelta(days=10),
+            expected_return_date=timezone.now().date() - timedelta(days=3),
+            book=self.book,
+            user=self.user,
+        )
+
+    def tearDown(self):
+        get_gateway.cache_clear()
+
+    def open_session(self):
+        return self.gateway.create_session(
+            line_items=[LineItem(name="Fine", unit_amount=100)],
+            success_url="https://example.com/success",
+            cancel_url="https://example.com/cancel",
+        )
+
+    def create_payment(self, session_id, status="PENDING", type="FINE"):
+        return Payment.objects.create(
+            status=status,
+            type=type,
+            borrowing=self.borrowing,
+            session_url="https://example.com/pay",
+            session_id=session_id,
+            money_to_pay=Decimal("1.00"),
+        )
+
+    def test_corrects_drifted_statuses_and_reports_mismatches(self):
+        paid, expired, open_, settled = (self.open_session() for _ in range(4))
+        unknown = self.open_session()
+        self.gateway.set_status(paid.id)
+        self.gateway.set_status(expired.id, status="expired", payment_status="unpaid")
+        self.gateway.set_status(settled.id)
+        self.create_payment(paid.id)
+        self.create_payment(expired.id)
+        self.create_payment(open_.id)
+        self.create_payment(settled.id, status="PAID")
+        self.create_payment("cs_never_listed")
+
+        report = reconcile_payments(page_size=2, chunk_size=3)
+
+        self.assertEqual(report.sessions, 5)
+        self.assertEqual(report.matched, 2)
+        self.assertEqual(report.marked_paid, 1)
+        self.assertEqual(report.marked_expired, 1)
+        self.assertEqual(report.unknown_sessions, 1)
+        self.assertEqual(report.missing_at_gateway, 1)
+        self.assertEqual(
+            {(m["kind"], m["session_id"]) for m in report.mismatches},
+            {
+                ("status", paid.id),
+                ("status", expired.id),
+                ("unknown_session", unknown.id),
+                ("missing_at_gateway", "cs_never_listed"),
+            },
+        )
+        statuses = dict(Payment.objects.values_list("session_id", "status"))
+        self.assertEqual(statuses[paid.id], "PAID")
+        self.assertEqual(statuses[expired.id], "EXPIRED")
+        self.assertEqual(statuses[open_.id], "PENDING")
+
+    def test_every_payment_of_a_shared_session_is_compared(self):
+        session = self.open_session()
+        self.gateway.set_status(session.id)
+        self.create_payment(session.id)
+        self.create_payment(session.id, type="PAYMENT")
+
+        report = reconcile_payments()
+
+        self.assertEqual(report.sessions, 1)
+        self.assertEqual(report.marked_paid, 2)
+        self.assertEqual(len(report.mismatches), 2)
+        self.assertEqual(report.missing_at_gateway, 0)
+        self.assertEqual(
+            list(Payment.objects.values_list("status", flat=True)), ["PAID", "PAID"]
+        )
+
+    def test_missing_sessions_are_found_across_chunks(self):
+        now = timezone.now()
+        for hours in (0, 3, 6):
+            session = self.open_session()
+            self.gateway.sessions[session.id] = replace(
+                self.gateway.sessions[session.id],
+                created=int((now - timedelta(hours=hours)).timestamp()),
+            )
+            # The row lands a little after the session was opened.
+            payment = self.create_payment(session.id)
+            Payment.objects.filter(pk=payment.pk).update(
+                created_at=now - timedelta(hours=hours, seconds=-30)
+            )
+        missing = self.create_payment("cs_never_listed")
+        Payment.objects.filter(pk=missing.pk).update(
+            created_at=now - timedelta(hours=3)
+        )
+
+        report = reconcile_payments(page_size=1, chunk_size=1)
+
+        self.assertEqual(report.sessions, 3)
+        self.assertEqual(report.matched, 3)
+        self.assertEqual(report.missing_at_gateway, 1)
+        self.assertEqual(report.mismatches[0]["session_id"], "cs_never_listed")
+
+    def test_paid_overdue_borrowing_is_closed(self):
+        session = self.open_session()
+        self.gateway.set_status(session.id)
+        self.create_payment(session.id)
+
+        reconcile_payments()
+
+        self.borrowing.refresh_from_db()
+        self.book.refresh_from_db()
+        self.assertEqual(self.borrowing.actual_return_date, timezone.now().date())
+        self.assertEqual(self.book.inventory, 6)
+
+    def test_paid_payment_is_never_downgraded(self):
+        session = self.open_session()
+        self.gateway.set_status(session.id, status="expired", payment_status="unpaid")
+        self.create_payment(session.id, status="PAID")
+
+        report = reconcile_payments()
+
+        self.assertEqual(report.mismatches[0]["ours"], "PAID")
+        self.assertEqual(Payment.objects.get().status, "PAID")
+
+    def test_dry_run_changes_nothing(self):
+        session = self.open_session()
+        self.gateway.set_status(session.id)
+        self.create_payment(session.id)
+
+        report = reconcile_payments(dry_run=True)
+
+        self.assertEqual(len(report.mismatches), 1)
+        self.assertEqual(report.marked_paid, 0)
+        self.assertEqual(Payment.objects.get().status, "PENDING")
+
+    def test_command_prints_summary(self):
+        session = self.open_session()
+        self.gateway.set_status(session.id)
+        self.create_payment(session.id)
+        out = StringIO()
+
+        call_command("reconcile_payments", "--dry-run", stdout=out)
+
+        self.assertIn(session.id, out.getvalue())
+        self.assertIn("1 sessions", out.getvalue())
+
+    def test_command_fails_on_gateway_error(self):
+        with patch.object(
+            FakeGateway, "list_sessions", side_effect=GatewayError("down")
+        ):
+            with self.assertRaisesMessage(CommandError, "Gateway error: down"):
+                call_command("reconcile_payments", stdout=StringIO())
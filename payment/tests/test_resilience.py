@@ -0,0 +1,172 @@
+import threading
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from base.testing import FakeClock
+from book_service.models import Book
+from borrowings_service.models import Borrowing
+from payment.gateways import FakeGateway, GatewayError, LineItem, get_gateway
+from payment.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    BulkheadFull,
+    CircuitBreaker,
+    CircuitOpen,
+    ResilientGateway,
+)
+
+ITEMS = [LineItem("Borrowing: Dune", 1000)]
+
+RESILIENT_FAKE = {
+    "BACKEND": "payment.resilience.ResilientGateway",
+    "OPTIONS": {
+        "gateway": {"BACKEND": "payment.gateways.FakeGateway"},
+        "failure_threshold": 2,
+        "recovery_timeout": 60,
+    },
+}
+
+
+class CircuitBreakerTest(SimpleTestCase):
+    def test_opens_after_threshold_and_recovers_through_half_open(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=10, clock=clock)
+
+        for _ in range(2):
+            breaker.before_call()
+            breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        with self.assertRaises(CircuitOpen):
+            breaker.before_call()
+
+        clock.now = 11
+        breaker.before_call()
+        self.assertEqual(breaker.state, HALF_OPEN)
+        with self.assertRaises(CircuitOpen):
+            breaker.before_call()
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertEqual(breaker.rejected, 2)
+
+    def test_failed_trial_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=10, clock=clock)
+        breaker.before_call()
+        breaker.record_failure()
+
+        clock.now = 11
+        breaker.before_call()
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, OPEN)
+        self.assertEqual(breaker.times_opened, 2)
+
+
+class ResilientGatewayTest(SimpleTestCase):
+    def test_transient_failures_open_the_circuit(self):
+        gateway = ResilientGateway(FakeGateway(error_rate=1.0), failure_threshold=2)
+
+        for _ in range(2):
+            with self.assertRaises(GatewayError):
+                gateway.create_session(ITEMS, "ok", "cancel")
+        with self.assertRaises(CircuitOpen):
+            gateway.create_session(ITEMS, "ok", "cancel")
+
+        metrics = gateway.metrics()
+        self.assertEqual(metrics["circuit_state"], OPEN)
+        self.assertEqual(metrics["rejected_open"], 1)
+        self.assertEqual(metrics["calls"], 2)
+
+    def test_rejected_requests_do_not_open_the_circuit(self):
+        gateway = ResilientGateway(FakeGateway(), failure_threshold=1)
+
+        for _ in range(3):
+            with self.assertRaises(GatewayError):
+                gateway.retrieve_session("cs_missing")
+
+        self.assertEqual(gateway.metrics()["circuit_state"], CLOSED)
+
+    def test_bulkhead_caps_concurrent_calls(self):
+        release = threading.Event()
+        inner = FakeGateway()
+        gateway = ResilientGateway(inner, max_concurrent=1, acquire_timeout=0.01)
+
+        def slow_call(*args, **kwargs):
+            release.wait(5)
+            return "done"
+
+        with patch.object(inner, "retrieve_session", side_effect=slow_call):
+            worker = threading.Thread(target=gateway.retrieve_session, args=["cs"])
+            worker.start()
+            while gateway.bulkhead.in_flight == 0:
+                pass
+            with self.assertRaises(BulkheadFull):
+                gateway.retrieve_session("cs")
+            release.set()
+            worker.join()
+
+        self.assertEqual(gateway.metrics()["rejected_full"], 1)
+        self.assertEqual(gateway.metrics()["in_flight"], 0)
+
+
+@override_settings(PAYMENT_GATEWAY=RESILIENT_FAKE)
+class GatewayUnavailableViewTest(APITestCase):
+    @patch("django.db.models.signals.ModelSignal.send")
+    def setUp(self, mock_signal):
+        get_gateway.cache_clear()
+        self.user = get_user_model().objects.create_user("open@test.com", "pass")
+        self.admin = get_user_model().objects.create_superuser("ops@test.com", "pass")
+        book = Book.objects.create(
+            title="Open",
+            author="Author",
+            cover="HARD",
+            inventory=10,
+            daily_fee=Decimal("1.00"),
+        )
+        self.borrowing = Borrowing.objects.create(
+            borrow_date=timezone.now().date(),
+            expected_return_date=timezone.now().date() + timezone.timedelta(days=3),
+            book=book,
+            user=self.user,
+        )
+
+    def trip_circuit(self):
+        breaker = get_gateway().breaker
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+
+    def test_open_circuit_returns_503(self):
+        self.trip_circuit()
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.post(
+            reverse(
+                "payments:payments-create-session", kwargs={"pk": self.borrowing.pk}
+            )
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertGreater(int(response["Retry-After"]), 0)
+
+    def test_gateway_status_is_staff_only(self):
+        self.trip_circuit()
+        url = reverse("payments:payments-gateway-status")
+
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["backend"], "ResilientGateway")
+        self.assertEqual(response.data["gateway"], "FakeGateway")
+        self.assertEqual(response.data["circuit_state"], OPEN)
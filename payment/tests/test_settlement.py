@@ -0,0 +1,172 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from book_service.models import Book
+from borrowings_service.models import Borrowing
+from payment.fines import FINE_MULTIPLIER
+from payment.gateways import FakeGateway
+from payment.models import Payment
+from payment.settlement import settlement_key
+from payment.webhooks import process_events, record_event
+
+SETTLE_URL = reverse("payments:payments-settle-all")
+
+
+@override_settings(
+    PAYMENT_GATEWAY={"BACKEND": "payment.gateways.FakeGateway", "OPTIONS": {}}
+)
+class SettleAllTests(APITestCase):
+    @patch("django.db.models.signals.ModelSignal.send")
+    def setUp(self, mock_signal):
+        today = timezone.now().date()
+        self.user = get_user_model().objects.create_user("settle@test.com", "pass")
+        self.book = Book.objects.create(
+            title="Settle",
+            author="Author",
+            cover="HARD",
+            inventory=10,
+            daily_fee=Decimal("2.00"),
+        )
+        self.first, self.second = (
+            Borrowing.objects.create(
+                borrow_date=today - timezone.timedelta(days=10),
+                expected_return_date=today - timezone.timedelta(days=days),
+                book=self.book,
+                user=self.user,
+            )
+            for days in (2, 5)
+        )
+        self.rental = Payment.objects.create(
+            status="PENDING",
+            type="PAYMENT",
+            borrowing=self.first,
+            session_url="https://example.com/pay",
+            session_id="cs_rental",
+            money_to_pay=Decimal("16.00"),
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_settle_all_opens_one_session_for_everything_owed(self):
+        with patch.object(
+            FakeGateway,
+            "create_session",
+            autospec=True,
+            side_effect=FakeGateway.create_session,
+        ) as mock_create:
+            response = self.client.post(SETTLE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(mock_create.call_count, 1)
+        self.assertEqual(len(mock_create.call_args.kwargs["line_items"]), 3)
+
+        fee = Decimal("2.00") * FINE_MULTIPLIER
+        self.assertEqual(response.data["total"], Decimal("16.00") + fee * 2 + fee * 5)
+
+        payments = Payment.objects.filter(session_id=response.data["session_id"])
+        self.assertEqual(
+            set(payments.values_list("borrowing_id", "type")),
+            {
+                (self.first.pk, "PAYMENT"),
+                (self.first.pk, "FINE"),
+                (self.second.pk, "FINE"),
+            },
+        )
+        self.rental.refresh_from_db()
+        self.assertEqual(self.rental.status, "EXPIRED")
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.has_pending_payments)
+
+    def test_gateway_is_called_outside_any_transaction(self):
+        depth = len(connection.savepoint_ids)
+        depths = []
+        original = FakeGateway.create_session
+
+        def create_session(gateway, *args, **kwargs):
+            depths.append(len(connection.savepoint_ids))
+            return original(gateway, *args, **kwargs)
+
+        with patch.object(
+            FakeGateway, "create_session", autospec=True, side_effect=create_session
+        ):
+            response = self.client.post(SETTLE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(depths, [depth])
+
+    def test_concurrent_settlement_is_rejected(self):
+        cache.add(settlement_key(self.user), 1)
+        self.addCleanup(cache.delete, settlement_key(self.user))
+
+        response = self.client.post(SETTLE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Payment.objects.exclude(pk=self.rental.pk).exists())
+
+    def test_paid_fines_are_not_settled_again(self):
+        Payment.objects.create(
+            status="PAID",
+            type="FINE",
+            borrowing=self.second,
+            session_url="https://example.com/pay",
+            session_id="cs_paid",
+        )
+
+        response = self.client.post(SETTLE_URL)
+
+        self.assertEqual(
+            {(item["borrowing_id"], item["type"]) for item in response.data["items"]},
+            {(self.first.pk, "PAYMENT"), (self.first.pk, "FINE")},
+        )
+
+    def test_paid_rental_is_not_settled_again(self):
+        Payment.objects.filter(pk=self.rental.pk).update(status="EXPIRED")
+        Payment.objects.create(
+            status="PAID",
+            type="PAYMENT",
+            borrowing=self.first,
+            session_url="https://example.com/pay",
+            session_id="cs_rental_paid",
+            money_to_pay=Decimal("16.00"),
+        )
+
+        response = self.client.post(SETTLE_URL)
+
+        self.assertEqual(
+            {(item["borrowing_id"], item["type"]) for item in response.data["items"]},
+            {(self.first.pk, "FINE"), (self.second.pk, "FINE")},
+        )
+
+    def test_paying_a_superseded_session_is_recorded(self):
+        self.client.post(SETTLE_URL)
+        self.rental.refresh_from_db()
+        self.assertEqual(self.rental.status, "EXPIRED")
+
+        record_event(
+            {
+                "id": "evt_superseded",
+                "type": "checkout.session.completed",
+                "data": {"object": {"id": "cs_rental", "payment_status": "paid"}},
+            }
+        )
+        result = process_events()
+
+        self.assertEqual(result["paid"], 1)
+        self.rental.refresh_from_db()
+        self.assertEqual(self.rental.status, "PAID")
+
+    def test_nothing_to_settle(self):
+        other = get_user_model().objects.create_user("clean@test.com", "pass")
+        self.client.force_authenticate(user=other)
+
+        response = self.client.post(SETTLE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
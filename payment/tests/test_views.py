@@ -2,20 +2,27 @@ from decimal import Decimal
 from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from base.testing import QueryBudgetMixin
 from book_service.models import Book
 from borrowings_service.models import Borrowing
+from payment.gateways import FakeGateway, GatewayError
 from payment.models import Payment
 from payment.views import FINE_MULTIPLIER
 
 PAYMENT_URL = reverse("payments:payments-list")
 
 
-class PaymentViewSetTests(APITestCase):
+@override_settings(
+    PAYMENT_GATEWAY={"BACKEND": "payment.gateways.FakeGateway", "OPTIONS": {}}
+)
+class PaymentViewSetTests(QueryBudgetMixin, APITestCase):
     @patch("django.db.models.signals.ModelSignal.send")
     def setUp(self, mock_signal):
         self.admin = get_user_model().objects.create_superuser(
@@ -79,6 +86,24 @@ class PaymentViewSetTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 2)
 
+    @patch("django.db.models.signals.ModelSignal.send")
+    def test_list_payments_query_budget(self, mock_signal):
+        for number in range(20):
+            Payment.objects.create(
+                status="PAID",
+                type="PAYMENT",
+                borrowing=self.other_borrowing,
+                session_url="http://example.com",
+                session_id=f"budget-{number}",
+                money_to_pay=Decimal("1.00"),
+            )
+        self.client.force_authenticate(user=self.admin)
+
+        with self.assertQueryBudget(1):
+            response = self.client.get(PAYMENT_URL)
+
+        self.assertEqual(len(response.data), 22)
+
     def test_user_can_view_own_payments(self):
         self.client.force_authenticate(user=self.user)
         response = self.client.get(PAYMENT_URL)
@@ -103,6 +128,19 @@ class PaymentViewSetTests(APITestCase):
         reverse("book_service:books-detail", kwargs={"pk": self.book.pk})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_admin_can_export_payments(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse("payments:payments-export"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = b"".join(response.streaming_content).splitlines()
+        self.assertEqual(len(rows), 2)
+        self.assertIn(self.user.email.encode(), rows[0])
+
+    def test_user_cannot_export_payments(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse("payments:payments-export"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
     def test_anonymous_user_cannot_access_payments(self):
         response = self.client.get(PAYMENT_URL)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -118,6 +156,50 @@ class PaymentViewSetTests(APITestCase):
         self.assertIn("session_url", response.data)
         self.assertIn("session_id", response.data)
 
+    def test_create_session_calls_gateway_after_commit(self):
+        self.client.force_authenticate(user=self.user)
+        depth = len(connection.savepoint_ids)
+        calls = []
+        original = FakeGateway.create_session
+
+        def create_session(gateway, *args, **kwargs):
+            placeholder = Payment.objects.get(borrowing=self.borrowing, type="FINE")
+            calls.append((len(connection.savepoint_ids), placeholder.session_id))
+            return original(gateway, *args, **kwargs)
+
+        with patch.object(
+            FakeGateway, "create_session", autospec=True, side_effect=create_session
+        ):
+            response = self.client.post(
+                reverse(
+                    "payments:payments-create-session", kwargs={"pk": self.borrowing.id}
+                )
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(calls, [(depth, "")])
+        payment = Payment.objects.get(borrowing=self.borrowing, type="FINE")
+        self.assertEqual(payment.session_id, response.data["session_id"])
+
+    def test_create_session_gateway_failure_expires_placeholder(self):
+        self.client.force_authenticate(user=self.user)
+
+        with patch.object(
+            FakeGateway,
+            "create_session",
+            side_effect=GatewayError("card declined", transient=False),
+        ):
+            response = self.client.post(
+                reverse(
+                    "payments:payments-create-session", kwargs={"pk": self.borrowing.id}
+                )
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        payment = Payment.objects.get(borrowing=self.borrowing, type="FINE")
+        self.assertEqual(payment.status, "EXPIRED")
+        self.assertEqual(payment.session_error, "card declined")
+
     def test_create_stripe_session_for_non_existing_borrowing(self):
         self.client.force_authenticate(user=self.user)
         response = self.client.post("/api/payments/999/create-session/")
@@ -168,6 +250,80 @@ class PaymentViewSetTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("Session ID is required", str(response.data))
 
+    def test_renew_expired_session(self):
+        self.client.force_authenticate(user=self.user)
+        Payment.objects.filter(pk=self.payment.pk).update(status="EXPIRED")
+
+        response = self.client.post(
+            reverse("payments:payments-renew-session", kwargs={"pk": self.payment.pk})
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "PENDING")
+        self.assertEqual(self.payment.session_id, response.data["session_id"])
+
+    def test_create_session_reuses_pending_session(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse(
+            "payments:payments-create-session", kwargs={"pk": self.borrowing.id}
+        )
+
+        first = self.client.post(url)
+        second = self.client.post(url)
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(
+            Payment.objects.filter(borrowing=self.borrowing, type="FINE").count(), 1
+        )
+
+    def test_create_session_replays_idempotency_key(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse(
+            "payments:payments-create-session", kwargs={"pk": self.borrowing.id}
+        )
+
+        first = self.client.post(url, HTTP_IDEMPOTENCY_KEY="retry-1")
+        Payment.objects.filter(borrowing=self.borrowing, type="FINE").delete()
+        replayed = self.client.post(url, HTTP_IDEMPOTENCY_KEY="retry-1")
+
+        self.assertEqual(replayed.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replayed.data, first.data)
+        self.assertEqual(replayed["Idempotent-Replayed"], "true")
+        self.assertFalse(
+            Payment.objects.filter(borrowing=self.borrowing, type="FINE").exists()
+        )
+
+    def test_idempotency_key_with_different_body_is_rejected(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse(
+            "payments:payments-create-session", kwargs={"pk": self.borrowing.id}
+        )
+
+        self.client.post(url, {"a": 1}, HTTP_IDEMPOTENCY_KEY="retry-2")
+        response = self.client.post(url, {"a": 2}, HTTP_IDEMPOTENCY_KEY="retry-2")
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_renew_returns_still_valid_session(self):
+        self.client.force_authenticate(user=self.user)
+        Payment.objects.filter(pk=self.payment.pk).update(
+            status="EXPIRED", expires_at=timezone.now()
+        )
+        url = reverse("payments:payments-renew-session", kwargs={"pk": self.payment.pk})
+
+        first = self.client.post(url)
+        second = self.client.post(url)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data, second.data)
+        self.payment.refresh_from_db()
+        self.assertGreater(
+            self.payment.expires_at, timezone.now() + timezone.timedelta(hours=23)
+        )
+
     def test_fine_created_for_overdue_return(self):
         self.client.force_authenticate(user=self.user)
 
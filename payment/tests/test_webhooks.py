@@ -0,0 +1,166 @@
+import hashlib
+import hmac
+import json
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from base.testing import postgresql_sql
+from book_service.models import Book
+from borrowings_service.models import Borrowing
+from library_bot.models import OutboxMessage
+from payment.models import Payment, StripeEvent
+from payment.webhooks import overdue_borrowings_paid_by, process_events
+
+WEBHOOK_SECRET = "whsec_test"
+WEBHOOK_URL = reverse("payments:payments-webhook")
+
+
+def checkout_event(event_id, event_type, session_id, payment_status="paid"):
+    return {
+        "id": event_id,
+        "object": "event",
+        "type": event_type,
+        "data": {
+            "object": {
+                "id": session_id,
+                "object": "checkout.session",
+                "payment_status": payment_status,
+            }
+        },
+    }
+
+
+def sign(payload, secret=WEBHOOK_SECRET):
+    timestamp = int(time.time())
+    signature = hmac.new(
+        secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+    ).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+class StripeWebhookTests(APITestCase):
+    @patch("django.db.models.signals.ModelSignal.send")
+    def setUp(self, mock_signal):
+        self.user = get_user_model().objects.create_user(
+            email="hook@example.com", password="password"
+        )
+        self.book = Book.objects.create(
+            title="Hook",
+            author="Author",
+            cover="HARD",
+            inventory=3,
+            daily_fee=Decimal("1.00"),
+        )
+        self.borrowing = Borrowing.objects.create(
+            borrow_date=timezone.now().date() - timezone.timedelta(days=10),
+            expected_return_date=timezone.now().date() - timezone.timedelta(days=3),
+            book=self.book,
+            user=self.user,
+        )
+        self.payment = Payment.objects.create(
+            status="PENDING",
+            type="FINE",
+            borrowing=self.borrowing,
+            session_url="https://example.com/pay",
+            session_id="cs_hook",
+            money_to_pay=Decimal("6.00"),
+        )
+
+    def post_event(self, event, secret=WEBHOOK_SECRET):
+        payload = json.dumps(event)
+        return self.client.post(
+            WEBHOOK_URL,
+            payload,
+            content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=sign(payload, secret),
+        )
+
+    def test_signed_event_is_recorded_once(self):
+        event = checkout_event("evt_1", "checkout.session.completed", "cs_hook")
+
+        self.assertEqual(self.post_event(event).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.post_event(event).status_code, status.HTTP_200_OK)
+
+        self.assertEqual(StripeEvent.objects.count(), 1)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "PENDING")
+
+    def test_bad_signature_is_rejected(self):
+        event = checkout_event("evt_1", "checkout.session.completed", "cs_hook")
+
+        response = self.post_event(event, secret="whsec_other")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(StripeEvent.objects.exists())
+
+    def test_completed_session_marks_payment_paid_and_closes_borrowing(self):
+        self.post_event(checkout_event("evt_1", "checkout.session.completed", "cs_hook"))
+
+        result = process_events()
+
+        self.assertEqual(result, {"events": 1, "paid": 1, "expired": 0, "closed": 1})
+        self.payment.refresh_from_db()
+        self.borrowing.refresh_from_db()
+        self.book.refresh_from_db()
+        self.assertEqual(self.payment.status, "PAID")
+        self.assertEqual(self.borrowing.actual_return_date, timezone.now().date())
+        self.assertEqual(self.book.inventory, 4)
+        self.assertTrue(OutboxMessage.objects.filter(text__contains="cs_hook").exists())
+        self.assertFalse(StripeEvent.objects.filter(processed_at__isnull=True).exists())
+
+    def test_processing_is_idempotent(self):
+        self.post_event(checkout_event("evt_1", "checkout.session.completed", "cs_hook"))
+        process_events()
+        self.post_event(checkout_event("evt_2", "checkout.session.completed", "cs_hook"))
+
+        result = process_events()
+
+        self.assertEqual(result["paid"], 0)
+        self.assertEqual(result["closed"], 0)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 4)
+
+    def test_expired_session_marks_payment_expired(self):
+        self.post_event(
+            checkout_event("evt_1", "checkout.session.expired", "cs_hook", "unpaid")
+        )
+
+        process_events()
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "EXPIRED")
+
+    def test_success_redirect_reads_payment_status(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse("payments:payments-success")
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"session_id": "cs_hook"})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        Payment.objects.filter(pk=self.payment.pk).update(status="PAID")
+        response = self.client.get(url, {"session_id": "cs_hook"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(url, {"session_id": "cs_missing"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CloseOverdueBorrowingsSQLTests(SimpleTestCase):
+    def test_lock_query_is_valid_on_postgresql(self):
+        sql = postgresql_sql(
+            overdue_borrowings_paid_by(["cs_1"]).values_list("pk", "book_id")
+        )
+
+        self.assertIn("FOR UPDATE", sql)
+        self.assertNotIn("DISTINCT", sql)
+        self.assertNotIn("JOIN", sql)
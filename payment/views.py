@@ -1,23 +1,55 @@
+import json
+import math
 from decimal import Decimal
+from functools import partial
 
 import stripe
 from django.db import transaction
+from django.db.models import F
+from django.forms.models import model_to_dict
+from django.urls import reverse
 from django.utils import timezone
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import OpenApiParameter, extend_schema
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 
 from django.conf import settings
-from library_bot.bot import send_notification_on_success_payment
-from payment.models import Borrowing, Payment
+from base.exports import EXPORT_FORMATS, stream_export
+from base.idempotency import idempotent
+from payment.fines import FINE_MULTIPLIER, current_fine, total_owed, unpaid_fines
+from payment.gateways import (
+    GatewayError,
+    GatewayUnavailable,
+    LineItem,
+    get_gateway,
+)
+from payment.models import Borrowing, Payment, default_expires_at
 from payment.serializers import PaymentSerializer
+from payment.settlement import owed_items, settlement_reserved, supersede_unpaid
+from payment.tasks import create_checkout_session
+from payment.webhooks import record_event
+
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
+OUTSTANDING_FINES_LIMIT = 100
+SESSION_STATE_FIELDS = ("session_id", "session_url", "session_error")
+# Seconds a client should wait before polling a pending checkout again.
+POLL_RETRY_AFTER = 1
 
-FINE_MULTIPLIER = 2
+
+def gateway_error_response(error):
+    """400 for a rejected request, 503 while the provider is unavailable."""
+    if isinstance(error, GatewayUnavailable):
+        breaker = getattr(get_gateway(), "breaker", None)
+        retry_after = breaker.retry_after() if breaker else 0
+        return Response(
+            {"error": str(error)},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+    return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
 
 
 @extend_schema(
@@ -40,81 +72,353 @@ class PaymentViewSet(
         """Admin see all payments, user - only his own"""
 
         user = self.request.user
+        queryset = Payment.objects.select_related("borrowing__user")
         if user.is_staff:
-            return Payment.objects.all()
-        return Payment.objects.filter(borrowing__user=user)
+            return queryset
+        return queryset.filter(borrowing__user=user)
+
+    @extend_schema(
+        summary="Payment Gateway Status",
+        description=(
+            "Circuit breaker state and rejected-call counts of this process's "
+            "payment gateway (staff only)."
+        ),
+        responses={200: None},
+    )
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="gateway-status",
+        permission_classes=[IsAdminUser],
+    )
+    def gateway_status(self, request):
+        gateway = get_gateway()
+        metrics = gateway.metrics() if hasattr(gateway, "metrics") else {}
+        return Response({"backend": type(gateway).__name__, **metrics})
+
+    @extend_schema(
+        summary="Export Payments",
+        description="Stream payments as NDJSON or CSV (staff only).",
+        parameters=[
+            OpenApiParameter(
+                name="file_format",
+                description="Export format",
+                required=False,
+                type=str,
+                enum=list(EXPORT_FORMATS),
+            ),
+        ],
+        responses={200: None},
+    )
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="export",
+        permission_classes=[IsAdminUser],
+    )
+    def export(self, request):
+        return stream_export(
+            request,
+            self.filter_queryset(self.get_queryset()).order_by("id"),
+            columns=[
+                ("id", "id"),
+                ("status", "status"),
+                ("type", "type"),
+                ("created_at", "created_at"),
+                ("expires_at", "expires_at"),
+                ("borrowing_id", "borrowing_id"),
+                ("user_email", "borrowing__user__email"),
+                ("session_id", "session_id"),
+                ("money_to_pay", "money_to_pay"),
+            ],
+            filename="payments",
+        )
+
+    @extend_schema(
+        summary="Outstanding Fines",
+        description=(
+            "Fines accrued on overdue borrowings that are not paid yet, "
+            "largest first, with the total owed. Staff see every borrower."
+        ),
+        responses={200: None},
+    )
+    @action(detail=False, methods=["get"], url_path="outstanding-fines")
+    def outstanding_fines(self, request):
+        fines = unpaid_fines()
+        if not request.user.is_staff:
+            fines = fines.filter(borrowing__user=request.user)
+
+        rows = fines.order_by("-amount", "borrowing_id").values(
+            "borrowing_id",
+            "overdue_days",
+            "amount",
+            "accrued_on",
+            user_email=F("borrowing__user__email"),
+            book_title=F("borrowing__book__title"),
+        )[:OUTSTANDING_FINES_LIMIT]
+        return Response(
+            {"count": fines.count(), "total": total_owed(fines), "results": list(rows)}
+        )
+
+    @staticmethod
+    def checkout_terms(borrowing):
+        """Payment type and amount owed for `borrowing` right now."""
+        fine = current_fine(borrowing)
+        if fine:
+            return "FINE", fine.amount
+        return "PAYMENT", Decimal(
+            borrowing.book.daily_fee
+            * (borrowing.expected_return_date - borrowing.borrow_date).days
+        )
+
+    @staticmethod
+    def checkout_urls(request):
+        return (
+            request.build_absolute_uri("/payments/success/")
+            + "?session_id={CHECKOUT_SESSION_ID}",
+            request.build_absolute_uri("/payments/cancel/"),
+        )
 
+    def session_response(self, payment, status_code):
+        if not payment.session_ready:
+            return self.job_response(payment)
+        return Response(
+            {"session_url": payment.session_url, "session_id": payment.session_id},
+            status=status_code,
+        )
+
+    def job_response(self, payment):
+        job_url = self.request.build_absolute_uri(
+            reverse("payments:payments-session-status", kwargs={"pk": payment.pk})
+        )
+        return Response(
+            {"payment_id": payment.pk, "status": "pending", "job_url": job_url},
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": job_url},
+        )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="async",
+                description=(
+                    "Return 202 with a job URL at once and open the session "
+                    "in a background worker"
+                ),
+                required=False,
+                type=bool,
+            ),
+        ],
+    )
     @action(detail=True, methods=["post"], url_path="create-session")
+    @idempotent
     def create_session(self, request, pk=None):
         """
-        Create a Stripe payment session for a specific borrowing.
+        Create a Stripe payment session for a specific borrowing. A pending
+        session for the same borrowing and payment type that is still valid
+        is returned instead of opening a new one.
+
+        The borrowing is locked only while the PENDING placeholder is
+        written; the gateway is called after that commits, so neither the
+        row lock nor the DB connection is held while Stripe answers.
         """
         borrowing = get_object_or_404(Borrowing, id=pk)
+        if request.query_params.get("async") in ("1", "true"):
+            return self.create_session_async(request, borrowing)
 
-        try:
-            with transaction.atomic():
-                is_fine = False
-                fine_amount = Decimal(0)
-                actual_date = timezone.now().date()
-
-                if borrowing.expected_return_date < actual_date:
-                    overdue_days = (actual_date - borrowing.expected_return_date).days
-                    if overdue_days > 0:
-                        is_fine = True
-                        fine_amount = Decimal(
-                            overdue_days * borrowing.book.daily_fee * FINE_MULTIPLIER
-                        )
+        with transaction.atomic():
+            # Serializes concurrent checkouts of the same borrowing.
+            Borrowing.objects.select_for_update().filter(pk=borrowing.pk).first()
 
-                payment_type = "FINE" if is_fine else "PAYMENT"
-                amount = (
-                    fine_amount
-                    if is_fine
-                    else Decimal(
-                        borrowing.book.daily_fee
-                        * (borrowing.expected_return_date - borrowing.borrow_date).days
+            payment_type, amount = self.checkout_terms(borrowing)
+            existing = Payment.objects.reusable(borrowing.pk, payment_type).first()
+            if existing:
+                return self.session_response(existing, status.HTTP_200_OK)
+
+            payment = Payment.objects.create(
+                borrowing=borrowing,
+                type=payment_type,
+                money_to_pay=amount,
+                status="PENDING",
+            )
+
+        placeholder = Payment.objects.filter(pk=payment.pk, session_id="")
+        success_url, cancel_url = self.checkout_urls(request)
+        try:
+            session = get_gateway().create_session(
+                line_items=[
+                    LineItem(
+                        name=f"Borrowing: {borrowing.book.title}",
+                        unit_amount=int(amount * 100),
                     )
+                ],
+                success_url=success_url,
+                cancel_url=cancel_url,
+                idempotency_key=request.idempotency_key
+                or f"payment-{payment.pk}-session",
+            )
+        except GatewayError as e:
+            placeholder.update(status="EXPIRED", session_error=str(e))
+            return gateway_error_response(e)
+
+        placeholder.update(session_id=session.id, session_url=session.url)
+        payment.session_id, payment.session_url = session.id, session.url
+        return self.session_response(payment, status.HTTP_201_CREATED)
+
+    def create_session_async(self, request, borrowing):
+        """
+        Write a PENDING placeholder without a session and hand the gateway
+        call to the payments queue once the transaction commits, so
+        neither the web worker nor its DB connection waits on Stripe.
+        """
+        with transaction.atomic():
+            Borrowing.objects.select_for_update().filter(pk=borrowing.pk).first()
+
+            payment_type, amount = self.checkout_terms(borrowing)
+            existing = Payment.objects.reusable(borrowing.pk, payment_type).first()
+            if existing:
+                return self.session_response(existing, status.HTTP_200_OK)
+
+            payment = Payment.objects.create(
+                borrowing=borrowing,
+                type=payment_type,
+                money_to_pay=amount,
+                status="PENDING",
+            )
+            transaction.on_commit(
+                partial(
+                    create_checkout_session.delay,
+                    payment.pk,
+                    *self.checkout_urls(request),
                 )
-                session = stripe.checkout.Session.create(
-                    payment_method_types=["card"],
-                    line_items=[
-                        {
-                            "price_data": {
-                                "currency": "usd",
-                                "product_data": {
-                                    "name": f"Borrowing: {borrowing.book.title}"
-                                },
-                                "unit_amount": int(amount * 100),
-                            },
-                            "quantity": 1,
-                        }
-                    ],
-                    mode="payment",
-                    success_url=request.build_absolute_uri("/payments/success/")
-                    + "?session_id={CHECKOUT_SESSION_ID}",
-                    cancel_url=request.build_absolute_uri("/payments/cancel/"),
-                )
+            )
+
+        return self.job_response(payment)
 
-                Payment.objects.create(
-                    borrowing=borrowing,
-                    session_id=session.id,
-                    session_url=session.url,
-                    type=payment_type,
-                    money_to_pay=amount,
-                    status="PENDING",
+    @extend_schema(
+        summary="Checkout Session Status",
+        description=(
+            "Poll an asynchronous checkout. A pending checkout answers 202 at "
+            "once with Retry-After; poll again after that many seconds."
+        ),
+        responses={200: None, 202: None},
+    )
+    @action(detail=True, methods=["get"], url_path="session-status")
+    def session_status(self, request, pk=None):
+        payment = self.get_object()
+        state = model_to_dict(payment, fields=SESSION_STATE_FIELDS)
+        if not state["session_id"] and not state["session_error"]:
+            return Response(
+                {"payment_id": payment.pk, "status": "pending"},
+                status=status.HTTP_202_ACCEPTED,
+                headers={"Retry-After": str(POLL_RETRY_AFTER)},
+            )
+
+        if state["session_error"]:
+            return Response(
+                {
+                    "payment_id": payment.pk,
+                    "status": "failed",
+                    "error": state["session_error"],
+                },
+                status=status.HTTP_200_OK,
+            )
+        return Response(
+            {
+                "payment_id": payment.pk,
+                "status": "ready",
+                "session_url": state["session_url"],
+                "session_id": state["session_id"],
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    @extend_schema(
+        summary="Settle All",
+        description=(
+            "Open one checkout session covering every unpaid payment and "
+            "fine of the current user."
+        ),
+        request=None,
+        responses={201: None, 400: None},
+    )
+    @action(detail=False, methods=["post"], url_path="settle-all")
+    @idempotent
+    def settle_all(self, request):
+        """
+        One checkout session, one line item per owed payment or fine, and
+        one PENDING Payment per item sharing the session id.
+
+        The items are reserved for this settlement and read in a short
+        transaction; the gateway is called with no transaction open, and
+        the superseded payments are expired and the new ones written in a
+        second one.
+        """
+        with settlement_reserved(request.user) as reserved:
+            if not reserved:
+                return Response(
+                    {"error": "A settlement is already in progress"},
+                    status=status.HTTP_409_CONFLICT,
                 )
 
+            with transaction.atomic():
+                items = owed_items(request.user)
+            if not items:
                 return Response(
-                    {"session_url": session.url, "session_id": session.id},
-                    status=status.HTTP_201_CREATED,
+                    {"error": "Nothing to settle"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            success_url, cancel_url = self.checkout_urls(request)
+            try:
+                session = get_gateway().create_session(
+                    line_items=[
+                        LineItem(name=item.name, unit_amount=int(item.amount * 100))
+                        for item in items
+                    ],
+                    success_url=success_url,
+                    cancel_url=cancel_url,
+                    idempotency_key=request.idempotency_key,
+                )
+            except GatewayError as e:
+                return gateway_error_response(e)
+
+            with transaction.atomic():
+                supersede_unpaid(items)
+                Payment.objects.bulk_create(
+                    Payment(
+                        borrowing_id=item.borrowing_id,
+                        type=item.type,
+                        money_to_pay=item.amount,
+                        session_id=session.id,
+                        session_url=session.url,
+                        status="PENDING",
+                    )
+                    for item in items
                 )
 
-        except stripe.error.StripeError as e:
-            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {
+                "session_url": session.url,
+                "session_id": session.id,
+                "total": sum(item.amount for item in items),
+                "items": [
+                    {
+                        "borrowing_id": item.borrowing_id,
+                        "type": item.type,
+                        "amount": item.amount,
+                    }
+                    for item in items
+                ],
+            },
+            status=status.HTTP_201_CREATED,
+        )
 
     @action(detail=False, methods=["get"], url_path="success")
     def success(self, request):
         """
-        Handle successful payment callback.
+        Handle successful payment callback. Completion is recorded by the
+        Stripe webhook, so this only reports the payment's current status.
         """
         session_id = request.query_params.get("session_id")
         if not session_id:
@@ -122,36 +426,58 @@ class PaymentViewSet(
                 {"error": "Session ID is required"}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        try:
-            session = stripe.checkout.Session.retrieve(session_id)
-            if session.payment_status == "paid":
-                payment = Payment.objects.get(session_id=session_id)
-                payment.status = "PAID"
-                payment.save()
-                if payment.borrowing.expected_return_date < timezone.now().date():
-                    payment.borrowing.actual_return_date = timezone.now().date()
-
-                send_notification_on_success_payment(payment)
-
-                return Response(
-                    {"message": "Payment successful", "session_id": session_id},
-                    status=status.HTTP_200_OK,
-                )
+        payment_status = (
+            Payment.objects.filter(session_id=session_id)
+            .values_list("status", flat=True)
+            .first()
+        )
+        if payment_status is None:
+            return Response(
+                {"error": "Payment record not found for the provided session_id"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
 
+        if payment_status == "PAID":
             return Response(
-                {"message": "Payment not completed yet"},
-                status=status.HTTP_202_ACCEPTED,
+                {"message": "Payment successful", "session_id": session_id},
+                status=status.HTTP_200_OK,
             )
 
-        except stripe.error.StripeError as e:
-            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {"message": "Payment not completed yet"},
+            status=status.HTTP_202_ACCEPTED,
+        )
 
-        except Payment.DoesNotExist:
+    @extend_schema(
+        summary="Stripe Webhook",
+        description="Receive signed Stripe events; processing happens in a worker.",
+        request=None,
+        responses={200: None, 400: None},
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="webhook",
+        authentication_classes=[],
+        permission_classes=[AllowAny],
+    )
+    def webhook(self, request):
+        payload = request.body
+        try:
+            stripe.Webhook.construct_event(
+                payload,
+                request.headers.get("Stripe-Signature", ""),
+                settings.STRIPE_WEBHOOK_SECRET,
+            )
+        except (ValueError, stripe.error.SignatureVerificationError):
             return Response(
-                {"error": "Payment record not found for the provided session_id"},
-                status=status.HTTP_404_NOT_FOUND,
+                {"error": "Invalid Stripe signature"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
+        record_event(json.loads(payload))
+        return Response(status=status.HTTP_200_OK)
+
     @action(detail=False, methods=["get"], url_path="cancel")
     def cancel(self, request):
         """
@@ -172,44 +498,58 @@ class PaymentViewSet(
         )
 
     @action(detail=True, methods=["POST"])
+    @idempotent
     def renew_session(self, request, pk=None):
+        """
+        Open a new session for an expired payment. Renewing a payment whose
+        session is still valid, or whose borrowing already has another
+        valid session of the same type, returns that session instead.
+        """
         payment = self.get_object()
-        if payment.status != "EXPIRED":
-            return Response(
-                {"error": "Only expired payments can be renewed"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
 
         try:
-            new_session = stripe.checkout.Session.create(
-                payment_method_types=["card"],
-                line_items=[
-                    {
-                        "price_data": {
-                            "currency": "usd",
-                            "product_data": {
-                                "name": f"Borrowing: {payment.borrowing.book_title}"
-                            },
-                            "unit_amount": int(payment.money_to_pay * 100),
-                        },
-                        "quantity": 1,
-                    }
-                ],
-                mode="payment",
-                success_url=request.build_absolute_uri("/payment/success/")
-                + "?session_id={CHECKOUT_SESSION_ID}",
-                cancel_url=request.build_absolute_uri("/payment/cancel/"),
-            )
+            with transaction.atomic():
+                # Lock only the payment: the book row must stay writable
+                # while the gateway call below is in flight.
+                payment = (
+                    Payment.objects.select_for_update(of=("self",))
+                    .select_related("borrowing__book")
+                    .get(pk=payment.pk)
+                )
+                reusable = Payment.objects.reusable(payment.borrowing_id, payment.type)
+                if reusable.filter(pk=payment.pk).exists():
+                    return self.session_response(payment, status.HTTP_200_OK)
+
+                if payment.status != "EXPIRED":
+                    return Response(
+                        {"error": "Only expired payments can be renewed"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
 
-            payment.session_id = new_session.id
-            payment.session_url = new_session.url
-            payment.status = "PENDING"
-            payment.save()
+                sibling = reusable.first()
+                if sibling:
+                    return self.session_response(sibling, status.HTTP_200_OK)
 
-            return Response(
-                {"session_url": new_session.url, "session_id": new_session.id},
-                status=status.HTTP_200_OK,
-            )
+                new_session = get_gateway().create_session(
+                    line_items=[
+                        LineItem(
+                            name=f"Borrowing: {payment.borrowing.book.title}",
+                            unit_amount=int(payment.money_to_pay * 100),
+                        )
+                    ],
+                    success_url=request.build_absolute_uri("/payment/success/")
+                    + "?session_id={CHECKOUT_SESSION_ID}",
+                    cancel_url=request.build_absolute_uri("/payment/cancel/"),
+                    idempotency_key=request.idempotency_key,
+                )
+
+                payment.session_id = new_session.id
+                payment.session_url = new_session.url
+                payment.status = "PENDING"
+                payment.expires_at = default_expires_at()
+                payment.save()
+
+                return self.session_response(payment, status.HTTP_200_OK)
 
-        except stripe.error.StripeError as e:
-            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except GatewayError as e:
+            return gateway_error_response(e)
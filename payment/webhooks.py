@@ -0,0 +1,149 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Subquery
+from django.utils import timezone
+
+from book_service.inventory import release_copy
+from book_service.models import Book
+from borrowings_service.models import Borrowing
+from library_bot.bot import send_notification_on_success_payment
+from payment.models import Payment, StripeEvent
+
+WEBHOOK_BATCH_SIZE = 500
+
+PAID_EVENTS = {
+    "checkout.session.completed",
+    "checkout.session.async_payment_succeeded",
+}
+EXPIRED_EVENTS = {
+    "checkout.session.expired",
+    "checkout.session.async_payment_failed",
+}
+
+
+def record_event(event):
+    """
+    Store a verified Stripe event. Returns False when the event id was
+    already recorded, so redeliveries are acknowledged but ignored.
+    """
+    _, created = StripeEvent.objects.get_or_create(
+        event_id=event["id"],
+        defaults={"type": event["type"], "payload": event},
+    )
+    return created
+
+
+def session_outcomes(events):
+    """Split a batch of events into paid and expired Checkout session ids."""
+    paid, expired = set(), set()
+    for event in events:
+        session = event.payload.get("data", {}).get("object", {})
+        session_id = session.get("id")
+        if not session_id:
+            continue
+        if event.type in PAID_EVENTS and session.get("payment_status") == "paid":
+            paid.add(session_id)
+        elif event.type in EXPIRED_EVENTS:
+            expired.add(session_id)
+    return paid, expired - paid
+
+
+def overdue_borrowings_paid_by(session_ids, today=None):
+    """
+    Active overdue borrowings with a payment in `session_ids`, locked.
+    The payments are matched in a subquery rather than a join, so the
+    lock covers borrowing rows only and needs no DISTINCT, which
+    PostgreSQL refuses to combine with FOR UPDATE.
+    """
+    today = today or timezone.now().date()
+    return Borrowing.objects.select_for_update().filter(
+        pk__in=Subquery(
+            Payment.objects.filter(session_id__in=session_ids).values("borrowing_id")
+        ),
+        expected_return_date__lt=today,
+        actual_return_date__isnull=True,
+    )
+
+
+def close_overdue_borrowings(session_ids):
+    """
+    Return overdue borrowings whose payment just cleared and put their
+    copies back. Rows are locked first, so a concurrent manual return
+    cannot release the same copy twice.
+    """
+    today = timezone.now().date()
+    closing = list(
+        overdue_borrowings_paid_by(session_ids, today).values_list("pk", "book_id")
+    )
+    if not closing:
+        return 0
+
+    Borrowing.objects.filter(pk__in=[pk for pk, _ in closing]).update(
+        actual_return_date=today
+    )
+    copies = Counter(book_id for _, book_id in closing)
+    for book in Book.objects.filter(pk__in=copies):
+        for _ in range(copies[book.pk]):
+            release_copy(book)
+    return len(closing)
+
+
+def complete_paid_sessions(session_ids):
+    """
+    Mark the unpaid payments of `session_ids` PAID, close the overdue
+    borrowings they settle and notify each newly paid borrower. Call it
+    inside a transaction. Returns the numbers of paid payments and closed
+    borrowings.
+
+    EXPIRED rows are completed too: the gateway took the money, so a
+    session paid just as settle-all superseded it, or as its deadline
+    passed here, must still be recorded as paid.
+    """
+    unpaid = Payment.objects.unpaid()
+    newly_paid = list(
+        unpaid.filter(session_id__in=session_ids).values_list("pk", flat=True)
+    )
+    paid = unpaid.filter(pk__in=newly_paid).update(status="PAID")
+    closed = close_overdue_borrowings(session_ids)
+
+    for payment in Payment.objects.filter(pk__in=newly_paid).select_related(
+        "borrowing__user"
+    ):
+        send_notification_on_success_payment(payment)
+    return paid, closed
+
+
+def process_events(batch_size=WEBHOOK_BATCH_SIZE):
+    """
+    Apply one batch of unprocessed events, oldest first. Events are
+    claimed with SELECT ... FOR UPDATE SKIP LOCKED, payment statuses are
+    changed with one UPDATE per outcome, and the batch is marked processed
+    in the same transaction.
+
+    Returns a dict with the number of events, paid and expired payments
+    and closed borrowings.
+    """
+    with transaction.atomic():
+        events = list(
+            StripeEvent.objects.select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True)
+            .order_by("received_at")[:batch_size]
+        )
+        if not events:
+            return {"events": 0, "paid": 0, "expired": 0, "closed": 0}
+
+        paid_sessions, expired_sessions = session_outcomes(events)
+
+        paid, closed = complete_paid_sessions(paid_sessions)
+        expired = (
+            Payment.objects.pending()
+            .filter(session_id__in=expired_sessions)
+            .update(status="EXPIRED")
+        )
+
+        StripeEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+            processed_at=timezone.now()
+        )
+
+    return {"events": len(events), "paid": paid, "expired": expired, "closed": closed}
@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from user.cache import get_cached_user
+
+USER_CLAIMS = ("email", "is_staff", "is_active")
+
+
+def add_user_claims(token, user):
+    """Sign what read paths need about the user into the token itself."""
+    token["email"] = user.email
+    token["is_staff"] = user.is_staff
+    token["is_active"] = user.is_active
+    return token
+
+
+def user_from_claims(token):
+    """
+    A User instance built from token claims alone. The remaining fields
+    are deferred, so reading one loads the row from the database.
+    """
+    User = get_user_model()
+    claims = {
+        "id": User._meta.pk.to_python(token[api_settings.USER_ID_CLAIM]),
+        **{claim: token[claim] for claim in USER_CLAIMS},
+    }
+    loaded = [field.attname for field in User._meta.concrete_fields if field.attname in claims]
+    return User.from_db(None, loaded, [claims[name] for name in loaded])
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that does not load the user on every request.
+
+    Safe-method requests from non-staff users get a user built from the
+    id, email, is_staff and is_active claims. Writes, staff tokens and
+    tokens issued without the claims get the full row from the user cache
+    (per-process LRU, then Redis, then the database), so losing staff
+    rights or being deactivated takes effect there within
+    LOCAL_USER_CACHE_TTL seconds. A non-staff user deactivated after the
+    token was issued can still read their own data until the access token
+    expires.
+    """
+
+    def authenticate(self, request):
+        self.read_only = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if (
+            getattr(self, "read_only", False)
+            and all(claim in validated_token for claim in USER_CLAIMS)
+            and not validated_token["is_staff"]
+        ):
+            if not validated_token["is_active"]:
+                raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+            return user_from_claims(validated_token)
+
+        user = get_cached_user(validated_token[api_settings.USER_ID_CLAIM])
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
@@ -0,0 +1,98 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+
+USER_CACHE_TIMEOUT = 5 * 60
+LOCAL_USER_CACHE_SIZE = 1024
+LOCAL_USER_CACHE_TTL = 30
+
+
+def user_key(pk):
+    return f"user:row:{pk}"
+
+
+class TTLCache:
+    """
+    Thread-safe LRU of at most `maxsize` entries, each dropped `ttl`
+    seconds after it was stored.
+    """
+
+    def __init__(self, maxsize, ttl, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= self.clock():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, self.clock() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def pop(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_users = TTLCache(LOCAL_USER_CACHE_SIZE, LOCAL_USER_CACHE_TTL)
+
+
+def get_cached_user(pk):
+    """
+    A copy of the user row for `pk`, from this process's LRU, then Redis,
+    then the database, or None if there is no such user. Other processes
+    may serve a changed row from their LRU for up to LOCAL_USER_CACHE_TTL
+    seconds.
+    """
+    key = user_key(pk)
+    user = local_users.get(key)
+    if user is None:
+        user = cache.get(key)
+        if user is None:
+            user = get_user_model().objects.filter(pk=pk).first()
+            if user is None:
+                return None
+            cache.set(key, user, USER_CACHE_TIMEOUT)
+        local_users.set(key, user)
+    return copy.copy(user)
+
+
+def invalidate_users(pks):
+    """
+    Drop the cached rows right away, and again after commit so a row
+    cached from the old data in between does not survive.
+    """
+    keys = [user_key(pk) for pk in pks]
+    if not keys:
+        return
+
+    def drop():
+        for key in keys:
+            local_users.pop(key)
+        cache.delete_many(keys)
+
+    drop()
+    transaction.on_commit(drop)
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def populate_flags(apps, schema_editor):
+    User = apps.get_model("user", "User")
+    Payment = apps.get_model("payment", "Payment")
+    User.objects.update(
+        has_pending_payments=Exists(
+            Payment.objects.filter(borrowing__user=OuterRef("pk"), status="PENDING")
+        )
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0001_initial"),
+        ("payment", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="has_pending_payments",
+            field=models.BooleanField(
+                default=False,
+                editable=False,
+                help_text="Maintained from Payment writes; blocks new borrowings.",
+            ),
+        ),
+        migrations.RunPython(populate_flags, migrations.RunPython.noop),
+    ]
@@ -5,7 +5,27 @@ from django.utils.translation import gettext as _
 from base.models import UUIDModel
 
 
-class UserManager(UserManager):
+class UserQuerySet(models.QuerySet):
+    """Bulk writes drop the cached rows of the users they touch."""
+
+    def update(self, **kwargs):
+        from user.cache import invalidate_users
+
+        pks = list(self.values_list("pk", flat=True))
+        updated = super().update(**kwargs)
+        invalidate_users(pks)
+        return updated
+
+    def delete(self):
+        from user.cache import invalidate_users
+
+        pks = list(self.values_list("pk", flat=True))
+        deleted = super().delete()
+        invalidate_users(pks)
+        return deleted
+
+
+class UserManager(UserManager.from_queryset(UserQuerySet)):
     use_in_migrations = True
 
     def _create_user(self, email, password, **extra_fields):
@@ -35,11 +55,30 @@ class UserManager(UserManager):
 class User(UUIDModel, AbstractUser):
     username = None
     email = models.EmailField(_("email address"), unique=True)
+    has_pending_payments = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text="Maintained from Payment writes; blocks new borrowings.",
+    )
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
     objects = UserManager()
 
+    def save(self, *args, **kwargs):
+        from user.cache import invalidate_users
+
+        super().save(*args, **kwargs)
+        invalidate_users([self.pk])
+
+    def delete(self, *args, **kwargs):
+        from user.cache import invalidate_users
+
+        pk = self.pk
+        deleted = super().delete(*args, **kwargs)
+        invalidate_users([pk])
+        return deleted
+
     def __str__(self):
         return f"{self.email}: {self.first_name} {self.last_name}"
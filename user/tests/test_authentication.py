@@ -0,0 +1,140 @@
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from base.testing import FakeClock
+from user.cache import TTLCache, get_cached_user, local_users
+
+
+class TTLCacheTests(SimpleTestCase):
+    def test_entries_expire(self):
+        clock = FakeClock()
+        entries = TTLCache(maxsize=2, ttl=30, clock=clock)
+        entries.set("a", 1)
+
+        clock.now = 29
+        self.assertEqual(entries.get("a"), 1)
+        clock.now = 30
+        self.assertIsNone(entries.get("a"))
+
+    def test_least_recently_used_is_evicted(self):
+        entries = TTLCache(maxsize=2, ttl=30, clock=FakeClock())
+        entries.set("a", 1)
+        entries.set("b", 2)
+        entries.get("a")
+
+        entries.set("c", 3)
+
+        self.assertEqual(entries.get("a"), 1)
+        self.assertIsNone(entries.get("b"))
+        self.assertEqual(entries.get("c"), 3)
+
+
+class ClaimsJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        local_users.clear()
+        self.addCleanup(local_users.clear)
+        self.user = get_user_model().objects.create_user(
+            email="claims@test.com", password="password123", first_name="Ann"
+        )
+
+    def obtain(self):
+        response = self.client.post(
+            reverse("user:token_obtain_pair"),
+            {"email": "claims@test.com", "password": "password123"},
+        )
+        return response.data
+
+    def authorize(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    def test_token_carries_user_claims(self):
+        access = AccessToken(self.obtain()["access"])
+
+        self.assertEqual(access["email"], "claims@test.com")
+        self.assertFalse(access["is_staff"])
+        self.assertTrue(access["is_active"])
+
+    def test_reads_do_not_query_the_user_table(self):
+        self.authorize(self.obtain()["access"])
+        self.client.get(reverse("user:manage"))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("user:manage"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["first_name"], "Ann")
+
+    def test_claims_user_filters_user_owned_rows(self):
+        self.authorize(self.obtain()["access"])
+
+        response = self.client.get(reverse("borrowings_service:borrowings-list"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_update_invalidates_the_cached_row(self):
+        self.authorize(self.obtain()["access"])
+        self.client.get(reverse("user:manage"))
+
+        self.client.patch(reverse("user:manage"), {"first_name": "Bea"})
+        response = self.client.get(reverse("user:manage"))
+
+        self.assertEqual(response.data["first_name"], "Bea")
+
+    def test_bulk_update_invalidates_the_cached_row(self):
+        get_cached_user(self.user.pk)
+
+        get_user_model().objects.filter(pk=self.user.pk).update(is_active=False)
+
+        self.assertFalse(get_cached_user(self.user.pk).is_active)
+
+    def test_inactive_user_cannot_write(self):
+        self.authorize(self.obtain()["access"])
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.patch(reverse("user:manage"), {"first_name": "Bea"})
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_stamped_inactive_cannot_read(self):
+        access = AccessToken(self.obtain()["access"])
+        access["is_active"] = False
+        self.authorize(access)
+
+        response = self.client.get(reverse("user:manage"))
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_demoted_staff_loses_staff_reads(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.authorize(self.obtain()["access"])
+        self.user.is_staff = False
+        self.user.save()
+        response = self.client.get(reverse("user:manage"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.wsgi_request.user.is_staff)
+
+    def test_refresh_restamps_claims(self):
+        refresh = self.obtain()["refresh"]
+        self.user.is_staff = True
+        self.user.save()
+
+        response = self.client.post(
+            reverse("user:token_refresh"), {"refresh": refresh}
+        )
+
+        self.assertTrue(AccessToken(response.data["access"])["is_staff"])
+
+    def test_tokens_without_claims_fall_back_to_the_cache(self):
+        self.authorize(AccessToken.for_user(self.user))
+
+        response = self.client.get(reverse("user:manage"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["email"], "claims@test.com")
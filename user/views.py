@@ -1,9 +1,9 @@
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
+from django.contrib.auth import get_user_model
 from rest_framework import generics
-from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 
+from user.cache import get_cached_user
 from user.serializers import UserSerializer
 
 
@@ -13,12 +13,15 @@ class CreateUserView(generics.CreateAPIView):
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
-    authentication_classes = (JWTAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_object(self):
-        return self.request.user
-
-    @method_decorator(cache_page(60 * 5, key_prefix="manage_user_view"))
-    def dispatch(self, request, *args, **kwargs):
-        return super().dispatch(request, *args, **kwargs)
+        """
+        Reads come from the user cache; updates start from the current row
+        so they never write back a stale cached copy.
+        """
+        if self.request.method in SAFE_METHODS:
+            user = get_cached_user(self.request.user.pk)
+            if user is not None:
+                return user
+        return get_object_or_404(get_user_model(), pk=self.request.user.pk)